@@ -48,8 +48,55 @@ env = environ.Env(
     FRONT_END_URL=(str, None),
     # Solr core name
     SOLR_CORE=(str, None),
+    # Backend storing the indexed documents, e.g.
+    # core.memory_backend.MemoryBackend to run without Solr
+    SOLR_BACKEND=(str, "core.search_backend.SolrBackend"),
     # Solr URL
     SOLR_URL=(str, None),
+    # Solr configset of the cores created by blue/green reindexes, defaults
+    # to the core name
+    SOLR_CONFIGSET=(str, ""),
+    # Max number of keep-alive connections to Solr kept per process
+    SOLR_POOL_SIZE=(int, 10),
+    # Seconds to wait when opening a connection to Solr
+    SOLR_CONNECT_TIMEOUT=(float, 3.05),
+    # Seconds to wait for Solr to send a response
+    SOLR_READ_TIMEOUT=(float, 10.0),
+    # How index writes are committed: "hard", "soft", "within" or "none".
+    # With "none", the autoSoftCommit of solrconfig.xml makes the writes
+    # visible, so a burst of writes opens a single searcher.
+    SOLR_COMMIT_POLICY=(str, "none"),
+    # Max milliseconds before a write is committed with the "within" policy
+    SOLR_COMMIT_WITHIN_MS=(int, 1000),
+    # Whether to also deliver index changes from a background thread right
+    # after the DB transaction commits, instead of only through the
+    # process_index_outbox worker
+    SOLR_OUTBOX_DELIVER_ON_COMMIT=(bool, False),
+    # Failed deliveries after which an outbox entry is given up
+    SOLR_OUTBOX_MAX_ATTEMPTS=(int, 10),
+    # Max number of search results cached per process, 0 to disable
+    SOLR_SEARCH_CACHE_SIZE=(int, 0),
+    # Seconds a cached search result is served for
+    SOLR_SEARCH_CACHE_TTL=(float, 5.0),
+    # Whether to validate documents read from Solr with their serializer
+    SOLR_STRICT_HYDRATION=(bool, False),
+    # Consecutive Solr failures that stop requests to Solr for a while
+    SOLR_CIRCUIT_FAILURE_THRESHOLD=(int, 5),
+    # Seconds to wait before trying Solr again after too many failures
+    SOLR_CIRCUIT_RESET_TIMEOUT=(float, 30.0),
+    # Times a failed Solr read is retried
+    SOLR_READ_RETRIES=(int, 2),
+    # Base seconds of the jittered exponential backoff between retries
+    SOLR_RETRY_BACKOFF=(float, 0.05),
+    # Whether to send a duplicate Solr read once the first one is slower
+    # than the p95 latency of the recent reads
+    SOLR_HEDGED_READS=(bool, False),
+    # Base URLs of the SolrCloud nodes, e.g. http://solr1:8983/solr. SOLR_CORE
+    # is then the name of a collection. Empty to use the Solr at SOLR_URL in
+    # standalone mode
+    SOLR_CLOUD_NODES=(list[str], []),
+    # Seconds the shards and replicas of the SolrCloud collections are cached
+    SOLR_CLUSTER_STATE_TTL=(float, 30.0),
     # Okta client ID
     OKTA_CLIENT_ID=(str, None),
     # Okta client secret
@@ -217,6 +264,38 @@ LOGGING = {
 # Solr config
 SOLR_URL = env.str("SOLR_URL")
 SOLR_CORE = env.str("SOLR_CORE")
+SOLR_BACKEND = env.str("SOLR_BACKEND")
+SOLR_CONFIGSET = env.str("SOLR_CONFIGSET") or SOLR_CORE
+# Core holding the index being rebuilt by a blue/green reindex, and then the
+# previous index until the next one
+SOLR_STANDBY_CORE = f"{SOLR_CORE}_standby"
+SOLR_POOL_SIZE = env.int("SOLR_POOL_SIZE")
+SOLR_CONNECT_TIMEOUT = env.float("SOLR_CONNECT_TIMEOUT")
+SOLR_READ_TIMEOUT = env.float("SOLR_READ_TIMEOUT")
+SOLR_COMMIT_POLICY = env.str("SOLR_COMMIT_POLICY")
+SOLR_COMMIT_WITHIN_MS = env.int("SOLR_COMMIT_WITHIN_MS")
+# Number of documents sent to Solr per update request on bulk indexing
+SOLR_BATCH_SIZE = 500
+SOLR_OUTBOX_DELIVER_ON_COMMIT = env.bool("SOLR_OUTBOX_DELIVER_ON_COMMIT")
+SOLR_OUTBOX_MAX_ATTEMPTS = env.int("SOLR_OUTBOX_MAX_ATTEMPTS")
+# Cache class for search results
+SOLR_SEARCH_CACHE = "core.search_cache.LRUSearchCache"
+SOLR_SEARCH_CACHE_SIZE = env.int("SOLR_SEARCH_CACHE_SIZE")
+SOLR_SEARCH_CACHE_TTL = env.float("SOLR_SEARCH_CACHE_TTL")
+SOLR_STRICT_HYDRATION = env.bool("SOLR_STRICT_HYDRATION")
+SOLR_CIRCUIT_FAILURE_THRESHOLD = env.int("SOLR_CIRCUIT_FAILURE_THRESHOLD")
+SOLR_CIRCUIT_RESET_TIMEOUT = env.float("SOLR_CIRCUIT_RESET_TIMEOUT")
+SOLR_READ_RETRIES = env.int("SOLR_READ_RETRIES")
+SOLR_RETRY_BACKOFF = env.float("SOLR_RETRY_BACKOFF")
+SOLR_HEDGED_READS = env.bool("SOLR_HEDGED_READS")
+SOLR_CLOUD_NODES: list[str] = env.list("SOLR_CLOUD_NODES")
+SOLR_CLUSTER_STATE_TTL = env.float("SOLR_CLUSTER_STATE_TTL")
+# Indexer class of each indexed model, by model label
+SOLR_INDEXERS = {
+    "core.user": "user.indexer.UserIndexer",
+}
+# Indexed models whose saved and deleted instances are indexed automatically
+SOLR_AUTO_INDEX = ["core.user"]
 
 # Pagination config
 DEFAULT_PAGE_SIZE = 25
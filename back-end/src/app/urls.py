@@ -27,5 +27,6 @@ urlpatterns = [
         ),
     path("admin/", admin.site.urls),
     path("users/", include("user.urls")),
-    path("accounts/", include("user.account_urls"))
+    path("accounts/", include("user.account_urls")),
+    path("metrics/", include("core.urls")),
 ]
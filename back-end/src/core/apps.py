@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self) -> None:
+        from core.auto_index import register_from_settings
+        from core.tombstones import track_deletions_from_settings
+        register_from_settings()
+        track_deletions_from_settings()
@@ -0,0 +1,377 @@
+import asyncio
+import time
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple
+
+import httpx
+from app import settings
+from core.indexer import GenericModel, Indexer, ModelIndexer
+from core.query import SolrQuery
+from core.search_backend import get_search_backend
+from core.search_cache import get_search_cache
+from core.solr import (
+    CommitPolicy, get_async_client, get_hedge_delay, get_latency_tracker,
+    is_solr_failure, retry_delay,
+)
+from core.solr_cloud import get_solr_cloud
+
+
+class AsyncIndexer:
+    """
+    Non-blocking counterpart of the Indexer class.
+
+    Queries and documents are transformed by a wrapped Indexer, so both
+    classes always send the same requests to Solr.
+    """
+
+    indexer: Indexer
+
+    def __init__(self, indexer: Indexer) -> None:
+        self.indexer = indexer
+
+    @property
+    def url(self) -> str:
+        return self.indexer.url
+
+    def build_query(self, query: Dict[str, Any]) -> SolrQuery:
+        """
+        Build a query from a dictionary of parameters.
+
+        :param query: The query to build.
+        :return: The built query.
+        """
+        return self.indexer.build_query(query)
+
+    async def commit(self, soft: bool = False) -> None:
+        """
+        Explicitly commit the pending changes to the Solr index.
+
+        :param soft: Whether to make the changes visible without flushing
+        them to disk.
+        """
+        await get_search_backend().commit_async(self, soft)
+
+    async def post_update(
+        self,
+        body: Any,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Send a raw request to the Solr update handler.
+
+        :param body: The JSON body of the request.
+        :param commit_policy: How to commit the changes. Nothing is committed
+        if not given.
+        """
+        await self.refresh_cluster_state()
+        for shard, shard_body, params in self.indexer.route_update(
+            body,
+            commit_policy,
+        ):
+            await self.request(
+                "POST",
+                "update",
+                shard=shard,
+                params=params,
+                json=shard_body,
+                headers={"Content-Type": "application/json"},
+                )
+
+    async def refresh_cluster_state(self) -> None:
+        """
+        Fetch the SolrCloud cluster state in a thread when the cached one is
+        stale, so routing the requests does not block the event loop.
+        """
+        cloud = get_solr_cloud()
+        if cloud is not None and cloud.is_stale():
+            await asyncio.to_thread(cloud.state)
+
+    async def read(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[Tuple[float, float]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send an idempotent request to a handler of the Solr core, retrying
+        and hedging it like Indexer.read does.
+
+        :param method: The HTTP method.
+        :param path: The path of the handler, relative to the core.
+        :param timeout: The (connect, read) timeout of each request.
+        Defaults to the one of the client.
+        :param kwargs: Extra arguments for the HTTP client.
+        :return: The successful response.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self.hedged_request(
+                    method,
+                    path,
+                    timeout,
+                    **kwargs,
+                    )
+            except Exception as e:
+                if (
+                    attempt > settings.SOLR_READ_RETRIES
+                    or not is_solr_failure(e)
+                ):
+                    raise e
+            await asyncio.sleep(retry_delay(attempt))
+
+    async def hedged_request(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[Tuple[float, float]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request, and a duplicate of it if it is slower than the hedge
+        delay. The slower request is cancelled.
+
+        :param method: The HTTP method.
+        :param path: The path of the handler, relative to the core.
+        :param timeout: The (connect, read) timeout of each request.
+        :param kwargs: Extra arguments for the HTTP client.
+        :return: The first successful response.
+        """
+        async def timed_request() -> httpx.Response:
+            started_at = time.monotonic()
+            response = await self.request(method, path, timeout, **kwargs)
+            get_latency_tracker().record(time.monotonic() - started_at)
+            return response
+
+        hedge_delay = get_hedge_delay()
+        if hedge_delay is None:
+            return await timed_request()
+        tasks = [asyncio.ensure_future(timed_request())]
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(timed_request()))
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except Exception:
+                    continue
+            # Both requests failed, raise the error of the first one
+            return await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[Tuple[float, float]] = None,
+        shard: Optional[str] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request to a handler of the Solr core through the circuit
+        breaker.
+
+        :param method: The HTTP method.
+        :param path: The path of the handler, relative to the core.
+        :param timeout: The (connect, read) timeout of the request. Defaults
+        to the one of the client.
+        :param shard: The shard the request is for, see Indexer.route.
+        :param kwargs: Extra arguments for the HTTP client.
+        :return: The successful response.
+        :raises CircuitOpenException: If the circuit breaker is open.
+        """
+        if timeout is not None:
+            connect_timeout, read_timeout = timeout
+            kwargs["timeout"] = httpx.Timeout(
+                read_timeout,
+                connect=connect_timeout,
+            )
+        await self.refresh_cluster_state()
+        url, breaker = self.indexer.route(shard)
+
+        async def send() -> httpx.Response:
+            response = await get_async_client().request(
+                method,
+                f"{url}/{path}",
+                **kwargs,
+                )
+            response.raise_for_status()
+            return response
+
+        return await breaker.call_async(send)
+
+    async def update(
+        self,
+        data: Dict[str, Any],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Index a new document into the Solr index.
+
+        :param data: The data to index.
+        :param commit_policy: How to commit the document. Defaults to the
+        policy in the settings.
+        """
+        transformed_data = self.indexer.transform_data(data)
+        await get_search_backend().update_async(
+            self,
+            [transformed_data],
+            commit_policy or CommitPolicy.default()
+            )
+        self.indexer.invalidate_cache([transformed_data["id"]])
+
+    async def select(
+        self,
+        query: SolrQuery,
+        start: Optional[int] = None,
+        rows: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search the Solr index for a given query.
+
+        :param query: The query to search for.
+        :param start: The starting offset of the results.
+        :param rows: The number of results to return.
+        :param params: Extra parameters to send to the select handler.
+        :param fields: The fields to return. All the stored fields are
+        returned if not given.
+        :param timeout: The (connect, read) timeout of the request. Defaults
+        to the one of the client.
+        :return: The response from the Solr index.
+        """
+        return await get_search_backend().select_async(
+            self,
+            self.indexer.select_params(query, start, rows, params, fields),
+            timeout,
+            )
+
+    async def real_time_get(
+        self,
+        ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get documents by id from the real-time get handler.
+
+        :param ids: The ids of the documents.
+        :param fields: The fields to return. All the stored fields are
+        returned if not given.
+        :return: The documents found, in the order of the ids.
+        """
+        if not ids:
+            return []
+        return await get_search_backend().real_time_get_async(
+            self,
+            self.indexer.real_time_get_params(ids, fields),
+            )
+
+
+class AsyncModelIndexer(AsyncIndexer, Generic[GenericModel]):
+    """
+    Non-blocking counterpart of the ModelIndexer class.
+    """
+
+    indexer: ModelIndexer[GenericModel]
+
+    def __init__(self, indexer: ModelIndexer[GenericModel]) -> None:
+        super().__init__(indexer)
+
+    async def add(
+        self,
+        instance: GenericModel,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Index a new document into the Solr index.
+
+        :param instance: The instance to index.
+        :param commit_policy: How to commit the document. Defaults to the
+        policy in the settings.
+        """
+        await self.update(self.indexer.to_document(instance), commit_policy)
+
+    async def all(
+        self,
+        offset: int,
+        page_size: int,
+        include_total: bool = True,
+    ) -> Tuple[List[GenericModel], int]:
+        """
+        Get all instances from the Solr index.
+        """
+        return await self.search({}, offset, page_size, include_total)
+
+    async def count(self, query: Dict[str, Any]) -> int:
+        """
+        Count the instances matching a query, without fetching any document.
+
+        :param query: The query to search for.
+        :return: The number of matching instances.
+        """
+        response = await self.select(
+            self.indexer.build_search_query(query),
+            rows=0,
+            )
+        return int(response.get("response", {}).get("numFound", 0))
+
+    async def get_many(self, pks: Iterable[Any]) -> List[GenericModel]:
+        """
+        Get instances by primary key with a single real-time get request.
+
+        :param pks: The primary keys of the instances.
+        :return: The instances found, in the order of the primary keys.
+        """
+        docs = await self.real_time_get(
+            [self.indexer.document_id(pk) for pk in pks],
+            fields=self.indexer.field_list(),
+            )
+        return self.indexer.hydrate_many(docs)
+
+    async def search(
+        self,
+        query: Dict[str, Any],
+        offset: int,
+        page_size: int,
+        include_total: bool = True,
+    ) -> Tuple[List[GenericModel], int]:
+        """
+        Search the Solr index for a given query with pagination.
+
+        :param query: The query to search for.
+        :param offset: The starting offset of the results.
+        :param page_size: The number of results to return.
+        :param include_total: Whether the total count must be exact.
+        :return: A tuple of (results, total_count).
+        """
+        solr_query = self.indexer.build_search_query(query)
+        cache = get_search_cache()
+        key = self.indexer.search_cache_key(
+            query,
+            offset,
+            page_size,
+            include_total,
+            )
+        response = cache.get(key) if cache is not None else None
+        if response is None:
+            response = await self.select(
+                solr_query,
+                start=offset,
+                rows=page_size,
+                params=self.indexer.total_params(
+                    offset,
+                    page_size,
+                    include_total,
+                    ),
+                fields=self.indexer.field_list(),
+                )
+            if cache is not None:
+                pinned_id = self.indexer.pinned_document_id(query)
+                cache.set(key, response, pinned_id)
+        return self.indexer.parse_search_response(response)
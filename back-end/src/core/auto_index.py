@@ -0,0 +1,112 @@
+"""
+Automatic indexing of the changes made to registered models.
+
+The post_save and post_delete signals of a registered model enqueue the
+changed instance in the index outbox, so every code path changing it, e.g.
+the admin site, reaches Solr. The entries are delivered by the outbox
+worker, or in one batch per transaction once it commits, see core.outbox.
+
+Bulk operations such as QuerySet.update or bulk_create do not send signals,
+so their changes still need to be enqueued explicitly.
+"""
+from typing import Any, Optional, Set, Type
+
+from app import settings
+from core import outbox
+from core.indexer import get_model_indexer
+from django.apps import apps
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+
+# Models whose changes are indexed automatically
+_registry: Set[Type[Model]] = set()
+
+
+def register(model_cls: Type[Model]) -> None:
+    """
+    Index the saved and deleted instances of a model automatically.
+
+    :param model_cls: The model. It must have an indexer in SOLR_INDEXERS.
+    :raises LookupError: If the model is not indexed.
+    """
+    model_label = model_cls._meta.label_lower
+    # Fail at startup rather than on the first save
+    get_model_indexer(model_label)
+    post_save.connect(
+        handle_save,
+        sender=model_cls,
+        dispatch_uid=f"auto_index_save_{model_label}",
+    )
+    post_delete.connect(
+        handle_delete,
+        sender=model_cls,
+        dispatch_uid=f"auto_index_delete_{model_label}",
+    )
+    _registry.add(model_cls)
+
+
+def unregister(model_cls: Type[Model]) -> None:
+    """
+    Stop indexing the changes of a model automatically.
+
+    :param model_cls: The model.
+    """
+    model_label = model_cls._meta.label_lower
+    post_save.disconnect(
+        sender=model_cls,
+        dispatch_uid=f"auto_index_save_{model_label}",
+    )
+    post_delete.disconnect(
+        sender=model_cls,
+        dispatch_uid=f"auto_index_delete_{model_label}",
+    )
+    _registry.discard(model_cls)
+
+
+def is_registered(model_cls: Type[Model]) -> bool:
+    """
+    Check whether the changes of a model are indexed automatically.
+
+    :param model_cls: The model.
+    :return: Whether the model is registered.
+    """
+    return model_cls in _registry
+
+
+def register_from_settings() -> None:
+    """
+    Register the models listed in the SOLR_AUTO_INDEX setting.
+    """
+    for model_label in settings.SOLR_AUTO_INDEX:
+        register(apps.get_model(model_label))
+
+
+def handle_save(
+    sender: Type[Model],
+    instance: Model,
+    raw: bool = False,
+    update_fields: Optional[Any] = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Enqueue a saved instance, unless none of the saved fields are indexed.
+    Instances saved while loading fixtures are left out.
+    """
+    if raw:
+        return
+    if update_fields is not None:
+        indexer = get_model_indexer(sender._meta.label_lower)
+        if not indexer.is_indexed_change(update_fields):
+            return
+    outbox.enqueue(instance)
+
+
+def handle_delete(
+    sender: Type[Model],
+    instance: Model,
+    **kwargs: Any,
+) -> None:
+    """
+    Enqueue a deleted instance, so it is removed from the index.
+    """
+    outbox.enqueue(instance)
@@ -0,0 +1,181 @@
+"""
+Circuit breaker stopping requests to a failing dependency.
+
+After `failure_threshold` consecutive failures the breaker opens and
+rejects every call right away, instead of letting each of them wait for its
+timeout. Once `reset_timeout` seconds have passed, a single trial call is
+let through: the breaker closes if it succeeds and opens again otherwise.
+"""
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class CircuitOpenException(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker shared by the threads of a process.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    name: str
+    failure_threshold: int
+    reset_timeout: float
+    is_failure: Callable[[Exception], bool]
+    state: str
+    failures: int
+    times_opened: int
+    rejected: int
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+    ) -> None:
+        """
+        :param name: The name of the protected dependency.
+        :param failure_threshold: The number of consecutive failures that
+        open the circuit.
+        :param reset_timeout: The seconds to wait before trying a call on an
+        open circuit.
+        :param is_failure: Whether an exception raised by a call counts as a
+        failure of the dependency. Every exception counts if not given.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Check that a call can be made.
+
+        :raises CircuitOpenException: If the circuit is open.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_at = self._opened_at + self.reset_timeout
+            if not self._trial_running and time.monotonic() >= retry_at:
+                self.state = self.HALF_OPEN
+                self._trial_running = True
+                return
+            self.rejected += 1
+        raise CircuitOpenException(f"The {self.name} circuit is open")
+
+    def is_available(self) -> bool:
+        """
+        Check whether a call would be let through, without making it.
+
+        :return: Whether the circuit is closed or ready for a trial call.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            retry_at = self._opened_at + self.reset_timeout
+            return not self._trial_running and time.monotonic() >= retry_at
+
+    def record_success(self) -> None:
+        """
+        Record a successful call, closing the circuit.
+        """
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """
+        Record a failed call, opening the circuit if it failed too many
+        times in a row or if it was a trial call.
+        """
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if (
+                self.state == self.HALF_OPEN
+                or self.failures >= self.failure_threshold
+            ):
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_exception(self, exception: Exception) -> None:
+        """
+        Record a call that raised an exception. Exceptions that are not
+        failures of the dependency, e.g. rejected requests, count as
+        successes.
+
+        :param exception: The exception raised by the call.
+        """
+        if self.is_failure(exception):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def call(self, func: Callable[[], T]) -> T:
+        """
+        Make a call through the breaker.
+
+        :param func: The call to make.
+        :return: The result of the call.
+        :raises CircuitOpenException: If the circuit is open.
+        """
+        self.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            self.record_exception(e)
+            raise e
+        self.record_success()
+        return result
+
+    async def call_async(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Make a non-blocking call through the breaker.
+
+        :param func: The coroutine function to call.
+        :return: The result of the call.
+        :raises CircuitOpenException: If the circuit is open.
+        """
+        self.before_call()
+        try:
+            result = await func()
+        except Exception as e:
+            self.record_exception(e)
+            raise e
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Union[str, int]]:
+        """
+        Get the state and counters of the breaker.
+
+        :return: The state, consecutive failures, number of times the
+        circuit opened and number of rejected calls.
+        """
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,213 @@
+"""
+Conversion between the data of the model instances and Solr documents.
+
+Solr fields are dynamic fields named after the model fields plus a type
+suffix, e.g. `email_s` or `is_superuser_b`.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Type
+
+from django.db.models import Field, Model
+
+# Name of a field and function converting its value
+FieldConverter = Tuple[str, Callable[[Any], Any]]
+
+# Solr type suffix of the values of each model field type, "s" otherwise
+FIELD_TYPE_SUFFIXES = {
+    "AutoField": "i",
+    "BigAutoField": "i",
+    "SmallAutoField": "i",
+    "BooleanField": "b",
+    "IntegerField": "i",
+    "BigIntegerField": "i",
+    "SmallIntegerField": "i",
+    "PositiveIntegerField": "i",
+    "PositiveBigIntegerField": "i",
+    "PositiveSmallIntegerField": "i",
+    "FloatField": "f",
+}
+
+# How to encode the values of the Solr fields of each type suffix
+SUFFIX_ENCODERS: Dict[str, Callable[[Any], Any]] = {
+    "s": str,
+    "i": int,
+    "f": float,
+    "b": bool,
+}
+
+# How to decode the values of the Solr fields of each type suffix
+SUFFIX_DECODERS: Dict[str, Callable[[Any], Any]] = {
+    "i": int,
+    "f": float,
+    "b": bool,
+}
+
+
+def identity(value: Any) -> Any:
+    """
+    Return a value unchanged.
+    """
+    return value
+
+
+def encode_field(key: str, value: Any) -> Tuple[str, Any]:
+    """
+    Encode a field whose type is not known beforehand, picking the type
+    suffix from its value.
+
+    :param key: The name of the field.
+    :param value: The value of the field.
+    :return: The name of the Solr field and its value.
+    """
+    if key == "id":
+        return key, value
+    if isinstance(value, str):
+        return f"{key}_s", value
+    if isinstance(value, bool):
+        return f"{key}_b", value
+    if isinstance(value, int):
+        return f"{key}_i", value
+    if isinstance(value, float):
+        return f"{key}_f", value
+    return f"{key}_s", str(value)
+
+
+def decode_field(key: str, value: Any) -> Optional[Tuple[str, Any]]:
+    """
+    Decode a Solr field whose type is not known beforehand, using its type
+    suffix.
+
+    :param key: The name of the Solr field.
+    :param value: The value of the Solr field.
+    :return: The name of the field and its value, None if the Solr field
+    has no known suffix.
+    """
+    if key == "id":
+        return key, value
+    if key.endswith("_s") or key.endswith("_t"):
+        return key[:-2], value
+    suffix = key[-1:]
+    if key[-2:-1] == "_" and suffix in SUFFIX_DECODERS:
+        return key[:-2], SUFFIX_DECODERS[suffix](value)
+    return None
+
+
+def get_field_suffix(model_cls: Type[Model], name: str) -> str:
+    """
+    Get the Solr type suffix of a model field.
+
+    :param model_cls: The model holding the field.
+    :param name: The name of the field.
+    :return: The type suffix.
+    """
+    field = model_cls._meta.get_field(name)
+    internal_type = (
+        field.get_internal_type() if isinstance(field, Field) else ""
+    )
+    return FIELD_TYPE_SUFFIXES.get(internal_type, "s")
+
+
+class FieldCodec:
+    """
+    Encoder and decoder of the Solr documents of a model.
+
+    Both directions are flat mappings compiled once from the model fields,
+    so converting a document is a single pass over its keys with no type
+    probing. Keys the codec does not know are encoded from their value and
+    dropped when decoding.
+    """
+
+    solr_fields: Dict[str, str]
+    encoders: Dict[str, FieldConverter]
+    decoders: Dict[str, FieldConverter]
+
+    def __init__(
+        self,
+        model_cls: Type[Model],
+        field_names: Iterable[str],
+        override_types: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """
+        :param model_cls: The indexed model.
+        :param field_names: The fields read back from the documents.
+        :param override_types: The Solr type suffix of the fields that do not
+        use the one of their model field. They may be extra fields added to
+        the documents.
+        """
+        override_types = override_types or {}
+        id_prefix = model_cls.__name__.lower()
+        pk_suffix = get_field_suffix(model_cls, model_cls._meta.pk.name)
+        pk_decoder = SUFFIX_DECODERS.get(pk_suffix, identity)
+
+        def encode_id(pk: Any) -> str:
+            return f"{id_prefix}:{pk}"
+
+        def decode_id(document_id: str) -> Any:
+            return pk_decoder(document_id.split(":", 1)[1])
+
+        self.encoders = {}
+        for field in model_cls._meta.fields:
+            suffix = get_field_suffix(model_cls, field.name)
+            self.encoders[field.name] = (
+                f"{field.name}_{suffix}",
+                SUFFIX_ENCODERS[suffix],
+            )
+        for name, suffix in override_types.items():
+            self.encoders[name] = (
+                f"{name}_{suffix}",
+                SUFFIX_ENCODERS.get(suffix, identity),
+            )
+        self.encoders["id"] = ("id", encode_id)
+
+        self.solr_fields = {}
+        self.decoders = {}
+        for name in field_names:
+            if name == "id":
+                self.solr_fields[name] = name
+                self.decoders[name] = (name, decode_id)
+                continue
+            suffix = override_types.get(name) or get_field_suffix(
+                model_cls,
+                name,
+                )
+            solr_name = f"{name}_{suffix}"
+            self.solr_fields[name] = solr_name
+            self.decoders[solr_name] = (
+                name,
+                SUFFIX_DECODERS.get(suffix, identity),
+            )
+
+    def encode(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encode data into a Solr document. None values are left out.
+
+        :param data: The data to encode.
+        :return: The document.
+        """
+        encoders = self.encoders
+        document: Dict[str, Any] = {}
+        for key, value in data.items():
+            if value is None:
+                continue
+            encoder = encoders.get(key)
+            if encoder is None:
+                solr_name, document[solr_name] = encode_field(key, value)
+            else:
+                solr_name, encode = encoder
+                document[solr_name] = encode(value)
+        return document
+
+    def decode(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Decode the fields of the codec out of a Solr document.
+
+        :param document: The document.
+        :return: The decoded data.
+        """
+        decoders = self.decoders
+        data: Dict[str, Any] = {}
+        for key, value in document.items():
+            decoder = decoders.get(key)
+            if decoder is not None:
+                name, decode = decoder
+                data[name] = decode(value)
+        return data
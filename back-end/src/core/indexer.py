@@ -1,12 +1,76 @@
+import hashlib
+import itertools
+import json
+import time
 from abc import ABC
-from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+from concurrent.futures import as_completed, wait
+from itertools import islice
+from typing import (
+    Any, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Tuple,
+    Type, TypeVar,
+)
 
 import requests
 from app import settings
-from django.db.models import Model
+from core.circuit_breaker import CircuitBreaker
+from core.codecs import FieldCodec, decode_field, encode_field
+from core.query import WILDCARD, Prefix, SolrQuery
+from core.search_backend import SolrExportException, get_search_backend
+from core.search_cache import get_search_cache
+from core.solr import (
+    CommitPolicy, core_url, get_circuit_breaker, get_hedge_delay,
+    get_hedge_executor, get_latency_tracker, get_session, get_timeout,
+    is_solr_failure, retry_delay,
+)
+from core.solr_cloud import get_solr_cloud
+from django.db.models import Model, QuerySet
+from django.utils.module_loading import import_string
 from rest_framework.serializers import ModelSerializer
 
 GenericModel = TypeVar("GenericModel", bound=Model)
+T = TypeVar("T")
+
+# Codecs of the model indexers, by indexer and serializer class
+_codecs: Dict[Tuple[type, type], FieldCodec] = {}
+
+# Cursor of the first page of a cursor-based search
+FIRST_PAGE_CURSOR = "*"
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most `size` elements, consuming it
+    lazily.
+
+    :param items: The iterable to split.
+    :param size: The maximum size of each chunk.
+    :return: An iterator over the chunks.
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def mark_last(items: Iterable[T]) -> Iterator[Tuple[T, bool]]:
+    """
+    Pair each element of an iterable with whether it is the last one,
+    looking one element ahead.
+
+    :param items: The iterable.
+    :return: An iterator over the (element, is_last) pairs.
+    """
+    iterator = iter(items)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
 
 
 class Indexer:
@@ -14,70 +78,510 @@ class Indexer:
     Indexer class for managing the Solr index.
     """
 
-    url: str
+    core: str
     override_types: Optional[Dict[str, str]]
 
     def __init__(self) -> None:
-        self.url = f"{settings.SOLR_URL}/{settings.SOLR_CORE}"
+        self.core = settings.SOLR_CORE
 
-    def build_query(self, query: Dict[str, Any]) -> str:
+    @property
+    def url(self) -> str:
+        return core_url(self.core)
+
+    def build_query(self, query: Dict[str, Any]) -> SolrQuery:
         """
-        Build a query string from a dictionary of parameters.
+        Build a query from a dictionary of parameters, all of which must
+        match. A list of values matches any of them, so an empty list matches
+        no document.
 
         :param query: The query to build.
         :return: The built query.
         """
-        transformed_query = self.transform_data(query)
+        solr_query = SolrQuery()
+        for key, value in query.items():
+            if isinstance(value, list) and not value:
+                solr_query.add(key, value, is_filter=True)
+                continue
+            values = value if isinstance(value, list) else [value]
+            field: Optional[str] = None
+            encoded_values: List[Any] = []
+            for item in values:
+                for field, encoded_value in self.transform_data({
+                    key: item,
+                }).items():
+                    encoded_values.append(encoded_value)
+            if field is None:
+                continue
+            solr_query.add(
+                field,
+                encoded_values if isinstance(value, list)
+                else encoded_values[0],
+                self.is_filter_field(field),
+                )
+        return solr_query
+
+    def is_filter_field(self, field: str) -> bool:
+        """
+        Check whether the clauses on a Solr field only filter the results.
+        They are sent as filter queries, which do not affect the score and
+        are cached by Solr.
 
-        def escape_value(value: Any) -> str:
-            if isinstance(value, str):
-                return value.replace(":", r"\:")
-            return str(value)
+        :param field: The name of the Solr field.
+        :return: Whether the field is a filter.
+        """
+        return field == "id" or field.endswith("_b")
 
-        return "&".join([
-            f"{key}:{
-                escape_value(value)
-                }" for key, value in transformed_query.items()
-            ])
+    def commit(self, soft: bool = False) -> None:
+        """
+        Explicitly commit the pending changes to the Solr index.
+
+        :param soft: Whether to make the changes visible without flushing
+        them to disk.
+        """
+        get_search_backend().commit(self, soft)
+
+    def delete(
+        self,
+        ids: Iterable[str],
+        commit_policy: Optional[CommitPolicy] = None,
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+    ) -> int:
+        """
+        Remove documents from the Solr index. The ids are sent in batches of
+        `batch_size`, one update request each. Hard and soft commits are
+        only sent with the last batch.
+
+        :param ids: The ids of the documents to remove.
+        :param commit_policy: How to commit the removal. Defaults to the
+        policy in the settings.
+        :param batch_size: The number of ids per update request.
+        :return: The number of ids sent.
+        """
+        policy = commit_policy or CommitPolicy.default()
+        batch_policy = policy.for_batch()
+        count = 0
+        for batch, is_last in mark_last(chunked(ids, batch_size)):
+            get_search_backend().delete(
+                self,
+                batch,
+                policy if is_last else batch_policy,
+                )
+            self.invalidate_cache(batch, deleted=True)
+            count += len(batch)
+        return count
+
+    def delete_by_query(
+        self,
+        query: SolrQuery,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Remove every document matching a query from the Solr index, in a
+        single update request.
+
+        :param query: The query of the documents to remove.
+        :param commit_policy: How to commit the removal. Defaults to the
+        policy in the settings.
+        """
+        get_search_backend().delete_by_query(
+            self,
+            query.filtered_q,
+            commit_policy or CommitPolicy.default()
+            )
+        # The removed documents are not known, so no cached result is safe
+        cache = get_search_cache()
+        if cache is not None:
+            cache.clear()
+
+    def invalidate_cache(
+        self,
+        ids: Iterable[str],
+        deleted: bool = False,
+    ) -> None:
+        """
+        Drop the cached search results affected by a write.
 
-    def update(self, data: Dict[str, Any]) -> None:
+        :param ids: The ids of the written documents.
+        :param deleted: Whether the documents were deleted.
+        """
+        cache = get_search_cache()
+        if cache is not None:
+            cache.invalidate(ids, deleted)
+
+    def post_update(
+        self,
+        body: Any,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Send a raw request to the Solr update handler.
+
+        :param body: The JSON body of the request.
+        :param commit_policy: How to commit the changes. Nothing is committed
+        if not given.
+        """
+        for shard, shard_body, params in self.route_update(
+            body,
+            commit_policy,
+        ):
+            self.request(
+                "POST",
+                "update",
+                shard=shard,
+                params=params,
+                json=shard_body,
+                headers={"Content-Type": "application/json"},
+                )
+
+    def route(self, shard: Optional[str] = None) -> Tuple[str, CircuitBreaker]:
+        """
+        Pick the core a request is sent to. In SolrCloud mode, requests for
+        a shard go to its leader and the others to any healthy replica.
+
+        :param shard: The name of the shard the request is for, if any.
+        :return: The URL of the core and the circuit breaker guarding it.
+        """
+        cloud = get_solr_cloud()
+        if cloud is None:
+            return self.url, get_circuit_breaker()
+        if shard is None:
+            return cloud.replica(self.core)
+        return cloud.leader(self.core, shard)
+
+    def route_update(
+        self,
+        body: Any,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> List[Tuple[Optional[str], Any, Dict[str, str]]]:
+        """
+        Split an update request into one request per shard, so each shard
+        leader receives its own documents. Requests that are not about
+        specific documents, e.g. commits, are not split.
+
+        :param body: The JSON body of the update request.
+        :param commit_policy: How to commit the changes.
+        :return: The shard, body and parameters of each request. Hard and
+        soft commits are only sent with the last one, as Solr distributes
+        them to every shard.
+        """
+        params = commit_policy.params() if commit_policy else {}
+        cloud = get_solr_cloud()
+        if cloud is None:
+            return [(None, body, params)]
+        if isinstance(body, list) and body:
+            groups = cloud.group_by_shard(
+                self.core,
+                body,
+                [doc["id"] for doc in body],
+                )
+            bodies: List[Tuple[Optional[str], Any]] = list(groups.items())
+        elif (
+            isinstance(body, dict)
+            and list(body) == ["delete"]
+            and isinstance(body["delete"], list)
+        ):
+            ids = [str(document_id) for document_id in body["delete"]]
+            groups = cloud.group_by_shard(self.core, ids, ids)
+            bodies = [
+                (shard, {"delete": shard_ids})
+                for shard, shard_ids in groups.items()
+            ]
+        else:
+            return [(None, body, params)]
+
+        batch_params = (
+            commit_policy.for_batch().params() if commit_policy else params
+        )
+        requests_params = [batch_params] * (len(bodies) - 1) + [params]
+        return [
+            (shard, shard_body, shard_params)
+            for (shard, shard_body), shard_params
+            in zip(bodies, requests_params)
+        ]
+
+    def read(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[Tuple[float, float]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        Send an idempotent request to a handler of the Solr core.
+
+        Requests failing because of Solr are retried up to SOLR_READ_RETRIES
+        times, with a jittered exponential backoff. With SOLR_HEDGED_READS,
+        a duplicate request is sent once the first one is slower than the
+        p95 latency of the recent reads, and the first answer is used.
+
+        :param method: The HTTP method.
+        :param path: The path of the handler, relative to the core.
+        :param timeout: The (connect, read) timeout of each request.
+        Defaults to the one in the settings.
+        :param kwargs: Extra arguments for the HTTP session.
+        :return: The successful response.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self.hedged_request(method, path, timeout, **kwargs)
+            except Exception as e:
+                if (
+                    attempt > settings.SOLR_READ_RETRIES
+                    or not is_solr_failure(e)
+                ):
+                    raise e
+            time.sleep(retry_delay(attempt))
+
+    def hedged_request(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[Tuple[float, float]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        Send a request, and a duplicate of it if it is slower than the hedge
+        delay. The latency of every request is recorded to compute the
+        delay.
+
+        :param method: The HTTP method.
+        :param path: The path of the handler, relative to the core.
+        :param timeout: The (connect, read) timeout of each request.
+        :param kwargs: Extra arguments for the HTTP session.
+        :return: The first successful response.
+        """
+        def timed_request() -> requests.Response:
+            started_at = time.monotonic()
+            response = self.request(method, path, timeout, **kwargs)
+            get_latency_tracker().record(time.monotonic() - started_at)
+            return response
+
+        hedge_delay = get_hedge_delay()
+        if hedge_delay is None:
+            return timed_request()
+        executor = get_hedge_executor()
+        futures = [executor.submit(timed_request)]
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            futures.append(executor.submit(timed_request))
+        for future in as_completed(futures):
+            if future.exception() is None:
+                return future.result()
+        # Both requests failed, raise the error of the first one
+        return futures[0].result()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[Tuple[float, float]] = None,
+        shard: Optional[str] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        Send a request to a handler of the Solr core through the circuit
+        breaker, so requests fail right away while Solr is unavailable.
+
+        :param method: The HTTP method.
+        :param path: The path of the handler, relative to the core.
+        :param timeout: The (connect, read) timeout of the request. Defaults
+        to the one in the settings.
+        :param shard: The shard the request is for, see route.
+        :param kwargs: Extra arguments for the HTTP session.
+        :return: The successful response.
+        :raises CircuitOpenException: If the circuit breaker is open.
+        """
+        url, breaker = self.route(shard)
+
+        def send() -> requests.Response:
+            response = get_session().request(
+                method,
+                f"{url}/{path}",
+                timeout=timeout or get_timeout(),
+                **kwargs,
+                )
+            try:
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                response.close()
+                raise e
+            return response
+
+        return breaker.call(send)
+
+    def update(
+        self,
+        data: Dict[str, Any],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
         """
         Index a new document into the Solr index.
 
         :param data: The data to index.
+        :param commit_policy: How to commit the document. Defaults to the
+        policy in the settings.
         """
         transformed_data = self.transform_data(data)
-        response = requests.post(
-            f"{self.url}/update?commit=true",
-            json=[transformed_data],
-            headers={"Content-Type": "application/json"}
+        get_search_backend().update(
+            self,
+            [transformed_data],
+            commit_policy or CommitPolicy.default()
             )
-        response.raise_for_status()
+        self.invalidate_cache([transformed_data["id"]])
+
+    def update_many(
+        self,
+        data: Iterable[Dict[str, Any]],
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> int:
+        """
+        Index many documents into the Solr index. The documents are sent in
+        batches of `batch_size`, one update request each. Hard and soft
+        commits are only sent with the last batch.
+
+        :param data: The documents to index.
+        :param batch_size: The number of documents per update request.
+        :param commit_policy: How to commit the documents. Defaults to the
+        policy in the settings.
+        :return: The number of indexed documents.
+        """
+        policy = commit_policy or CommitPolicy.default()
+        batch_policy = policy.for_batch()
+        count = 0
+        for batch, is_last in mark_last(chunked(data, batch_size)):
+            documents = [self.transform_data(doc) for doc in batch]
+            get_search_backend().update(
+                self,
+                documents,
+                policy if is_last else batch_policy,
+                )
+            self.invalidate_cache(doc["id"] for doc in documents)
+            count += len(batch)
+        return count
 
     def select(
         self,
-        query: str,
+        query: SolrQuery,
         start: Optional[int] = None,
         rows: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        timeout: Optional[Tuple[float, float]] = None,
     ) -> Dict[str, Any]:
         """
         Search the Solr index for a given query.
 
         :param query: The query to search for.
+        :param start: The starting offset of the results.
+        :param rows: The number of results to return.
+        :param params: Extra parameters to send to the select handler.
+        :param fields: The fields to return. All the stored fields are
+        returned if not given.
+        :param timeout: The (connect, read) timeout of the request. Defaults
+        to the one in the settings.
         :return: The response from the Solr index.
         """
-        try:
-            url = f"{self.url}/select?q={query}&wt=json"
-            if rows is not None:
-                url = f"{url}&rows={rows}"
-            if start is not None:
-                url = f"{url}&start={start}"
-            response = requests.get(url)
-            response.raise_for_status()
-            response_body: Dict[str, Any] = response.json()
-            return response_body
-        except Exception as e:
-            raise e
+        return get_search_backend().select(
+            self,
+            self.select_params(query, start, rows, params, fields),
+            timeout,
+            )
+
+    def real_time_get(
+        self,
+        ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get documents by id from the real-time get handler, which skips the
+        query parser and also sees the uncommitted updates. The ids are sent
+        as form data, so any number of them is fetched in one request.
+
+        :param ids: The ids of the documents.
+        :param fields: The fields to return. All the stored fields are
+        returned if not given.
+        :return: The documents found, in the order of the ids.
+        """
+        if not ids:
+            return []
+        return get_search_backend().real_time_get(
+            self,
+            self.real_time_get_params(ids, fields),
+            )
+
+    def real_time_get_params(
+        self,
+        ids: List[str],
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Build the parameters of a request to the real-time get handler.
+
+        :param ids: The ids of the documents.
+        :param fields: The fields to return.
+        :return: The parameters.
+        """
+        params = {"ids": ",".join(ids), "wt": "json", "omitHeader": "true"}
+        if fields:
+            params["fl"] = ",".join(fields)
+        return params
+
+    def export(
+        self,
+        query: SolrQuery,
+        fields: List[str],
+        sort: str,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every document matching a query from the export handler. The
+        response is parsed as it is received, one document at a time. On
+        SolrCloud, the handler only exports the documents of the shard
+        receiving the request.
+
+        :param query: The query to search for.
+        :param fields: The fields to return. They need doc values.
+        :param sort: The sort of the documents. Its fields need doc values.
+        :return: An iterator over the documents.
+        :raises SolrExportException: If the documents can not be exported.
+        """
+        return get_search_backend().export(
+            self,
+            {**query.params(), "fl": ",".join(fields), "sort": sort},
+            )
+
+    def select_params(
+        self,
+        query: SolrQuery,
+        start: Optional[int] = None,
+        rows: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build the parameters of a request to the select handler. They are
+        URL-encoded by the HTTP client. The response header is omitted, as
+        nothing reads it.
+
+        :param query: The query to search for.
+        :param start: The starting offset of the results.
+        :param rows: The number of results to return.
+        :param params: Extra parameters to send to the select handler.
+        :param fields: The fields to return.
+        :return: The request parameters.
+        """
+        select_params = {**query.params(), "wt": "json", "omitHeader": "true"}
+        if rows is not None:
+            select_params["rows"] = rows
+        if start is not None:
+            select_params["start"] = start
+        if fields:
+            select_params["fl"] = ",".join(fields)
+        if params:
+            select_params.update(params)
+        return select_params
 
     def reverse_transform_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -89,16 +593,9 @@ class Indexer:
         """
         reverse_transformed_data: Dict[str, Any] = {}
         for key, value in data.items():
-            if key == "id":
-                reverse_transformed_data[key] = value
-            elif key.endswith("_s") or key.endswith("_t"):
-                reverse_transformed_data[key[:-2]] = value
-            elif key.endswith("_i"):
-                reverse_transformed_data[key[:-2]] = int(value)
-            elif key.endswith("_f"):
-                reverse_transformed_data[key[:-2]] = float(value)
-            elif key.endswith("_b"):
-                reverse_transformed_data[key[:-2]] = bool(value)
+            field = decode_field(key, value)
+            if field is not None:
+                name, reverse_transformed_data[name] = field
         return reverse_transformed_data
 
     def transform_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -112,20 +609,13 @@ class Indexer:
         for key, value in data.items():
             if value is None:
                 continue
-            if key == "id":
-                transformed_data[key] = value
-            elif self.override_types and key in self.override_types:
+            if self.override_types and key in self.override_types:
                 transformed_data[f"{key}_{self.override_types[key]}"] = value
-            elif isinstance(value, str):
-                transformed_data[f"{key}_s"] = value
-            elif isinstance(value, bool):
-                transformed_data[f"{key}_b"] = value
-            elif isinstance(value, int):
-                transformed_data[f"{key}_i"] = value
-            elif isinstance(value, float):
-                transformed_data[f"{key}_f"] = value
             else:
-                transformed_data[f"{key}_s"] = str(value)
+                solr_name, transformed_data[solr_name] = encode_field(
+                    key,
+                    value,
+                    )
         return transformed_data
 
 
@@ -135,35 +625,377 @@ class ModelIndexer(Indexer, ABC, Generic[GenericModel]):
     """
 
     serializer_class: Type[ModelSerializer[GenericModel]]
+    strict_hydration: bool
+    # Extra document fields holding a copy of a serialized field, e.g. to
+    # analyze it differently, by the name of the copy
+    copy_fields: Dict[str, str] = {}
+    # Model fields indexed and read back along with the serializer fields,
+    # e.g. to check the state of the hydrated instances
+    extra_fields: Tuple[str, ...] = ()
+    # Model fields get_queryset filters on. Saving them may add the instance
+    # to the index or remove it from it.
+    queryset_fields: Tuple[str, ...] = ()
 
     def __init__(self, serializer_class: Type[ModelSerializer[GenericModel]]):
         self.serializer_class = serializer_class
+        self.strict_hydration = settings.SOLR_STRICT_HYDRATION
         super().__init__()
 
-    def add(self, instance: GenericModel) -> None:
+    def add(
+        self,
+        instance: GenericModel,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
         """
         Index a new document into the Solr index.
 
         :param instance: The instance to index.
+        :param commit_policy: How to commit the document. Defaults to the
+        policy in the settings.
         """
-        serializer = self.serializer_class(instance)
-        data = serializer.data
-        self.update(data)
+        self.update(self.to_document(instance), commit_policy)
+
+    def add_many(
+        self,
+        instances: Iterable[GenericModel],
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> int:
+        """
+        Index many instances into the Solr index. The instances are consumed
+        lazily, so a queryset iterator can be passed without loading the
+        whole table in memory.
+
+        :param instances: The instances to index.
+        :param batch_size: The number of documents per update request.
+        :param commit_policy: How to commit the documents. Defaults to the
+        policy in the settings.
+        :return: The number of indexed documents.
+        """
+        documents = (self.to_document(instance) for instance in instances)
+        return self.update_many(documents, batch_size, commit_policy)
+
+    def remove(
+        self,
+        instance: GenericModel,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Remove an instance from the Solr index.
+
+        :param instance: The instance to remove.
+        :param commit_policy: How to commit the removal. Defaults to the
+        policy in the settings.
+        """
+        self.delete([self.document_id(instance.pk)], commit_policy)
+
+    def remove_many(
+        self,
+        instances: Iterable[GenericModel],
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> int:
+        """
+        Remove many instances from the Solr index, `batch_size` per update
+        request. The instances are consumed lazily.
+
+        :param instances: The instances to remove.
+        :param batch_size: The number of ids per update request.
+        :param commit_policy: How to commit the removal. Defaults to the
+        policy in the settings.
+        :return: The number of removed instances.
+        """
+        ids = (self.document_id(instance.pk) for instance in instances)
+        return self.delete(ids, commit_policy, batch_size)
+
+    def get_queryset(self) -> QuerySet[GenericModel]:
+        """
+        Get the instances that belong in the Solr index. The others are
+        removed from it when they are delivered, checked or reindexed.
+
+        :return: The queryset of the indexable instances.
+        """
+        model_cls: Type[GenericModel] = self.serializer_class.Meta.model
+        return model_cls._default_manager.all()
+
+    def is_indexed_change(self, update_fields: Iterable[str]) -> bool:
+        """
+        Check whether saving some fields of an instance can change its
+        document, or whether it belongs in the index.
+
+        :param update_fields: The names of the saved fields.
+        :return: Whether the instance needs to be indexed again.
+        """
+        indexed_fields = set(self.indexed_fields())
+        indexed_fields.update(self.queryset_fields)
+        return not indexed_fields.isdisjoint(update_fields)
+
+    def all(
+        self,
+        offset: int,
+        page_size: int,
+        include_total: bool = True,
+    ) -> Tuple[List[GenericModel], int]:
+        """
+        Get all instances from the Solr index.
+        """
+        return self.search({}, offset, page_size, include_total)
+
+    def count(self, query: Dict[str, Any]) -> int:
+        """
+        Count the instances matching a query, without fetching any document.
+
+        :param query: The query to search for.
+        :return: The number of matching instances.
+        """
+        return get_search_backend().count(
+            self,
+            self.select_params(self.build_search_query(query)),
+            )
+
+    def document_hash(self, document: Dict[str, Any]) -> str:
+        """
+        Get a hash of the content of a Solr document, to compare it with
+        another one. Fields added by Solr, like _version_, are ignored.
+
+        :param document: The document, with its Solr field names.
+        :return: The hash.
+        """
+        content = {
+            key: value for key, value in document.items()
+            if not key.startswith("_")
+        }
+        serialized = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha1(serialized.encode()).hexdigest()
+
+    def document_id(self, pk: Any) -> str:
+        """
+        Get the id of the document that indexes the instance with a given
+        primary key.
+
+        :param pk: The primary key of the instance.
+        :return: The id of the document.
+        """
+        class_name = self.serializer_class.Meta.model.__name__.lower()
+        return f"{class_name}:{pk}"
+
+    def indexed_fields(self) -> List[str]:
+        """
+        Get the names of the model fields held by the documents: the fields
+        of the serializer and the extra fields.
 
-    def all(self, offset: int, page_size: int) -> Tuple[
+        :return: The names of the fields.
+        """
+        return [*self.serializer_class.Meta.fields, *self.extra_fields]
+
+    def field_list(self) -> List[str]:
+        """
+        Get the names of the Solr fields that hold the indexed fields, so
+        searches only fetch what is needed to build the instances.
+
+        :return: The names of the Solr fields.
+        """
+        return list(self.solr_fields().values())
+
+    def solr_fields(self) -> Dict[str, str]:
+        """
+        Get the name of the Solr field that holds each indexed field.
+
+        :return: The Solr field names, by field name.
+        """
+        return self.codec().solr_fields
+
+    def codec(self) -> FieldCodec:
+        """
+        Get the codec converting between the serialized instances and the
+        Solr documents. It is compiled once per indexer and serializer class.
+
+        :return: The codec.
+        """
+        key = (type(self), self.serializer_class)
+        codec = _codecs.get(key)
+        if codec is None:
+            codec = FieldCodec(
+                self.serializer_class.Meta.model,
+                self.indexed_fields(),
+                self.override_types,
+                )
+            _codecs[key] = codec
+        return codec
+
+    def decode_id(self, document_id: str) -> int:
+        """
+        Get the primary key of the instance indexed by a document.
+
+        :param document_id: The id of the document.
+        :return: The primary key.
+        """
+        return int(document_id.split(":", 1)[1])
+
+    def iter_all(
+        self,
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+    ) -> Iterator[GenericModel]:
+        """
+        Iterate over all the instances in the Solr index, sorted by id.
+
+        The documents are streamed from the export handler and parsed as
+        they arrive, so memory stays constant whatever the size of the
+        index. The export handler is not distributed, so on SolrCloud the
+        index is walked with a cursor instead, as it is when the export
+        handler rejects the request.
+
+        :param batch_size: The number of instances fetched per request when
+        walking the index with a cursor.
+        :return: An iterator over the instances.
+        """
+        if get_solr_cloud() is not None:
+            yield from self.iter_all_after(batch_size)
+            return
+        solr_query = self.build_search_query({})
+        docs = self.export(solr_query, self.field_list(), "id asc")
+        try:
+            first_doc = next(docs, None)
+        except SolrExportException:
+            yield from self.iter_all_after(batch_size)
+            return
+        if first_doc is None:
+            return
+        for doc in itertools.chain([first_doc], docs):
+            instance = self.hydrate(doc)
+            if instance is not None:
+                yield instance
+
+    def iter_all_after(
+        self,
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+    ) -> Iterator[GenericModel]:
+        """
+        Iterate over all the instances in the Solr index, sorted by id,
+        walking the index with a cursor.
+
+        :param batch_size: The number of instances fetched per request.
+        :return: An iterator over the instances.
+        """
+        cursor: Optional[str] = FIRST_PAGE_CURSOR
+        while cursor is not None:
+            results, _, cursor = self.search_after({}, cursor, batch_size)
+            yield from results
+
+    def iter_ids(
+        self,
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+    ) -> Iterator[int]:
+        """
+        Iterate over the primary keys of all the indexed instances, sorted by
+        document id. The index is walked with a cursor, so the cost of each
+        page does not grow with its position.
+
+        :param batch_size: The number of ids fetched per request.
+        :return: An iterator over the primary keys.
+        """
+        solr_query = self.build_search_query({})
+        cursor = FIRST_PAGE_CURSOR
+        while True:
+            response = self.select(
+                solr_query,
+                rows=batch_size,
+                params={"sort": "id asc", "cursorMark": cursor},
+                fields=["id"],
+                )
+            for doc in response.get("response", {}).get("docs", []):
+                yield self.reverse_transform_data(doc)["id"]
+            next_cursor = response.get("nextCursorMark", cursor)
+            if next_cursor == cursor:
+                return
+            cursor = next_cursor
+
+    def build_search_query(self, query: Dict[str, Any]) -> SolrQuery:
+        """
+        Build the query to search for instances of the model. Unless the
+        query is restricted to some ids, documents are filtered by the id
+        prefix of the model.
+
+        :param query: The query to search for.
+        :return: The built query.
+        """
+        if query.get("id", WILDCARD) != WILDCARD:
+            return self.build_query(query)
+        solr_query = self.build_query({
+            key: value for key, value in query.items() if key != "id"
+        })
+        solr_query.add("id", Prefix(self.document_id("")), is_filter=True)
+        return solr_query
+
+    def parse_search_response(self, response: Dict[str, Any]) -> Tuple[
         List[GenericModel],
         int
     ]:
         """
-        Get all instances from the Solr index.
+        Build the model instances from a response of the select handler.
+
+        :param response: The response from the Solr index.
+        :return: A tuple of (results, total_count).
+        """
+        resp_obj = response.get("response", {})
+        docs = resp_obj.get("docs", [])
+        total_count: int = int(resp_obj.get("numFound", 0))
+        return self.hydrate_many(docs), total_count
+
+    def get_many(self, pks: Iterable[Any]) -> List[GenericModel]:
         """
-        return self.search({}, offset, page_size)
+        Get instances by primary key with a single real-time get request.
+
+        :param pks: The primary keys of the instances.
+        :return: The instances found, in the order of the primary keys.
+        """
+        docs = self.real_time_get(
+            [self.document_id(pk) for pk in pks],
+            fields=self.field_list(),
+            )
+        return self.hydrate_many(docs)
+
+    def hydrate_many(self, docs: List[Dict[str, Any]]) -> List[GenericModel]:
+        """
+        Build the model instances of a list of Solr documents.
+
+        :param docs: The documents from the Solr index.
+        :return: The instances of the valid documents.
+        """
+        results: List[GenericModel] = []
+        for doc in docs:
+            instance = self.hydrate(doc)
+            if instance is not None:
+                results.append(instance)
+        return results
+
+    def hydrate(self, doc: Dict[str, Any]) -> Optional[GenericModel]:
+        """
+        Build a model instance from a Solr document.
+
+        The index is only written by the indexers, so its documents are
+        trusted and decoded straight into the serializer fields. With
+        strict_hydration (the SOLR_STRICT_HYDRATION setting), the decoded
+        data is validated by the serializer too, which is much slower.
+
+        :param doc: The document from the Solr index.
+        :return: The instance, None if the document is not valid.
+        """
+        model_cls: Type[GenericModel] = self.serializer_class.Meta.model
+        transformed_doc = self.reverse_transform_data(doc)
+        if not self.strict_hydration:
+            return model_cls(**transformed_doc)
+        serializer = self.serializer_class(data=transformed_doc)
+        if not serializer.is_valid():
+            return None
+        return model_cls(**transformed_doc)
 
     def search(
         self,
         query: Dict[str, Any],
         offset: int,
         page_size: int,
+        include_total: bool = True,
     ) -> tuple[List[GenericModel], int]:
         """
         Search the Solr index for a given query with pagination.
@@ -171,36 +1003,147 @@ class ModelIndexer(Indexer, ABC, Generic[GenericModel]):
         :param query: The query to search for.
         :param offset: The starting offset of the results.
         :param page_size: The number of results to return.
+        :param include_total: Whether the total count must be exact. If not,
+        Solr stops counting the hits past the requested page and the total
+        is only a lower bound.
         :return: A tuple of (results, total_count).
         """
-        if "id" not in query:
-            query["id"] = "*"
-        query_str = self.build_query(query)
-        response = self.select(query_str, start=offset, rows=page_size)
-        resp_obj = response.get("response", {})
-        docs = resp_obj.get("docs", [])
-        total_count: int = int(resp_obj.get("numFound", 0))
-        model_cls: Type[GenericModel] = self.serializer_class.Meta.model
-        results: List[GenericModel] = []
-        for doc in docs:
-            transformed_doc = self.reverse_transform_data(doc)
-            serializer = self.serializer_class(data=transformed_doc)
-            if serializer.is_valid():
-                instance = model_cls(**transformed_doc)
-                results.append(instance)
-        return results, total_count
+        solr_query = self.build_search_query(query)
+        cache = get_search_cache()
+        key = self.search_cache_key(query, offset, page_size, include_total)
+        response = cache.get(key) if cache is not None else None
+        if response is None:
+            response = self.select(
+                solr_query,
+                start=offset,
+                rows=page_size,
+                params=self.total_params(offset, page_size, include_total),
+                fields=self.field_list(),
+                )
+            if cache is not None:
+                cache.set(key, response, self.pinned_document_id(query))
+        return self.parse_search_response(response)
+
+    def search_after(
+        self,
+        query: Dict[str, Any],
+        cursor: str,
+        page_size: int,
+    ) -> Tuple[List[GenericModel], int, Optional[str]]:
+        """
+        Search the Solr index for a given query with cursor-based
+        pagination. The results are sorted by id and every page costs the
+        same, no matter how deep it is.
+
+        :param query: The query to search for.
+        :param cursor: The cursor returned with the previous page, or
+        FIRST_PAGE_CURSOR.
+        :param page_size: The number of results to return.
+        :return: A tuple of (results, total_count, next_cursor). The next
+        cursor is None on the last page.
+        :raises InvalidCursorException: If the cursor is not valid.
+        """
+        solr_query = self.build_search_query(query)
+        response = self.select(
+            solr_query,
+            rows=page_size,
+            params={"sort": "id asc", "cursorMark": cursor},
+            fields=self.field_list(),
+            )
+        results, total_count = self.parse_search_response(response)
+        docs = response.get("response", {}).get("docs", [])
+        next_cursor: Optional[str] = response.get("nextCursorMark")
+        if next_cursor == cursor or len(docs) < page_size:
+            next_cursor = None
+        return results, total_count, next_cursor
+
+    def search_cache_key(
+        self,
+        query: Dict[str, Any],
+        offset: int,
+        page_size: int,
+        include_total: bool = True,
+    ) -> Tuple[Any, ...]:
+        """
+        Get the key of a search in the search cache. The query parameters
+        are sorted so the same search always gets the same key.
+
+        :param query: The query to search for.
+        :param offset: The starting offset of the results.
+        :param page_size: The number of results to return.
+        :param include_total: Whether the total count is exact.
+        :return: The cache key.
+        """
+        normalized_query = tuple(sorted(
+            (key, repr(value)) for key, value in query.items()
+        ))
+        return (self.url, normalized_query, offset, page_size, include_total)
+
+    def total_params(
+        self,
+        offset: int,
+        page_size: int,
+        include_total: bool,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the select parameters that control how the hits are counted.
+
+        :param offset: The starting offset of the results.
+        :param page_size: The number of results to return.
+        :param include_total: Whether the total count must be exact.
+        :return: The parameters, None to count every hit.
+        """
+        if include_total:
+            return None
+        # One more hit than the page tells whether there are more pages
+        return {"minExactCount": offset + page_size + 1}
+
+    def pinned_document_id(self, query: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the id of the only document a query can return.
+
+        :param query: The query to search for.
+        :return: The document id, None if the query is not restricted to
+        one document.
+        """
+        id_value = query.get("id", WILDCARD)
+        if id_value == WILDCARD or isinstance(id_value, list):
+            return None
+        return self.document_id(id_value)
+
+    def to_document(self, instance: GenericModel) -> Dict[str, Any]:
+        """
+        Serialize an instance into the data to index.
+
+        :param instance: The instance to serialize.
+        :return: The data to index.
+        """
+        serializer = self.serializer_class(instance)
+        data: Dict[str, Any] = dict(serializer.data)
+        for name in self.extra_fields:
+            data[name] = getattr(instance, name)
+        for copy, source in self.copy_fields.items():
+            if source in data:
+                data[copy] = data[source]
+        return data
 
     def transform_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        transformed_data = super().transform_data(data)
-        if "id" in transformed_data:
-            id_value = transformed_data["id"]
-            class_name = self.serializer_class.Meta.model.__name__.lower()
-            transformed_data["id"] = f"{class_name}:{id_value}"
-        return transformed_data
+        return self.codec().encode(data)
 
     def reverse_transform_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        reverse_transformed_data = super().reverse_transform_data(data)
-        if "id" in reverse_transformed_data:
-            id_value = reverse_transformed_data["id"]
-            reverse_transformed_data["id"] = int(id_value.split(":")[1])
-        return reverse_transformed_data
+        return self.codec().decode(data)
+
+
+def get_model_indexer(model_label: str) -> ModelIndexer[Any]:
+    """
+    Get the indexer of a model, as registered in the SOLR_INDEXERS setting.
+
+    :param model_label: The lowercase label of the model, e.g. core.user.
+    :return: A new indexer for the model.
+    :raises LookupError: If the model is not indexed.
+    """
+    indexer_path = settings.SOLR_INDEXERS.get(model_label)
+    if indexer_path is None:
+        raise LookupError(f"No indexer registered for {model_label}")
+    indexer_cls: Callable[[], ModelIndexer[Any]] = import_string(indexer_path)
+    return indexer_cls()
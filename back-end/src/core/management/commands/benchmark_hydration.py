@@ -0,0 +1,71 @@
+import time
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand, CommandParser
+from user.indexer import UserIndexer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the time taken to build users from SOLR documents with and "
+        "without serializer validation. No SOLR server is needed."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--docs",
+            type=int,
+            default=100,
+            help="Number of documents per search response",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=20,
+            help="Number of times the documents are hydrated in each mode",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        docs = self.build_docs(options["docs"])
+        rounds: int = options["rounds"]
+        timings: Dict[bool, float] = {}
+        for strict in (True, False):
+            user_indexer = UserIndexer()
+            user_indexer.strict_hydration = strict
+            started_at = time.perf_counter()
+            for _ in range(rounds):
+                for doc in docs:
+                    user_indexer.hydrate(doc)
+            timings[strict] = time.perf_counter() - started_at
+            mode = "strict" if strict else "fast"
+            per_doc_us = timings[strict] / (rounds * len(docs)) * 1e6
+            self.stdout.write(
+                f"{mode}: {timings[strict]:.3f}s ({per_doc_us:.1f}us/doc)"
+            )
+        speedup = timings[True] / timings[False] if timings[False] else 0.0
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {speedup:.1f}x"))
+
+    def build_docs(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Build documents shaped like the ones returned by the user searches.
+
+        :param count: The number of documents to build.
+        :return: The documents.
+        """
+        user_indexer = UserIndexer()
+        docs: List[Dict[str, Any]] = []
+        for pk in range(1, count + 1):
+            doc: Dict[str, Any] = {}
+            for name, solr_name in user_indexer.solr_fields().items():
+                if name == "id":
+                    doc[solr_name] = user_indexer.document_id(pk)
+                elif solr_name.endswith("_b"):
+                    doc[solr_name] = pk % 2 == 0
+                elif solr_name.endswith("_i"):
+                    doc[solr_name] = pk
+                elif name == "email" or name == "email_ngram":
+                    doc[solr_name] = f"user{pk}@example.com"
+                else:
+                    doc[solr_name] = f"{name}-{pk}"
+            docs.append(doc)
+        return docs
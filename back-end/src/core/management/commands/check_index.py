@@ -0,0 +1,178 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import settings
+from core.indexer import ModelIndexer, chunked, get_model_indexer
+from core.solr import CommitPolicy
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Model
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the SOLR index with the database and reports the missing, "
+        "stale and orphaned documents, optionally repairing them"
+    )
+    verbosity = 1
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--model",
+            default="core.user",
+            choices=sorted(settings.SOLR_INDEXERS),
+            help="Label of the indexed model to check",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SOLR_BATCH_SIZE,
+            help="Number of rows and documents compared at once",
+        )
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help=(
+                "Index the missing and stale documents and remove the "
+                "orphaned ones"
+            ),
+        )
+        parser.add_argument(
+            "--commit-policy",
+            choices=CommitPolicy.MODES,
+            default=CommitPolicy.HARD,
+            help="How to commit the repairs",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        self.verbosity = options["verbosity"]
+        indexer = get_model_indexer(options["model"])
+        batch_size: int = options["batch_size"]
+        repair: bool = options["repair"]
+        commit_policy = CommitPolicy(options["commit_policy"])
+        batch_policy = commit_policy.for_batch()
+
+        missing, stale = self.check_rows(
+            indexer,
+            batch_size,
+            batch_policy if repair else None,
+            )
+        orphaned = self.check_documents(
+            indexer,
+            batch_size,
+            batch_policy if repair else None,
+            )
+
+        repaired = missing + stale + orphaned
+        if repair and repaired > 0 and commit_policy.mode in (
+            CommitPolicy.HARD,
+            CommitPolicy.SOFT,
+        ):
+            indexer.commit(soft=commit_policy.mode == CommitPolicy.SOFT)
+        summary = (
+            f"{missing} missing, {stale} stale and {orphaned} orphaned "
+            "documents"
+        )
+        if repair:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {summary}"))
+        elif repaired > 0:
+            self.stdout.write(self.style.WARNING(f"Found {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("The index is consistent"))
+
+    def check_rows(
+        self,
+        indexer: ModelIndexer[Any],
+        batch_size: int,
+        repair_policy: Optional[CommitPolicy],
+    ) -> Tuple[int, int]:
+        """
+        Walk the table in primary key order and compare each batch of rows
+        with their documents, fetched by id in a single request.
+
+        :param indexer: The indexer of the model.
+        :param batch_size: The number of rows per batch.
+        :param repair_policy: How to commit the reindexed rows, None to only
+        report them.
+        :return: The number of rows whose document is missing and of rows
+        whose document is stale.
+        """
+        manager = indexer.get_queryset()
+        missing = 0
+        stale = 0
+        last_pk: Any = None
+        while True:
+            rows = manager.order_by("pk")
+            if last_pk is not None:
+                rows = rows.filter(pk__gt=last_pk)
+            instances = list(rows[:batch_size])
+            if not instances:
+                return missing, stale
+            last_pk = instances[-1].pk
+
+            indexed_hashes: Dict[str, str] = {
+                doc["id"]: indexer.document_hash(doc)
+                for doc in indexer.real_time_get([
+                    indexer.document_id(instance.pk)
+                    for instance in instances
+                ])
+            }
+            outdated: List[Model] = []
+            for instance in instances:
+                document = indexer.transform_data(
+                    indexer.to_document(instance)
+                )
+                indexed_hash = indexed_hashes.get(document["id"])
+                if indexed_hash is None:
+                    missing += 1
+                    self.report("missing", document["id"])
+                elif indexed_hash != indexer.document_hash(document):
+                    stale += 1
+                    self.report("stale", document["id"])
+                else:
+                    continue
+                outdated.append(instance)
+            if repair_policy is not None and outdated:
+                indexer.add_many(outdated, batch_size, repair_policy)
+
+    def check_documents(
+        self,
+        indexer: ModelIndexer[Any],
+        batch_size: int,
+        repair_policy: Optional[CommitPolicy],
+    ) -> int:
+        """
+        Walk the index in document id order and look up each batch of
+        primary keys in the table.
+
+        :param indexer: The indexer of the model.
+        :param batch_size: The number of documents per batch.
+        :param repair_policy: How to commit the removal of the orphaned
+        documents, None to only report them.
+        :return: The number of documents whose row no longer exists or no
+        longer belongs in the index.
+        """
+        manager = indexer.get_queryset()
+        orphaned = 0
+        for pks in chunked(indexer.iter_ids(batch_size), batch_size):
+            existing_pks = set(
+                manager.filter(pk__in=pks).values_list("pk", flat=True)
+            )
+            orphaned_ids = [
+                indexer.document_id(pk) for pk in pks
+                if pk not in existing_pks
+            ]
+            for document_id in orphaned_ids:
+                self.report("orphaned", document_id)
+            orphaned += len(orphaned_ids)
+            if repair_policy is not None:
+                indexer.delete(orphaned_ids, repair_policy)
+        return orphaned
+
+    def report(self, problem: str, document_id: str) -> None:
+        """
+        Print an inconsistent document when the verbosity is 2 or more.
+
+        :param problem: What is wrong with the document.
+        :param document_id: The id of the document.
+        """
+        if self.verbosity >= 2:
+            self.stdout.write(f"{problem}: {document_id}")
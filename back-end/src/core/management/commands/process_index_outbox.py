@@ -0,0 +1,48 @@
+import time
+from typing import Any
+
+from app import settings
+from core.outbox import drain
+from django.core.management.base import BaseCommand, CommandParser
+
+
+class Command(BaseCommand):
+    help = "Delivers the pending index changes of the outbox to SOLR"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SOLR_BATCH_SIZE,
+            help="Number of outbox entries delivered at once",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting when empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls when the outbox is empty",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        batch_size: int = options["batch_size"]
+        delivered_total = 0
+        failed_total = 0
+        while True:
+            delivered, failed = drain(batch_size)
+            delivered_total += delivered
+            failed_total += failed
+            if delivered == 0 and failed == 0:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Delivered {delivered_total} outbox entries, "
+                f"{failed_total} failed"
+            )
+        )
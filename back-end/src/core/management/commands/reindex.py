@@ -1,20 +1,495 @@
-from typing import Any
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List, Optional, Tuple
 
+from app import settings
+from core import tombstones
+from core.indexer import chunked
+from core.models import IndexWatermark
+from core.solr import CommitPolicy
+from core.solr_admin import core_exists, create_core, swap_cores, unload_core
+from core.solr_cloud import get_solr_cloud
 from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
+from django.core.management.base import (
+    BaseCommand, CommandError, CommandParser,
+)
+from django.db import connections
+from django.db.models import Max, Min, Q
+from django.utils import timezone
 from user.indexer import UserIndexer
 
 User = get_user_model()
 
+WATERMARK_NAME = "user"
+# Rows saved while the previous run was starting may carry a slightly older
+# timestamp, so they are looked up again. Reindexing them twice is harmless.
+WATERMARK_OVERLAP = timedelta(minutes=1)
+# Watermark recording when the live core was last swapped
+SWAP_WATERMARK_NAME = "user_swap"
+
+
+def get_user_indexer(core: Optional[str] = None) -> UserIndexer:
+    """
+    Get an indexer writing to a given core.
+
+    :param core: The name of the core. Defaults to SOLR_CORE.
+    :return: The indexer.
+    """
+    user_indexer = UserIndexer()
+    if core is not None:
+        user_indexer.core = core
+    return user_indexer
+
+
+def index_user_range(
+    start: int,
+    end: int,
+    batch_size: int,
+    commit_policy: Optional[CommitPolicy],
+    core: Optional[str] = None,
+) -> int:
+    """
+    Index the users whose primary key is in [start, end). The rows are
+    streamed with a server-side cursor so memory stays bounded.
+
+    :param start: The first primary key of the range.
+    :param end: The primary key after the last one of the range.
+    :param batch_size: The number of users per update request.
+    :param commit_policy: How to commit the users, None to not commit.
+    :param core: The core to index the users into. Defaults to SOLR_CORE.
+    :return: The number of indexed users.
+    """
+    user_indexer = get_user_indexer(core)
+    users = (
+        user_indexer.get_queryset()
+        .filter(pk__gte=start, pk__lt=end)
+        .order_by("pk")
+        .iterator(chunk_size=batch_size)
+    )
+    return user_indexer.add_many(
+        users,
+        batch_size=batch_size,
+        commit_policy=commit_policy or CommitPolicy(CommitPolicy.NONE),
+        )
+
 
 class Command(BaseCommand):
     help = "Updates the SOLR index for the User model"
 
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.SOLR_BATCH_SIZE,
+            help="Number of users sent to SOLR per update request",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Size of the primary key range indexed by each task",
+        )
+        parser.add_argument(
+            "--commit-policy",
+            choices=CommitPolicy.MODES,
+            default=CommitPolicy.HARD,
+            help="How to commit the reindexed users",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Only index the users created or modified since the last "
+                "incremental run and remove the deleted ones"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes indexing in parallel",
+        )
+        parser.add_argument(
+            "--blue-green",
+            action="store_true",
+            help=(
+                "Rebuild the index into a standby core and swap it with the "
+                "live core once its user count matches the database. The "
+                "previous index is kept in the standby core"
+            ),
+        )
+        parser.add_argument(
+            "--rollback",
+            action="store_true",
+            help=(
+                "Swap the live core back with the standby core holding the "
+                "previous index"
+            ),
+        )
+
     def handle(self, *args: Any, **options: Any) -> None:
-        all_users = User.objects.all()
-        user_indexer = UserIndexer()
-        for user in all_users:
-            user_indexer.add(user)
+        batch_size: int = options["batch_size"]
+        chunk_size: int = options["chunk_size"]
+        workers: int = options["workers"]
+        commit_policy = CommitPolicy(options["commit_policy"])
+        batch_policy = commit_policy.for_batch()
+
+        if get_solr_cloud() is not None and (
+            options["blue_green"] or options["rollback"]
+        ):
+            raise CommandError(
+                "Blue/green reindexes swap cores, which requires Solr to run "
+                "in standalone mode"
+            )
+        if options["rollback"]:
+            count = self.rollback(batch_size)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rolled back to the previous index and reindexed "
+                    f"{count} users modified since the swap"
+                )
+            )
+            return
+
+        started_at = time.monotonic()
+        removed = 0
+        if options["incremental"]:
+            count, removed = self.index_incremental(batch_size, batch_policy)
+        elif options["blue_green"]:
+            count = self.index_blue_green(batch_size, chunk_size, workers)
+        else:
+            count = self.index_all(
+                batch_size,
+                chunk_size,
+                workers,
+                batch_policy,
+                )
+            removed = UserIndexer().purge_inactive(
+                batch_size,
+                batch_policy,
+                )
+
+        if count + removed > 0 and commit_policy.mode in (
+            CommitPolicy.HARD,
+            CommitPolicy.SOFT,
+        ):
+            UserIndexer().commit(soft=commit_policy.mode == CommitPolicy.SOFT)
+        elapsed = time.monotonic() - started_at
+        rate = count / elapsed if elapsed > 0 else 0.0
         self.stdout.write(
-            self.style.SUCCESS("Successfully reindexed users")
+            self.style.SUCCESS(
+                f"Successfully reindexed {count} users and removed {removed} "
+                f"deleted or inactive users in {elapsed:.2f}s "
+                f"({rate:.1f} docs/sec)"
+            )
         )
+
+    def index_all(
+        self,
+        batch_size: int,
+        chunk_size: int,
+        workers: int,
+        batch_policy: Optional[CommitPolicy],
+        core: Optional[str] = None,
+    ) -> int:
+        """
+        Index every user, splitting the table in primary key ranges that are
+        indexed by `workers` processes.
+
+        :param batch_size: The number of users per update request.
+        :param chunk_size: The size of each primary key range.
+        :param workers: The number of worker processes.
+        :param batch_policy: How to commit each batch, None to not commit.
+        :param core: The core to index the users into. Defaults to SOLR_CORE.
+        :return: The number of indexed users.
+        """
+        ranges = self.get_pk_ranges(chunk_size)
+        if workers <= 1:
+            return sum(
+                index_user_range(start, end, batch_size, batch_policy, core)
+                for start, end in ranges
+            )
+        # Forked workers must not share the parent's DB connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    index_user_range,
+                    start,
+                    end,
+                    batch_size,
+                    batch_policy,
+                    core,
+                )
+                for start, end in ranges
+            ]
+            return sum(future.result() for future in futures)
+
+    def index_blue_green(
+        self,
+        batch_size: int,
+        chunk_size: int,
+        workers: int,
+    ) -> int:
+        """
+        Rebuild the index into the standby core while the live core keeps
+        serving queries and receiving writes, then swap both cores. The
+        swap is aborted if the rebuilt index does not hold every user.
+
+        :param batch_size: The number of users per update request.
+        :param chunk_size: The size of each primary key range.
+        :param workers: The number of worker processes.
+        :return: The number of users indexed by the rebuild.
+        :raises CommandError: If the user count of the rebuilt index does
+        not match the database.
+        """
+        standby_core = settings.SOLR_STANDBY_CORE
+        # The standby core holds the index replaced by the previous swap
+        if core_exists(standby_core):
+            unload_core(standby_core)
+        create_core(standby_core)
+        standby_indexer = get_user_indexer(standby_core)
+
+        build_started_at = timezone.now()
+        count = self.index_all(
+            batch_size,
+            chunk_size,
+            workers,
+            None,
+            standby_core,
+            )
+        # Writes made during the build only reached the live core
+        catch_up_started_at = timezone.now()
+        self.index_modified_since(
+            standby_indexer,
+            build_started_at,
+            batch_size,
+            )
+        standby_indexer.commit()
+
+        indexed_count = standby_indexer.count({})
+        expected_count = standby_indexer.get_queryset().count()
+        if indexed_count != expected_count:
+            raise CommandError(
+                f"The rebuilt index holds {indexed_count} users instead of "
+                f"{expected_count}, the live core was left untouched"
+            )
+        swap_cores(settings.SOLR_CORE, standby_core)
+        self.record_swap()
+        self.index_modified_since(
+            get_user_indexer(),
+            catch_up_started_at,
+            batch_size,
+            )
+        return count
+
+    def rollback(self, batch_size: int) -> int:
+        """
+        Swap the live core with the standby core holding the previous index,
+        reindex the users modified since the last swap into it and remove
+        the ones deleted or deactivated since then.
+
+        :param batch_size: The number of users per update request.
+        :return: The number of reindexed users.
+        :raises CommandError: If there is no standby core.
+        """
+        standby_core = settings.SOLR_STANDBY_CORE
+        if not core_exists(standby_core):
+            raise CommandError("There is no previous index to roll back to")
+        watermark = IndexWatermark.objects.filter(
+            name=SWAP_WATERMARK_NAME
+        ).first()
+        swap_cores(settings.SOLR_CORE, standby_core)
+        self.record_swap()
+        if watermark is None:
+            return 0
+        user_indexer = get_user_indexer()
+        count = self.index_modified_since(
+            user_indexer,
+            watermark.modified_at,
+            batch_size,
+            )
+        user_indexer.commit()
+        return count
+
+    def index_modified_since(
+        self,
+        user_indexer: UserIndexer,
+        since: datetime,
+        batch_size: int,
+    ) -> int:
+        """
+        Index the users created or modified since a given moment, and
+        remove the ones deleted or deactivated since then.
+
+        :param user_indexer: The indexer to index the users with.
+        :param since: The moment, which is moved back by WATERMARK_OVERLAP.
+        :param batch_size: The number of users per update request.
+        :return: The number of indexed users.
+        """
+        modified_users = User.objects.filter(
+            updated_at__gte=since - WATERMARK_OVERLAP
+        )
+        indexable_users = user_indexer.get_queryset().filter(
+            pk__in=modified_users.values("pk")
+        )
+        count = user_indexer.add_many(
+            indexable_users.order_by("pk").iterator(chunk_size=batch_size),
+            batch_size=batch_size,
+            commit_policy=CommitPolicy(CommitPolicy.NONE),
+            )
+        # Users deleted or deactivated since then must not be left behind
+        self.remove_deleted_users(
+            user_indexer,
+            since,
+            batch_size,
+            CommitPolicy(CommitPolicy.NONE),
+            )
+        return count
+
+    def record_swap(self) -> None:
+        """
+        Record that the live core was just swapped.
+        """
+        IndexWatermark.objects.update_or_create(
+            name=SWAP_WATERMARK_NAME,
+            defaults={"max_pk": 0, "modified_at": timezone.now()},
+        )
+
+    def index_incremental(
+        self,
+        batch_size: int,
+        batch_policy: Optional[CommitPolicy],
+    ) -> Tuple[int, int]:
+        """
+        Index the users created or modified since the last incremental run,
+        remove the deleted ones from the index and move the watermark
+        forward.
+
+        :param batch_size: The number of users per update request.
+        :param batch_policy: How to commit each batch, None to not commit.
+        :return: The number of indexed users and of removed users.
+        """
+        user_indexer = UserIndexer()
+        policy = batch_policy or CommitPolicy(CommitPolicy.NONE)
+        run_started_at = timezone.now()
+        watermark = IndexWatermark.objects.filter(name=WATERMARK_NAME).first()
+
+        removed = self.remove_deleted_users(
+            user_indexer,
+            watermark.modified_at if watermark else None,
+            batch_size,
+            policy,
+            )
+
+        users = user_indexer.get_queryset()
+        max_pk = 0
+        if watermark is not None:
+            max_pk = watermark.max_pk
+            users = users.filter(
+                Q(pk__gt=watermark.max_pk)
+                | Q(updated_at__gte=watermark.modified_at - WATERMARK_OVERLAP)
+            )
+
+        def track_max_pk(users: Iterator[Any]) -> Iterator[Any]:
+            nonlocal max_pk
+            for user in users:
+                max_pk = max(max_pk, user.pk)
+                yield user
+
+        count = user_indexer.add_many(
+            track_max_pk(users.order_by("pk").iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+            commit_policy=policy,
+            )
+        IndexWatermark.objects.update_or_create(
+            name=WATERMARK_NAME,
+            defaults={"max_pk": max_pk, "modified_at": run_started_at},
+        )
+        self.prune_tombstones()
+        return count, removed
+
+    def remove_deleted_users(
+        self,
+        user_indexer: UserIndexer,
+        since: Optional[datetime],
+        batch_size: int,
+        commit_policy: CommitPolicy,
+    ) -> int:
+        """
+        Remove from the index the users deleted or deactivated since a given
+        moment. The deleted users are found from their tombstones rather
+        than by walking the index, whose size is unbounded, see
+        core.tombstones.
+
+        :param user_indexer: The indexer to remove the users from.
+        :param since: The moment, which is moved back by WATERMARK_OVERLAP.
+        None for every tracked deletion and every inactive user.
+        :param batch_size: The number of users per update request.
+        :param commit_policy: How to commit the removal.
+        :return: The number of removed users.
+        """
+        if since is not None:
+            since -= WATERMARK_OVERLAP
+        deleted_pks = tombstones.deleted_since(
+            User._meta.label_lower,
+            since,
+            )
+        users = User.objects.all()
+        if since is not None:
+            users = users.filter(updated_at__gte=since)
+        deactivated_pks = (
+            users
+            .exclude(pk__in=user_indexer.get_queryset().values("pk"))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        removed = 0
+        for pks in chunked(
+            itertools.chain(
+                deleted_pks.iterator(chunk_size=batch_size),
+                deactivated_pks.iterator(chunk_size=batch_size),
+            ),
+            batch_size,
+        ):
+            user_indexer.delete(
+                [user_indexer.document_id(pk) for pk in pks],
+                commit_policy,
+                )
+            removed += len(pks)
+        return removed
+
+    def prune_tombstones(self) -> None:
+        """
+        Delete the tombstones that neither the next incremental run nor a
+        rollback will look up.
+        """
+        watermarks = IndexWatermark.objects.filter(
+            name__in=[WATERMARK_NAME, SWAP_WATERMARK_NAME]
+        )
+        oldest = watermarks.aggregate(oldest=Min("modified_at"))["oldest"]
+        if oldest is not None:
+            tombstones.prune(oldest - WATERMARK_OVERLAP)
+
+    def get_pk_ranges(self, chunk_size: int) -> List[Tuple[int, int]]:
+        """
+        Split the user table into primary key ranges of `chunk_size`.
+
+        :param chunk_size: The size of each range.
+        :return: The list of [start, end) ranges.
+        """
+        bounds = User.objects.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+        min_pk: Optional[int] = bounds["min_pk"]
+        max_pk: Optional[int] = bounds["max_pk"]
+        if min_pk is None or max_pk is None:
+            return []
+        return [
+            (start, min(start + chunk_size, max_pk + 1))
+            for start in range(min_pk, max_pk + 1, chunk_size)
+        ]
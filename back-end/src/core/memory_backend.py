@@ -0,0 +1,524 @@
+"""
+In-memory search backend, for the tests, local development and benchmarks
+that should not need a Solr server.
+
+The documents of each core are kept in the memory of the process, and
+writes are visible right away whatever their commit policy. Queries support
+the subset of the standard query parser that core.query emits: AND-ed
+field clauses, possibly negated, whose values are literals, prefixes,
+wildcards or OR-ed groups of them. Values are matched according to the type
+suffix of their field, like the analysis of the schema:
+
+- `_ng`: a query token of 3 to 15 characters matches a lowercased token of
+  the value that contains it.
+- `_t`: a lowercased query token matches an equal token of the value.
+- Any other field: the value matches the literal, as a string.
+
+Results are not scored: they follow the requested sort, or the order in
+which the documents were first added.
+"""
+import base64
+import json
+import re
+import threading
+from typing import (
+    TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union,
+)
+
+from core.indexer import FIRST_PAGE_CURSOR
+from core.search_backend import (
+    InvalidCursorException, SearchBackend, VersionConflictException,
+)
+from core.solr import CommitPolicy
+
+if TYPE_CHECKING:
+    from core.indexer import Indexer
+
+# Tokens of the text fields, close to the words of Solr's standard tokenizer
+TOKEN_PATTERN = re.compile(r"\w+(?:[.']\w+)*")
+
+# Sizes of the n-grams indexed for the _ng fields
+MIN_GRAM_SIZE = 3
+MAX_GRAM_SIZE = 15
+
+# Number of rows returned when the request does not tell
+DEFAULT_ROWS = 10
+
+Document = Dict[str, Any]
+
+
+class Term:
+    """
+    Value of a query clause.
+    """
+
+    value: str
+    is_prefix: bool
+    is_wildcard: bool
+
+    def __init__(
+        self,
+        value: str,
+        is_prefix: bool = False,
+        is_wildcard: bool = False,
+    ) -> None:
+        self.value = value
+        self.is_prefix = is_prefix
+        self.is_wildcard = is_wildcard
+
+
+# Field of a clause, its terms, any of which must match, and whether the
+# clause is negated
+Clause = Tuple[str, List[Term], bool]
+
+
+def split_unescaped(text: str, separator: str) -> List[str]:
+    """
+    Split a query on a separator that is neither escaped nor inside
+    parentheses.
+
+    :param text: The query.
+    :param separator: The separator.
+    :return: The parts of the query.
+    """
+    parts = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and text.startswith(separator, i):
+            parts.append(text[start:i])
+            i += len(separator)
+            start = i
+            continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_term(text: str) -> Term:
+    """
+    Parse the value of a clause.
+
+    :param text: The escaped value.
+    :return: The term.
+    """
+    if text == "*":
+        return Term("", is_wildcard=True)
+    chars = []
+    is_prefix = False
+    i = 0
+    while i < len(text):
+        if text[i] == "\\" and i + 1 < len(text):
+            chars.append(text[i + 1])
+            i += 2
+            continue
+        if text[i] == "*" and i == len(text) - 1:
+            is_prefix = True
+        else:
+            chars.append(text[i])
+        i += 1
+    return Term("".join(chars), is_prefix=is_prefix)
+
+
+def parse_query(query: str) -> List[Clause]:
+    """
+    Parse a query compiled by core.query.
+
+    :param query: The query.
+    :return: The clauses, all of which must match. No clauses for `*:*`,
+    which matches every document.
+    """
+    if query.strip() in ("", "*:*"):
+        return []
+    clauses = []
+    for part in split_unescaped(query.strip(), " AND "):
+        is_negated = part.startswith("-")
+        if is_negated:
+            part = part[1:]
+        field = split_unescaped(part, ":")[0]
+        value = part[len(field) + 1:]
+        if value.startswith("(") and value.endswith(")"):
+            terms = split_unescaped(value[1:-1], " OR ")
+        else:
+            terms = [value]
+        clauses.append((
+            field,
+            [parse_term(term) for term in terms],
+            is_negated,
+        ))
+    return clauses
+
+
+def value_text(value: Any) -> str:
+    """
+    Get the text a stored value is matched as.
+
+    :param value: The value.
+    :return: The text.
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def matches_term(field: str, value: Any, term: Term) -> bool:
+    """
+    Check whether the value of a field matches a term.
+
+    :param field: The name of the field.
+    :param value: The value, None if the document does not have the field.
+    :param term: The term.
+    :return: Whether it matches.
+    """
+    if term.is_wildcard:
+        # *:* matches every document
+        return field == "*" or value is not None
+    if value is None:
+        return False
+    values = value if isinstance(value, list) else [value]
+    for item in values:
+        text = value_text(item)
+        if field.endswith("_ng"):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            if any(
+                MIN_GRAM_SIZE <= len(query_token) <= MAX_GRAM_SIZE
+                and any(query_token in token for token in tokens)
+                for query_token in TOKEN_PATTERN.findall(term.value.lower())
+            ):
+                return True
+        elif field.endswith("_t"):
+            words = set(TOKEN_PATTERN.findall(text.lower()))
+            if not words.isdisjoint(
+                TOKEN_PATTERN.findall(term.value.lower())
+            ):
+                return True
+        elif term.is_prefix:
+            if text.startswith(term.value):
+                return True
+        elif text == term.value:
+            return True
+    return False
+
+
+def matches(document: Document, clauses: List[Clause]) -> bool:
+    """
+    Check whether a document matches every clause of a query.
+
+    :param document: The document.
+    :param clauses: The clauses.
+    :return: Whether it matches.
+    """
+    return all(
+        is_negated != any(
+            matches_term(field, document.get(field), term) for term in terms
+        )
+        for field, terms, is_negated in clauses
+    )
+
+
+def parse_sort(sort: str) -> List[Tuple[str, bool]]:
+    """
+    Parse a sort parameter, e.g. "id asc".
+
+    :param sort: The sort.
+    :return: The field and whether it is descending, for each sort key.
+    """
+    keys = []
+    for key in sort.split(","):
+        field, _, direction = key.strip().partition(" ")
+        keys.append((field, direction.strip().lower() == "desc"))
+    return keys
+
+
+class SortKey:
+    """
+    Comparable sort values of a document. Missing values sort last.
+    """
+
+    values: List[Any]
+    descending: List[bool]
+
+    def __init__(self, values: List[Any], descending: List[bool]) -> None:
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other: "SortKey") -> bool:
+        for value, other_value, descending in zip(
+            self.values,
+            other.values,
+            self.descending,
+        ):
+            if value == other_value:
+                continue
+            if value is None:
+                return False
+            if other_value is None:
+                return True
+            return bool(
+                value > other_value if descending else value < other_value
+            )
+        return False
+
+
+class MemoryBackend(SearchBackend):
+    """
+    Backend keeping the documents in the memory of the process.
+    """
+
+    cores: Dict[str, Dict[str, Document]]
+
+    def __init__(self) -> None:
+        self.cores = {}
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        """
+        Remove every document of every core.
+        """
+        with self._lock:
+            self.cores = {}
+
+    def documents(self, indexer: "Indexer") -> List[Document]:
+        """
+        Get a snapshot of the documents of the core of an indexer.
+
+        :param indexer: The indexer.
+        :return: The documents, in the order they were first added.
+        """
+        with self._lock:
+            return list(self.cores.get(indexer.core, {}).values())
+
+    def search(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+    ) -> List[Document]:
+        """
+        Get the documents matching the q and fq parameters, sorted by the
+        sort parameter.
+
+        :param indexer: The indexer making the request.
+        :param params: The request parameters.
+        :return: The matching documents.
+        """
+        filters: Union[str, List[str]] = params.get("fq", [])
+        clauses = parse_query(str(params.get("q", "*:*")))
+        for filter_query in [filters] if isinstance(filters, str) else filters:
+            clauses.extend(parse_query(filter_query))
+        docs = [
+            doc for doc in self.documents(indexer) if matches(doc, clauses)
+        ]
+        sort = params.get("sort")
+        if sort:
+            docs.sort(key=lambda doc: self.sort_key(doc, sort))
+        return docs
+
+    def sort_key(self, document: Document, sort: str) -> SortKey:
+        """
+        Get the sort values of a document.
+
+        :param document: The document.
+        :param sort: The sort parameter.
+        :return: The sort key.
+        """
+        keys = parse_sort(sort)
+        return SortKey(
+            [document.get(field) for field, _ in keys],
+            [descending for _, descending in keys],
+        )
+
+    def select(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        docs = self.search(indexer, params)
+        rows = int(params.get("rows", DEFAULT_ROWS))
+        start = int(params.get("start", 0))
+        response: Dict[str, Any] = {}
+        cursor = params.get("cursorMark")
+        if cursor is not None:
+            if start != 0 or not params.get("sort"):
+                raise InvalidCursorException(
+                    "Cursors need a sort and no start"
+                    )
+            page_start = self.cursor_position(docs, cursor, params["sort"])
+            page = docs[page_start:page_start + rows]
+            response["nextCursorMark"] = (
+                self.encode_cursor(page[-1], params["sort"]) if page
+                else cursor
+            )
+        else:
+            page = docs[start:start + rows]
+        response["response"] = {
+            "numFound": len(docs),
+            "start": start,
+            "numFoundExact": True,
+            "docs": [self.project(doc, params.get("fl")) for doc in page],
+        }
+        return response
+
+    def cursor_position(
+        self,
+        docs: List[Document],
+        cursor: str,
+        sort: str,
+    ) -> int:
+        """
+        Get the position of the first document after a cursor.
+
+        :param docs: The sorted documents.
+        :param cursor: The cursor.
+        :param sort: The sort parameter.
+        :return: The position.
+        :raises InvalidCursorException: If the cursor can not be decoded.
+        """
+        if cursor == FIRST_PAGE_CURSOR:
+            return 0
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError as e:
+            raise InvalidCursorException("Invalid cursor") from e
+        keys = parse_sort(sort)
+        last_key = SortKey(values, [descending for _, descending in keys])
+        for position, doc in enumerate(docs):
+            if last_key < self.sort_key(doc, sort):
+                return position
+        return len(docs)
+
+    def encode_cursor(self, document: Document, sort: str) -> str:
+        """
+        Encode the cursor pointing after a document.
+
+        :param document: The last document of a page.
+        :param sort: The sort parameter.
+        :return: The cursor.
+        """
+        values = self.sort_key(document, sort).values
+        return base64.urlsafe_b64encode(
+            json.dumps(values, default=str).encode()
+        ).decode()
+
+    def project(self, document: Document, fields: Optional[str]) -> Document:
+        """
+        Keep the requested fields of a document.
+
+        :param document: The document.
+        :param fields: The fl parameter, all the fields if not given.
+        :return: A copy of the document.
+        """
+        if not fields or fields == "*":
+            return dict(document)
+        names = {name.strip() for name in fields.split(",")}
+        return {
+            key: value for key, value in document.items() if key in names
+        }
+
+    def real_time_get(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, str],
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            core = self.cores.get(indexer.core, {})
+            docs = [
+                core[document_id]
+                for document_id in params["ids"].split(",")
+                if document_id in core
+            ]
+        return [self.project(doc, params.get("fl")) for doc in docs]
+
+    def export(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        for doc in self.search(indexer, params):
+            yield self.project(doc, params.get("fl"))
+
+    def update(
+        self,
+        indexer: "Indexer",
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        with self._lock:
+            core = self.cores.setdefault(indexer.core, {})
+            for document in documents:
+                document_id = document["id"]
+                existing = core.get(document_id)
+                version = document.get("_version_")
+                if (
+                    (version == 1 and existing is None)
+                    or (version is not None and version < 0 and existing)
+                ):
+                    raise VersionConflictException(
+                        f"Version conflict for {document_id}"
+                    )
+                core[document_id] = self.apply(existing, document)
+
+    def apply(
+        self,
+        existing: Optional[Document],
+        document: Document,
+    ) -> Document:
+        """
+        Apply an added document or an atomic update.
+
+        :param existing: The current document, if any.
+        :param document: The added document or the atomic update.
+        :return: The new document.
+        """
+        is_atomic = any(
+            isinstance(value, dict) and "set" in value
+            for value in document.values()
+        )
+        result: Document = dict(existing or {}) if is_atomic else {}
+        for key, value in document.items():
+            if key == "_version_":
+                continue
+            if isinstance(value, dict) and "set" in value:
+                value = value["set"]
+            if value is None:
+                result.pop(key, None)
+            else:
+                result[key] = value
+        return result
+
+    def delete(
+        self,
+        indexer: "Indexer",
+        ids: List[str],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        with self._lock:
+            core = self.cores.get(indexer.core, {})
+            for document_id in ids:
+                core.pop(document_id, None)
+
+    def delete_by_query(
+        self,
+        indexer: "Indexer",
+        query: str,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        clauses = parse_query(query)
+        with self._lock:
+            core = self.cores.get(indexer.core, {})
+            for document_id, doc in list(core.items()):
+                if matches(doc, clauses):
+                    del core[document_id]
+
+    def commit(self, indexer: "Indexer", soft: bool = False) -> None:
+        # Writes are visible right away
+        pass
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_indexoutboxentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="indexoutboxentry",
+            name="fields",
+            field=models.JSONField(null=True),
+        ),
+    ]
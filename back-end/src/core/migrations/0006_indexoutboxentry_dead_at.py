@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_indexoutboxentry_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="indexoutboxentry",
+            name="dead_at",
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_indextombstone"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="indexoutboxentry",
+            name="fields",
+        ),
+    ]
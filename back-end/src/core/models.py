@@ -10,6 +10,8 @@ from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin,
 )
 from django.db import models
+from django.db.models.functions import Now
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager['User']):
@@ -62,6 +64,13 @@ class User(AbstractBaseUser, PermissionsMixin):
         auto_now_add=True
         )
 
+    """When the user was last modified, used for incremental reindexing"""
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_default=Now(),
+        db_index=True
+        )
+
     """Whether the user is active or not"""
     is_active = models.BooleanField(default=True)
 
@@ -69,3 +78,66 @@ class User(AbstractBaseUser, PermissionsMixin):
     objects = UserManager()
 
     USERNAME_FIELD = "username"
+
+
+class IndexWatermark(models.Model):
+    """Progress of the last successful incremental reindex of a model"""
+
+    """The name of the indexed model"""
+    name = models.CharField(
+        max_length=255,
+        unique=True
+        )
+
+    """The highest primary key indexed so far"""
+    max_pk = models.BigIntegerField(default=0)
+
+    """Rows modified after this moment need to be indexed again"""
+    modified_at = models.DateTimeField()
+
+
+class IndexOutboxEntry(models.Model):
+    """
+    Pending change of an indexed object. Entries are written in the same
+    transaction as the change and delivered to Solr by a background worker.
+    """
+
+    """The label of the model of the changed object, e.g. core.user"""
+    model_label = models.CharField(max_length=255)
+
+    """The primary key of the changed object"""
+    object_id = models.BigIntegerField()
+
+    """When the change happened"""
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    """How many times the delivery has failed"""
+    attempts = models.IntegerField(default=0)
+
+    """The entry is not delivered before this moment"""
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True
+        )
+
+    """The error of the last failed delivery"""
+    last_error = models.TextField(null=True)
+
+    """When the entry was given up after too many failed deliveries"""
+    dead_at = models.DateTimeField(null=True, db_index=True)
+
+
+class IndexTombstone(models.Model):
+    """
+    Deleted instance of an indexed model, so incremental reindexes can
+    remove it from the index without walking the whole index.
+    """
+
+    """The label of the model of the deleted object, e.g. core.user"""
+    model_label = models.CharField(max_length=255)
+
+    """The primary key of the deleted object"""
+    object_id = models.BigIntegerField()
+
+    """When the object was deleted"""
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
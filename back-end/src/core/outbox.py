@@ -0,0 +1,294 @@
+"""
+Transactional outbox for index writes.
+
+Changes to indexed objects are recorded as IndexOutboxEntry rows in the
+same DB transaction as the change itself, so they can never be lost. The
+entries are then delivered to Solr by the process_index_outbox worker,
+which retries failed deliveries. Entries that keep failing are given up
+after SOLR_OUTBOX_MAX_ATTEMPTS attempts, and left in the table with their
+dead_at set for inspection.
+
+With SOLR_OUTBOX_DELIVER_ON_COMMIT, the entries enqueued by a transaction
+are also delivered together once it commits, by a background thread so the
+request does not wait for Solr. A transaction changing many objects makes a
+single batch of index updates, and the entries of a rolled back transaction
+or savepoint are never delivered.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app import settings
+from core.indexer import ModelIndexer, get_model_indexer
+from core.models import IndexOutboxEntry
+from core.solr import CommitPolicy
+from django.db import close_old_connections, transaction
+from django.db.models import Model
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = timedelta(hours=1)
+# Time during which the entries claimed by a worker are left alone by the
+# others. Entries whose worker died while delivering them are drained again
+# once it is over.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class PendingDelivery:
+    """
+    Entries enqueued by the current transaction of a thread, or by one of
+    its savepoints, delivered together once it commits.
+    """
+
+    entries: List[IndexOutboxEntry]
+
+    def __init__(self, entries: List[IndexOutboxEntry]) -> None:
+        self.entries = entries
+
+    def deliver(self) -> None:
+        """
+        Hand the entries to the delivery thread. Registered to run once the
+        transaction commits.
+        """
+        get_delivery_executor().submit(deliver_in_background, self.entries)
+
+
+# Pending deliveries of each thread, by the savepoint ids of the transaction
+# that enqueued them. Django connections are bound to a thread, so is the
+# current transaction.
+_pending = threading.local()
+_delivery_executor: Optional[ThreadPoolExecutor] = None
+_delivery_executor_pid: Optional[int] = None
+_delivery_executor_lock = threading.Lock()
+
+
+def get_delivery_executor() -> ThreadPoolExecutor:
+    """
+    Get the thread delivering the entries once their transaction commits. A
+    single thread keeps the deliveries in commit order. Like the Solr
+    session, it is not shared with forked processes.
+
+    :return: The executor for the current process.
+    """
+    global _delivery_executor, _delivery_executor_pid
+    pid = os.getpid()
+    if _delivery_executor is not None and _delivery_executor_pid == pid:
+        return _delivery_executor
+    with _delivery_executor_lock:
+        if _delivery_executor is None or _delivery_executor_pid != pid:
+            _delivery_executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="index-delivery",
+            )
+            _delivery_executor_pid = pid
+        return _delivery_executor
+
+
+def enqueue(instance: Model) -> IndexOutboxEntry:
+    """
+    Record that an instance needs to be (re)indexed. It must be called
+    inside the transaction that changes the instance.
+
+    :param instance: The changed instance.
+    :return: The outbox entry.
+    """
+    entry = IndexOutboxEntry.objects.create(
+        model_label=instance._meta.label_lower,
+        object_id=instance.pk,
+    )
+    if settings.SOLR_OUTBOX_DELIVER_ON_COMMIT:
+        deliver_on_commit(entry)
+    return entry
+
+
+def deliver_on_commit(entry: IndexOutboxEntry) -> None:
+    """
+    Add an entry to the pending delivery of the current savepoint, or of
+    the transaction outside of any. The delivery is registered to run on
+    commit along with its first entry, so Django drops it, and its entries,
+    when the savepoint or the transaction is rolled back.
+
+    :param entry: The entry.
+    """
+    connection = transaction.get_connection()
+    registered = {func for _, func, _ in connection.run_on_commit}
+    deliveries: Dict[Tuple[str, ...], PendingDelivery] = {
+        savepoint_ids: pending
+        for savepoint_ids, pending in getattr(
+            _pending,
+            "deliveries",
+            {},
+        ).items()
+        if pending.deliver in registered
+    }
+    _pending.deliveries = deliveries
+    savepoint_ids = tuple(connection.savepoint_ids)
+    pending = deliveries.get(savepoint_ids)
+    if pending is not None:
+        pending.entries.append(entry)
+        return
+    pending = PendingDelivery([entry])
+    deliveries[savepoint_ids] = pending
+    transaction.on_commit(pending.deliver)
+
+
+def deliver(entries: List[IndexOutboxEntry]) -> None:
+    """
+    Send the current state of the objects of some entries to Solr. Objects
+    that still belong in the index are upserted and deleted ones, or those
+    left out by the queryset of their indexer, are removed, so delivering an
+    entry more than once is harmless. The update requests are sent without
+    committing, and hard and soft commits are sent once at the end.
+
+    :param entries: The entries to deliver.
+    """
+    commit_policy = CommitPolicy.default()
+    batch_policy = commit_policy.for_batch()
+    ids_by_label: Dict[str, Set[int]] = {}
+    for entry in entries:
+        ids_by_label.setdefault(entry.model_label, set()).add(entry.object_id)
+    cores: Dict[str, ModelIndexer[Any]] = {}
+    for model_label, ids in ids_by_label.items():
+        indexer = get_model_indexer(model_label)
+        cores.setdefault(indexer.core, indexer)
+        instances = list(indexer.get_queryset().filter(pk__in=ids))
+        indexer.add_many(instances, commit_policy=batch_policy)
+        # Deleted objects and those that no longer belong in the index
+        deleted_ids = ids - {instance.pk for instance in instances}
+        indexer.delete(
+            (indexer.document_id(pk) for pk in deleted_ids),
+            batch_policy,
+            )
+    if commit_policy.mode in (CommitPolicy.HARD, CommitPolicy.SOFT):
+        for indexer in cores.values():
+            indexer.commit(soft=commit_policy.mode == CommitPolicy.SOFT)
+
+
+def deliver_now(entries: List[IndexOutboxEntry]) -> None:
+    """
+    Try to deliver some entries right away, leaving them to the worker if
+    Solr fails.
+
+    :param entries: The entries to deliver.
+    """
+    try:
+        deliver(entries)
+    except Exception as e:
+        logger.warning("Index delivery failed, left to the worker: %s", e)
+        return
+    IndexOutboxEntry.objects.filter(
+        pk__in=[entry.pk for entry in entries]
+    ).delete()
+
+
+def deliver_in_background(entries: List[IndexOutboxEntry]) -> None:
+    """
+    Deliver some entries from the delivery thread, whose DB connection is
+    not managed by the request cycle: it is dropped when unusable or older
+    than CONN_MAX_AGE, like the ones of the requests.
+
+    :param entries: The entries to deliver.
+    """
+    close_old_connections()
+    try:
+        deliver_now(entries)
+    finally:
+        close_old_connections()
+
+
+def drain(batch_size: int = settings.SOLR_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Deliver a batch of due entries. The entries are claimed for CLAIM_LEASE
+    in a short transaction, and delivered outside of it, so several workers
+    can drain the outbox at once without holding row locks while waiting
+    for Solr. Failed entries are retried later with an exponential backoff,
+    and given up after SOLR_OUTBOX_MAX_ATTEMPTS failures.
+
+    :param batch_size: The max number of entries to deliver.
+    :return: The number of delivered and of failed entries.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            IndexOutboxEntry.objects
+            .select_for_update(skip_locked=True)
+            .filter(dead_at__isnull=True, next_attempt_at__lte=now)
+            .order_by("pk")[:batch_size]
+        )
+        if not entries:
+            return 0, 0
+        IndexOutboxEntry.objects.filter(
+            pk__in=[entry.pk for entry in entries]
+        ).update(next_attempt_at=now + CLAIM_LEASE)
+
+    delivered, failed = deliver_isolating_failures(entries)
+    IndexOutboxEntry.objects.filter(
+        pk__in=[entry.pk for entry in delivered]
+    ).delete()
+    failed_at = timezone.now()
+    for entry, error in failed:
+        entry.attempts += 1
+        entry.next_attempt_at = failed_at + retry_delay(entry.attempts)
+        entry.last_error = str(error)
+        if entry.attempts >= settings.SOLR_OUTBOX_MAX_ATTEMPTS:
+            entry.dead_at = failed_at
+            logger.error(
+                "Index delivery of %s %s given up after %d attempts: %s",
+                entry.model_label,
+                entry.object_id,
+                entry.attempts,
+                error,
+                )
+    IndexOutboxEntry.objects.bulk_update(
+        [entry for entry, _ in failed],
+        ["attempts", "next_attempt_at", "last_error", "dead_at"],
+    )
+    return len(delivered), len(failed)
+
+
+def deliver_isolating_failures(
+    entries: List[IndexOutboxEntry],
+) -> Tuple[List[IndexOutboxEntry], List[Tuple[IndexOutboxEntry, Exception]]]:
+    """
+    Deliver some entries together, and when that fails, deliver those of
+    each model apart, then each entry apart, so a single failing object only
+    holds back its own entries.
+
+    :param entries: The entries to deliver.
+    :return: The delivered entries, and the failed ones with their error.
+    """
+    try:
+        deliver(entries)
+        return entries, []
+    except Exception as e:
+        if len(entries) == 1:
+            return [], [(entries[0], e)]
+        logger.warning("Index delivery failed, delivering apart: %s", e)
+    entries_by_label: Dict[str, List[IndexOutboxEntry]] = {}
+    for entry in entries:
+        entries_by_label.setdefault(entry.model_label, []).append(entry)
+    if len(entries_by_label) > 1:
+        parts = list(entries_by_label.values())
+    else:
+        parts = [[entry] for entry in entries]
+    delivered: List[IndexOutboxEntry] = []
+    failed: List[Tuple[IndexOutboxEntry, Exception]] = []
+    for part in parts:
+        part_delivered, part_failed = deliver_isolating_failures(part)
+        delivered.extend(part_delivered)
+        failed.extend(part_failed)
+    return delivered, failed
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Get how long to wait before retrying a delivery.
+
+    :param attempts: How many times the delivery has failed.
+    :return: The delay before the next attempt.
+    """
+    return min(timedelta(seconds=2 ** min(attempts, 16)), MAX_RETRY_DELAY)
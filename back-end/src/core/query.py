@@ -0,0 +1,128 @@
+"""
+Compilation of search queries into parameters of the Solr select handler.
+
+Scoring clauses are combined into the main query (q), while constraints
+that only filter the results are sent as separate filter queries (fq), so
+Solr can cache each of them in its filterCache.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+# Characters with a meaning in the Solr standard query parser
+SPECIAL_CHARACTERS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/\s])')
+
+# Value matching any value of a field
+WILDCARD = "*"
+
+# Clause matching no document
+MATCH_NOTHING = "-*:*"
+
+
+def escape(value: str) -> str:
+    """
+    Escape a value so the query parser reads it literally.
+
+    :param value: The value to escape.
+    :return: The escaped value.
+    """
+    return SPECIAL_CHARACTERS.sub(r"\\\1", value)
+
+
+class Prefix:
+    """
+    Value matching the values of a field that start with a text.
+    """
+
+    value: str
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Prefix({self.value!r})"
+
+
+def compile_value(value: Any) -> str:
+    """
+    Compile a value of a clause.
+
+    :param value: The value. It can be a Prefix, WILDCARD or a list of
+    values, any of which must match.
+    :return: The compiled value.
+    """
+    if isinstance(value, (list, tuple)):
+        return f"({' OR '.join(compile_value(item) for item in value)})"
+    if isinstance(value, Prefix):
+        return f"{escape(value.value)}*"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value == WILDCARD:
+        return WILDCARD
+    return escape(str(value))
+
+
+class SolrQuery:
+    """
+    Query for the select handler. Its clauses must all match: the scoring
+    ones are combined into q and each filter is sent as its own fq.
+    """
+
+    clauses: List[str]
+    filters: List[str]
+
+    def __init__(
+        self,
+        clauses: Optional[List[str]] = None,
+        filters: Optional[List[str]] = None,
+    ) -> None:
+        self.clauses = clauses or []
+        self.filters = filters or []
+
+    def add(self, field: str, value: Any, is_filter: bool = False) -> None:
+        """
+        Add a clause requiring a field to match a value.
+
+        :param field: The name of the Solr field.
+        :param value: The value to match, see compile_value. An empty list
+        matches no document.
+        :param is_filter: Whether the clause only filters the results,
+        without affecting their score.
+        """
+        if isinstance(value, (list, tuple)) and not value:
+            self.filters.append(MATCH_NOTHING)
+            return
+        clause = f"{field}:{compile_value(value)}"
+        if is_filter:
+            self.filters.append(clause)
+        else:
+            self.clauses.append(clause)
+
+    @property
+    def q(self) -> str:
+        """
+        The main query, matching every document if there are no scoring
+        clauses.
+        """
+        return " AND ".join(self.clauses) or "*:*"
+
+    @property
+    def filtered_q(self) -> str:
+        """
+        The main query combined with the filters, for handlers that take a
+        single query, e.g. delete by query.
+        """
+        return " AND ".join(self.clauses + self.filters) or "*:*"
+
+    def params(self) -> Dict[str, Any]:
+        """
+        Get the request parameters of the query.
+
+        :return: The q and fq parameters.
+        """
+        params: Dict[str, Any] = {"q": self.q}
+        if self.filters:
+            params["fq"] = list(self.filters)
+        return params
+
+    def __repr__(self) -> str:
+        return f"SolrQuery(q={self.q!r}, fq={self.filters!r})"
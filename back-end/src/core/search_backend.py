@@ -0,0 +1,387 @@
+"""
+Backends storing and searching the documents of the indexers.
+
+The indexers build Solr requests, i.e. select parameters with q and fq, and
+documents with typed dynamic fields, and hand them to the backend of the
+process, picked by the SOLR_BACKEND setting. SolrBackend sends them to Solr
+over HTTP. Other backends, e.g. the in-memory one in core.memory_backend,
+only need to understand the subset of Solr that the indexers use.
+"""
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import requests
+from app import settings
+from core.solr import CommitPolicy, iter_json_docs
+from django.utils.module_loading import import_string
+
+if TYPE_CHECKING:
+    from core.async_indexer import AsyncIndexer
+    from core.indexer import Indexer
+
+# Bytes read at once from the response of the export handler
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+class InvalidCursorException(Exception):
+    """Raised when a search cursor is not valid"""
+    pass
+
+
+class SolrExportException(Exception):
+    """Raised when the documents can not be exported"""
+    pass
+
+
+class VersionConflictException(Exception):
+    """Raised when an update requires a document that does not exist"""
+    pass
+
+
+class SearchBackend(ABC):
+    """
+    Base class for the search backends.
+
+    Every method takes the indexer making the request, which tells the
+    core. Writes are made visible according to their commit policy, None
+    leaving it to the backend. The async methods default to their blocking
+    counterparts, which suits backends that do not wait on the network.
+    """
+
+    @abstractmethod
+    def select(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search the documents, the number of matches included.
+
+        :param indexer: The indexer making the request.
+        :param params: The parameters of the select handler.
+        :param timeout: The (connect, read) timeout, if the backend has one.
+        :return: The response of the select handler.
+        :raises InvalidCursorException: If the cursorMark is not valid.
+        """
+
+    @abstractmethod
+    def real_time_get(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, str],
+    ) -> List[Dict[str, Any]]:
+        """
+        Get documents by id, including the uncommitted ones.
+
+        :param indexer: The indexer making the request.
+        :param params: The parameters of the real-time get handler.
+        :return: The documents found, in the order of the ids.
+        """
+
+    @abstractmethod
+    def export(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every document matching a query.
+
+        :param indexer: The indexer making the request.
+        :param params: The parameters of the export handler.
+        :return: An iterator over the documents.
+        :raises SolrExportException: If the documents can not be exported,
+        e.g. because a field has no doc values.
+        """
+
+    @abstractmethod
+    def update(
+        self,
+        indexer: "Indexer",
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Add or replace documents. Documents whose values are {"set": value}
+        operations are atomic updates of the existing documents.
+
+        :param indexer: The indexer making the request.
+        :param documents: The documents.
+        :param commit_policy: How to commit the documents.
+        :raises VersionConflictException: If a document sets `_version_` to
+        1 and does not exist.
+        """
+
+    @abstractmethod
+    def delete(
+        self,
+        indexer: "Indexer",
+        ids: List[str],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Remove documents by id.
+
+        :param indexer: The indexer making the request.
+        :param ids: The ids of the documents.
+        :param commit_policy: How to commit the removal.
+        """
+
+    @abstractmethod
+    def delete_by_query(
+        self,
+        indexer: "Indexer",
+        query: str,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Remove every document matching a query.
+
+        :param indexer: The indexer making the request.
+        :param query: The query, in the syntax of q.
+        :param commit_policy: How to commit the removal.
+        """
+
+    @abstractmethod
+    def commit(self, indexer: "Indexer", soft: bool = False) -> None:
+        """
+        Commit the pending changes.
+
+        :param indexer: The indexer making the request.
+        :param soft: Whether to make the changes visible without flushing
+        them to disk.
+        """
+
+    def count(self, indexer: "Indexer", params: Dict[str, Any]) -> int:
+        """
+        Count the documents matching a query, without fetching them.
+
+        :param indexer: The indexer making the request.
+        :param params: The parameters of the select handler.
+        :return: The number of matching documents.
+        """
+        response = self.select(indexer, {**params, "rows": 0})
+        count: int = response.get("response", {}).get("numFound", 0)
+        return count
+
+    async def select_async(
+        self,
+        indexer: "AsyncIndexer",
+        params: Dict[str, Any],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Non-blocking counterpart of select.
+        """
+        return self.select(indexer.indexer, params, timeout)
+
+    async def real_time_get_async(
+        self,
+        indexer: "AsyncIndexer",
+        params: Dict[str, str],
+    ) -> List[Dict[str, Any]]:
+        """
+        Non-blocking counterpart of real_time_get.
+        """
+        return self.real_time_get(indexer.indexer, params)
+
+    async def update_async(
+        self,
+        indexer: "AsyncIndexer",
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        """
+        Non-blocking counterpart of update.
+        """
+        self.update(indexer.indexer, documents, commit_policy)
+
+    async def commit_async(
+        self,
+        indexer: "AsyncIndexer",
+        soft: bool = False,
+    ) -> None:
+        """
+        Non-blocking counterpart of commit.
+        """
+        self.commit(indexer.indexer, soft)
+
+
+@contextmanager
+def rejected_requests(
+    is_cursor: bool = False,
+    is_export: bool = False,
+) -> Iterator[None]:
+    """
+    Raise the exceptions of the SearchBackend interface for the requests
+    Solr rejects. Other errors are raised as they are.
+
+    :param is_cursor: Whether the request is a cursor-based search, which
+    Solr rejects when the cursor is not valid.
+    :param is_export: Whether the request is to the export handler.
+    :raises InvalidCursorException: If Solr rejects the cursor.
+    :raises VersionConflictException: If Solr rejects an update for its
+    version constraint.
+    :raises SolrExportException: If Solr rejects the export.
+    """
+    try:
+        yield
+    except (requests.HTTPError, httpx.HTTPStatusError) as e:
+        response = e.response
+        status_code = response.status_code if response is not None else None
+        if is_cursor and status_code == 400:
+            raise InvalidCursorException("Invalid cursor") from e
+        if status_code == 409:
+            raise VersionConflictException(str(e)) from e
+        if is_export and status_code is not None and status_code < 500:
+            raise SolrExportException(str(e)) from e
+        raise e
+
+
+class SolrBackend(SearchBackend):
+    """
+    Backend sending the requests to Solr over HTTP, through the retries,
+    hedging, circuit breakers and SolrCloud routing of the indexers. The
+    HTTP errors of the requests Solr rejects are raised as the exceptions
+    of the interface.
+    """
+
+    def select(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        with rejected_requests(is_cursor="cursorMark" in params):
+            response = indexer.read("GET", "select", timeout, params=params)
+        response_body: Dict[str, Any] = response.json()
+        return response_body
+
+    def real_time_get(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, str],
+    ) -> List[Dict[str, Any]]:
+        response = indexer.read("POST", "get", data=params)
+        docs: List[Dict[str, Any]] = (
+            response.json().get("response", {}).get("docs", [])
+        )
+        return docs
+
+    def export(
+        self,
+        indexer: "Indexer",
+        params: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        with rejected_requests(is_export=True):
+            response = indexer.request(
+                "GET",
+                "export",
+                params=params,
+                stream=True,
+                )
+        try:
+            chunks = response.iter_content(chunk_size=EXPORT_CHUNK_SIZE)
+            for doc in iter_json_docs(chunks):
+                if "EXCEPTION" in doc:
+                    raise SolrExportException(doc["EXCEPTION"])
+                yield doc
+        finally:
+            response.close()
+
+    def update(
+        self,
+        indexer: "Indexer",
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        with rejected_requests():
+            indexer.post_update(documents, commit_policy)
+
+    def delete(
+        self,
+        indexer: "Indexer",
+        ids: List[str],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        indexer.post_update({"delete": ids}, commit_policy)
+
+    def delete_by_query(
+        self,
+        indexer: "Indexer",
+        query: str,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        indexer.post_update({"delete": {"query": query}}, commit_policy)
+
+    def commit(self, indexer: "Indexer", soft: bool = False) -> None:
+        mode = CommitPolicy.SOFT if soft else CommitPolicy.HARD
+        indexer.post_update([], CommitPolicy(mode))
+
+    async def select_async(
+        self,
+        indexer: "AsyncIndexer",
+        params: Dict[str, Any],
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Dict[str, Any]:
+        with rejected_requests(is_cursor="cursorMark" in params):
+            response = await indexer.read(
+                "GET",
+                "select",
+                timeout,
+                params=params,
+                )
+        response_body: Dict[str, Any] = response.json()
+        return response_body
+
+    async def real_time_get_async(
+        self,
+        indexer: "AsyncIndexer",
+        params: Dict[str, str],
+    ) -> List[Dict[str, Any]]:
+        response = await indexer.read("POST", "get", data=params)
+        docs: List[Dict[str, Any]] = (
+            response.json().get("response", {}).get("docs", [])
+        )
+        return docs
+
+    async def update_async(
+        self,
+        indexer: "AsyncIndexer",
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        with rejected_requests():
+            await indexer.post_update(documents, commit_policy)
+
+    async def commit_async(
+        self,
+        indexer: "AsyncIndexer",
+        soft: bool = False,
+    ) -> None:
+        mode = CommitPolicy.SOFT if soft else CommitPolicy.HARD
+        await indexer.post_update([], CommitPolicy(mode))
+
+
+_backend: Optional[SearchBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend() -> SearchBackend:
+    """
+    Get the search backend of the process, built from the SOLR_BACKEND
+    setting.
+
+    :return: The backend.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_cls = import_string(settings.SOLR_BACKEND)
+                _backend = backend_cls()
+    return _backend
@@ -0,0 +1,197 @@
+"""
+Caches for the results of ModelIndexer.search.
+
+The cache lives in the memory of each process. Writes made through the
+indexers of a process invalidate its own cache right away, while the
+caches of other processes only catch up when their entries expire, so the
+TTL bounds how stale a result can be.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from app import settings
+from django.utils.module_loading import import_string
+
+
+class SearchCache(ABC):
+    """
+    Base class for the search result caches.
+
+    The cached values are raw responses of the Solr select handler. Each
+    entry records the ids of the documents it returned and whether its
+    query pins a single document id, which drives the invalidation.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached response.
+
+        :param key: The key of the search.
+        :return: The cached response, None if missing or expired.
+        """
+
+    @abstractmethod
+    def set(
+        self,
+        key: Hashable,
+        response: Dict[str, Any],
+        pinned_id: Optional[str] = None,
+    ) -> None:
+        """
+        Cache a response.
+
+        :param key: The key of the search.
+        :param response: The response of the select handler.
+        :param pinned_id: The document id the query is restricted to, if
+        any.
+        """
+
+    @abstractmethod
+    def invalidate(self, ids: Iterable[str], deleted: bool = False) -> None:
+        """
+        Drop the entries that may be affected by a write.
+
+        Entries that returned one of the documents are always dropped. When
+        documents are added or updated, any entry whose query is not pinned
+        to a document id is dropped as well, as the documents may now match
+        it.
+
+        :param ids: The ids of the written documents.
+        :param deleted: Whether the documents were deleted.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Drop every entry.
+        """
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        Get the number of cached entries.
+        """
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters of the cache.
+
+        :return: The hits, misses, evictions and current size.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": self.size(),
+        }
+
+
+class LRUSearchCache(SearchCache):
+    """
+    Search cache evicting the least recently used entries once it holds
+    `max_size` of them. Entries also expire `ttl` seconds after being set.
+    """
+
+    max_size: int
+    ttl: float
+
+    def __init__(
+        self,
+        max_size: int = settings.SOLR_SEARCH_CACHE_SIZE,
+        ttl: float = settings.SOLR_SEARCH_CACHE_TTL,
+    ) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[
+            Hashable,
+            Tuple[float, Dict[str, Any], Set[str], Optional[str]]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(
+        self,
+        key: Hashable,
+        response: Dict[str, Any],
+        pinned_id: Optional[str] = None,
+    ) -> None:
+        docs = response.get("response", {}).get("docs", [])
+        ids = {doc["id"] for doc in docs if "id" in doc}
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, response, ids, pinned_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, ids: Iterable[str], deleted: bool = False) -> None:
+        id_set = set(ids)
+        if not id_set:
+            return
+        with self._lock:
+            stale_keys = [
+                key
+                for key, (_, _, entry_ids, pinned_id) in self._entries.items()
+                if entry_ids & id_set
+                or (not deleted and (pinned_id is None or pinned_id in id_set))
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_cache: Optional[SearchCache] = None
+_cache_built = False
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Get the search cache of the process, built from the SOLR_SEARCH_CACHE
+    setting.
+
+    :return: The cache, None if caching is disabled.
+    """
+    global _cache, _cache_built
+    if _cache_built:
+        return _cache
+    with _cache_lock:
+        if not _cache_built:
+            if settings.SOLR_SEARCH_CACHE and settings.SOLR_SEARCH_CACHE_SIZE:
+                cache_cls = import_string(settings.SOLR_SEARCH_CACHE)
+                _cache = cache_cls()
+            _cache_built = True
+        return _cache
@@ -1,6 +1,7 @@
-from typing import Generic, TypeVar
+from typing import Any, Dict, Generic, TypeVar
 
 from app import settings
+from core.circuit_breaker import CircuitBreaker
 from rest_framework import serializers
 
 T = TypeVar("T")
@@ -26,3 +27,36 @@ class PaginationSerializer(serializers.Serializer[T], Generic[T]):
             "invalid": "offset and page_size must be integers",
         },
     )
+
+
+class SearchCacheStatsSerializer(serializers.Serializer[Dict[str, int]]):
+    """Serializer for the counters of the search cache"""
+
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    evictions = serializers.IntegerField()
+    size = serializers.IntegerField()
+
+
+class CircuitBreakerStatsSerializer(serializers.Serializer[Dict[str, Any]]):
+    """Serializer for the state and counters of a circuit breaker"""
+
+    state = serializers.ChoiceField(choices=[
+        CircuitBreaker.CLOSED,
+        CircuitBreaker.OPEN,
+        CircuitBreaker.HALF_OPEN,
+    ])
+    failures = serializers.IntegerField()
+    times_opened = serializers.IntegerField()
+    rejected = serializers.IntegerField()
+
+
+class MetricsResponseSerializer(serializers.Serializer[Dict[str, Any]]):
+    """Response serializer for the metrics endpoint"""
+
+    search_cache = SearchCacheStatsSerializer(allow_null=True)
+    solr_circuit_breaker = CircuitBreakerStatsSerializer()
+    solr_node_circuit_breakers = serializers.DictField(
+        child=CircuitBreakerStatsSerializer(),
+        help_text="Circuit breaker of each SolrCloud node, by node URL",
+    )
@@ -0,0 +1,406 @@
+"""
+Connection handling and request options for the Solr server.
+"""
+import asyncio
+import codecs
+import json
+import math
+import os
+import random
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any, AsyncGenerator, Deque, Dict, Iterable, Iterator, Optional, Tuple,
+)
+
+import httpx
+import requests
+from app import settings
+from core.circuit_breaker import CircuitBreaker, CircuitOpenException
+from requests.adapters import HTTPAdapter
+
+# Percentile of the recent read latencies after which a read is hedged
+HEDGE_PERCENTILE = 0.95
+# Number of recent read latencies the percentiles are computed from
+LATENCY_WINDOW = 200
+# Reads are not hedged until this many latencies have been recorded
+LATENCY_MIN_SAMPLES = 20
+# Longest wait between two attempts of a read, in seconds
+MAX_RETRY_DELAY = 2.0
+
+
+class LatencyTracker:
+    """
+    Latencies of the most recent Solr reads of the process.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """
+        Record the latency of a read.
+
+        :param seconds: The time the read took.
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Get a percentile of the recorded latencies.
+
+        :param fraction: The percentile, between 0 and 1.
+        :return: The latency in seconds, None if too few reads were
+        recorded.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < LATENCY_MIN_SAMPLES:
+            return None
+        index = min(len(latencies) - 1, math.ceil(fraction * len(latencies)))
+        return latencies[index]
+
+
+class CommitPolicy:
+    """
+    How Solr should commit the documents sent in an update request.
+
+    - "hard": flush the changes to disk and open a new searcher.
+    - "soft": open a new searcher without flushing to disk.
+    - "within": let Solr commit within `within_ms` milliseconds.
+    - "none": leave it to the auto commits configured in solrconfig.xml.
+    """
+
+    HARD = "hard"
+    SOFT = "soft"
+    WITHIN = "within"
+    NONE = "none"
+    MODES = (HARD, SOFT, WITHIN, NONE)
+
+    mode: str
+    within_ms: int
+
+    def __init__(self, mode: str, within_ms: Optional[int] = None) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid commit policy: {mode}")
+        self.mode = mode
+        self.within_ms = (
+            within_ms if within_ms is not None
+            else settings.SOLR_COMMIT_WITHIN_MS
+        )
+
+    @classmethod
+    def default(cls) -> "CommitPolicy":
+        """
+        Get the commit policy configured in the settings.
+
+        :return: The default commit policy.
+        """
+        return cls(settings.SOLR_COMMIT_POLICY)
+
+    def for_batch(self) -> "CommitPolicy":
+        """
+        Get the policy of the update requests of a bulk write but its last
+        one. Committing after each of them would open a searcher per
+        request, so hard and soft commits are only sent once at the end,
+        while Solr keeps handling the "within" ones.
+
+        :return: The commit policy of the intermediate requests.
+        """
+        if self.mode == self.WITHIN:
+            return self
+        return CommitPolicy(self.NONE)
+
+    def params(self) -> Dict[str, str]:
+        """
+        Get the query parameters to send to the update handler.
+
+        :return: The query parameters.
+        """
+        if self.mode == self.HARD:
+            return {"commit": "true"}
+        if self.mode == self.SOFT:
+            return {"softCommit": "true"}
+        if self.mode == self.WITHIN:
+            return {"commitWithin": str(self.within_ms)}
+        return {}
+
+
+_circuit_breaker: Optional[CircuitBreaker] = None
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_pid: Optional[int] = None
+_latency_tracker = LatencyTracker()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop,
+    httpx.AsyncClient
+] = weakref.WeakKeyDictionary()
+_async_client_closers: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop,
+    AsyncGenerator[None, None]
+] = weakref.WeakKeyDictionary()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    Get the circuit breaker guarding the requests to Solr, shared by every
+    indexer of the process.
+
+    :return: The circuit breaker.
+    """
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        with _session_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker(
+                    "solr",
+                    settings.SOLR_CIRCUIT_FAILURE_THRESHOLD,
+                    settings.SOLR_CIRCUIT_RESET_TIMEOUT,
+                    is_solr_failure,
+                    )
+    return _circuit_breaker
+
+
+def is_solr_failure(exception: Exception) -> bool:
+    """
+    Check whether an exception raised by a Solr request means that Solr is
+    unavailable. Requests rejected by Solr, e.g. for an invalid cursor, do
+    not count.
+
+    :param exception: The exception raised by the request.
+    :return: Whether it is a failure of Solr.
+    """
+    if isinstance(exception, requests.HTTPError):
+        response = exception.response
+        return response is None or response.status_code >= 500
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code >= 500
+    return isinstance(exception, (
+        requests.ConnectionError,
+        requests.Timeout,
+        httpx.TransportError,
+    ))
+
+
+def is_solr_unavailable(exception: Exception) -> bool:
+    """
+    Check whether an exception raised by an indexer means that Solr can not
+    be used right now, either because it failed or because the circuit
+    breaker is open.
+
+    :param exception: The exception raised by the indexer.
+    :return: Whether Solr is unavailable.
+    """
+    return (
+        isinstance(exception, CircuitOpenException)
+        or is_solr_failure(exception)
+    )
+
+
+def core_url(core: Optional[str] = None) -> str:
+    """
+    Get the URL of a Solr core.
+
+    :param core: The name of the core. Defaults to SOLR_CORE.
+    :return: The URL of the core.
+    """
+    return f"{settings.SOLR_URL}/{core or settings.SOLR_CORE}"
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the async HTTP client used to talk to Solr.
+
+    The client keeps a pool of keep-alive connections shared by every
+    coroutine of the running event loop. Connections are bound to the loop
+    that opened them, so a client is created for each loop, and closed when
+    the loop shuts down its async generators, as asyncio.run does before
+    closing it.
+
+    :return: The client for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.SOLR_POOL_SIZE,
+                max_keepalive_connections=settings.SOLR_POOL_SIZE,
+            ),
+            timeout=httpx.Timeout(
+                settings.SOLR_READ_TIMEOUT,
+                connect=settings.SOLR_CONNECT_TIMEOUT,
+            ),
+        )
+        _async_clients[loop] = client
+        closer = _close_on_shutdown(client)
+        # Starting the generator registers it with the running loop. It
+        # does not await before its yield, so it can be started without
+        # awaiting.
+        try:
+            closer.__anext__().send(None)
+        except StopIteration:
+            pass
+        # The loop only keeps a weak reference to its async generators
+        _async_client_closers[loop] = closer
+    return client
+
+
+async def _close_on_shutdown(
+    client: httpx.AsyncClient,
+) -> AsyncGenerator[None, None]:
+    """
+    Close an async client once the event loop finalizes this generator,
+    when it shuts down.
+
+    :param client: The client to close.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def get_session() -> requests.Session:
+    """
+    Get the HTTP session used to talk to Solr.
+
+    The session keeps a pool of keep-alive connections and is created lazily
+    once per process. Gunicorn forks its workers after importing the app, so
+    a session inherited from the parent process is discarded instead of
+    sharing its sockets with the child.
+
+    :return: The session for the current process.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session()
+            _session_pid = pid
+        return _session
+
+
+def get_timeout() -> Tuple[float, float]:
+    """
+    Get the (connect, read) timeout to use for Solr requests.
+
+    :return: The timeout tuple expected by requests.
+    """
+    return settings.SOLR_CONNECT_TIMEOUT, settings.SOLR_READ_TIMEOUT
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    """
+    Get the threads sending the hedged reads of the process. Like the
+    session, they are not shared with forked processes.
+
+    :return: The executor for the current process.
+    """
+    global _hedge_executor, _hedge_executor_pid
+    pid = os.getpid()
+    if _hedge_executor is not None and _hedge_executor_pid == pid:
+        return _hedge_executor
+    with _session_lock:
+        if _hedge_executor is None or _hedge_executor_pid != pid:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=settings.SOLR_POOL_SIZE,
+                thread_name_prefix="solr-read",
+            )
+            _hedge_executor_pid = pid
+        return _hedge_executor
+
+
+def get_hedge_delay() -> Optional[float]:
+    """
+    Get how long to wait for a read before sending a duplicate one.
+
+    :return: The delay in seconds, None if reads are not hedged.
+    """
+    if not settings.SOLR_HEDGED_READS:
+        return None
+    return _latency_tracker.percentile(HEDGE_PERCENTILE)
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """
+    Get the tracker of the read latencies of the process.
+
+    :return: The latency tracker.
+    """
+    return _latency_tracker
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    Get how long to wait before retrying a failed read, using exponential
+    backoff with full jitter so that workers do not retry in lockstep.
+
+    :param attempt: The number of attempts already made, starting at 1.
+    :return: The delay in seconds.
+    """
+    backoff = settings.SOLR_RETRY_BACKOFF * 2 ** (attempt - 1)
+    return random.uniform(0, min(backoff, MAX_RETRY_DELAY))
+
+
+def _build_session() -> requests.Session:
+    """
+    Build a new session with a connection pool sized from the settings.
+
+    :return: The new session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.SOLR_POOL_SIZE,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def iter_json_docs(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the documents of a Solr JSON response as its chunks are received,
+    without holding the whole response in memory.
+
+    :param chunks: The chunks of the response body.
+    :return: An iterator over the objects of the "docs" array.
+    :raises ValueError: If the response ends before the array is closed.
+    """
+    json_decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    in_docs = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        if not in_docs:
+            docs_start = buffer.find('"docs"')
+            array_start = buffer.find("[", docs_start)
+            if docs_start < 0 or array_start < 0:
+                continue
+            buffer = buffer[array_start + 1:]
+            in_docs = True
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,")
+            if not buffer:
+                break
+            if buffer[0] == "]":
+                return
+            try:
+                doc, end = json_decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # The document is not complete yet
+                break
+            yield doc
+            buffer = buffer[end:]
+    if in_docs or buffer:
+        raise ValueError("The Solr response ended unexpectedly")
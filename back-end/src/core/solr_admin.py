@@ -0,0 +1,77 @@
+"""
+Management of the cores of a standalone Solr server through the CoreAdmin
+API.
+"""
+from typing import Any, Dict
+
+from app import settings
+from core.solr import get_session, get_timeout
+
+# Seconds to wait for CoreAdmin actions, which load or unload whole cores
+ADMIN_TIMEOUT = 120.0
+
+
+def core_admin(action: str, **params: Any) -> Dict[str, Any]:
+    """
+    Run an action of the CoreAdmin API.
+
+    :param action: The name of the action, e.g. CREATE.
+    :param params: The parameters of the action.
+    :return: The response of Solr.
+    """
+    connect_timeout, _ = get_timeout()
+    response = get_session().get(
+        f"{settings.SOLR_URL}/admin/cores",
+        params={"action": action, "wt": "json", **params},
+        timeout=(connect_timeout, ADMIN_TIMEOUT),
+        )
+    response.raise_for_status()
+    response_body: Dict[str, Any] = response.json()
+    return response_body
+
+
+def core_exists(name: str) -> bool:
+    """
+    Check whether a core is loaded.
+
+    :param name: The name of the core.
+    :return: Whether the core exists.
+    """
+    status = core_admin("STATUS", core=name, indexInfo="false")
+    return bool(status.get("status", {}).get(name))
+
+
+def create_core(name: str, config_set: str = settings.SOLR_CONFIGSET) -> None:
+    """
+    Create an empty core.
+
+    :param name: The name of the core.
+    :param config_set: The configset of the core.
+    """
+    core_admin("CREATE", name=name, configSet=config_set)
+
+
+def unload_core(name: str) -> None:
+    """
+    Unload a core and delete its data.
+
+    :param name: The name of the core.
+    """
+    core_admin(
+        "UNLOAD",
+        core=name,
+        deleteIndex="true",
+        deleteDataDir="true",
+        deleteInstanceDir="true",
+    )
+
+
+def swap_cores(name: str, other: str) -> None:
+    """
+    Atomically swap the names of two cores, so requests to each name are
+    served by the other core.
+
+    :param name: The name of one core.
+    :param other: The name of the other core.
+    """
+    core_admin("SWAP", core=name, other=other)
@@ -0,0 +1,450 @@
+"""
+Routing of the requests to the nodes of a SolrCloud cluster.
+
+Updates are sent straight to the leader of the shard holding each document,
+found by hashing the document id like Solr's compositeId router does, which
+saves Solr from forwarding them between nodes. Reads are spread over the
+active replicas of the collection, skipping the nodes whose circuit breaker
+is open. Each node has its own breaker, so a node going down does not stop
+the requests to the others.
+"""
+import itertools
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from app import settings
+from core.circuit_breaker import CircuitBreaker
+from core.solr import get_session, get_timeout, is_solr_failure
+
+# Separator of the shard key prefix of the compositeId router
+SHARD_KEY_SEPARATOR = "!"
+
+
+def murmurhash3_32(data: bytes, seed: int = 0) -> int:
+    """
+    Hash bytes with the 32 bits x86 variant of MurmurHash3, the hash used by
+    the compositeId router.
+
+    :param data: The bytes to hash.
+    :param seed: The seed of the hash.
+    :return: The hash, as a signed integer like Solr's.
+    """
+    c1 = 0xcc9e2d51
+    c2 = 0x1b873593
+    mask = 0xffffffff
+
+    def mix(k: int) -> int:
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        return (k * c2) & mask
+
+    h = seed
+    length = len(data)
+    rounded_end = length & ~3
+    for i in range(0, rounded_end, 4):
+        h ^= mix(int.from_bytes(data[i:i + 4], "little"))
+        h = ((h << 13) | (h >> 19)) & mask
+        h = (h * 5 + 0xe6546b64) & mask
+    if length & 3:
+        h ^= mix(int.from_bytes(data[rounded_end:], "little"))
+
+    h ^= length
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & mask
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & mask
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+def parse_hash_range(text: str) -> Tuple[int, int]:
+    """
+    Parse the hash range of a shard, e.g. "80000000-ffffffff".
+
+    :param text: The range, as two hexadecimal 32 bits integers.
+    :return: The signed lower and upper bounds, both included.
+    """
+    bounds = []
+    for bound in text.split("-"):
+        value = int(bound, 16)
+        bounds.append(value - (1 << 32) if value & 0x80000000 else value)
+    return bounds[0], bounds[1]
+
+
+class Replica:
+    """
+    Copy of a shard hosted by a node.
+    """
+
+    node_url: str
+    core: str
+    is_leader: bool
+    is_active: bool
+
+    def __init__(
+        self,
+        node_url: str,
+        core: str,
+        is_leader: bool,
+        is_active: bool,
+    ) -> None:
+        self.node_url = node_url
+        self.core = core
+        self.is_leader = is_leader
+        self.is_active = is_active
+
+    @property
+    def url(self) -> str:
+        return f"{self.node_url}/{self.core}"
+
+
+class Shard:
+    """
+    Slice of a collection holding the documents whose id hashes into its
+    range.
+    """
+
+    name: str
+    hash_range: Optional[Tuple[int, int]]
+    replicas: List[Replica]
+
+    def __init__(
+        self,
+        name: str,
+        hash_range: Optional[Tuple[int, int]],
+        replicas: List[Replica],
+    ) -> None:
+        self.name = name
+        self.hash_range = hash_range
+        self.replicas = replicas
+
+    def leader(self) -> Optional[Replica]:
+        """
+        Get the replica the updates of the shard are sent to.
+
+        :return: The active leader, None if there is none right now.
+        """
+        for replica in self.replicas:
+            if replica.is_leader and replica.is_active:
+                return replica
+        return None
+
+
+class ClusterState:
+    """
+    Shards and replicas of the collections of a cluster.
+    """
+
+    collections: Dict[str, List[Shard]]
+    aliases: Dict[str, str]
+
+    def __init__(
+        self,
+        collections: Dict[str, List[Shard]],
+        aliases: Dict[str, str],
+    ) -> None:
+        self.collections = collections
+        self.aliases = aliases
+
+    @classmethod
+    def from_status(cls, status: Dict[str, Any]) -> "ClusterState":
+        """
+        Build the state from a response of the CLUSTERSTATUS action.
+
+        :param status: The response.
+        :return: The cluster state.
+        """
+        cluster = status.get("cluster", {})
+        live_nodes = set(cluster.get("live_nodes", []))
+        collections: Dict[str, List[Shard]] = {}
+        for name, collection in cluster.get("collections", {}).items():
+            shards = []
+            for shard_name, shard in collection.get("shards", {}).items():
+                replicas = [
+                    Replica(
+                        replica["base_url"],
+                        replica["core"],
+                        replica.get("leader") == "true",
+                        replica.get("state") == "active"
+                        and replica.get("node_name") in live_nodes,
+                    )
+                    for replica in shard.get("replicas", {}).values()
+                ]
+                hash_range = shard.get("range")
+                shards.append(Shard(
+                    shard_name,
+                    parse_hash_range(hash_range) if hash_range else None,
+                    replicas,
+                    ))
+            collections[name] = shards
+        # An alias may point to several collections, the first one is
+        # written to
+        aliases = {
+            alias: targets.split(",")[0]
+            for alias, targets in cluster.get("aliases", {}).items()
+        }
+        return cls(collections, aliases)
+
+    def shards(self, collection: str) -> List[Shard]:
+        """
+        Get the shards of a collection or alias.
+
+        :param collection: The name of the collection or alias.
+        :return: The shards, none if the collection does not exist.
+        """
+        name = self.aliases.get(collection, collection)
+        return self.collections.get(name, [])
+
+    def shard_of(self, collection: str, document_id: str) -> Optional[Shard]:
+        """
+        Get the shard holding a document.
+
+        :param collection: The name of the collection or alias.
+        :param document_id: The id of the document.
+        :return: The shard, None if it can not be known without asking
+        Solr, e.g. for ids with a shard key prefix.
+        """
+        if SHARD_KEY_SEPARATOR in document_id:
+            return None
+        document_hash = murmurhash3_32(document_id.encode("utf-8"))
+        for shard in self.shards(collection):
+            if shard.hash_range is None:
+                continue
+            lower, upper = shard.hash_range
+            if lower <= document_hash <= upper:
+                return shard
+        return None
+
+
+class SolrCloud:
+    """
+    Client-side view of a SolrCloud cluster, shared by the threads of a
+    process. The cluster state is fetched from any healthy node and cached
+    for SOLR_CLUSTER_STATE_TTL seconds.
+    """
+
+    nodes: List[str]
+    state_ttl: float
+
+    def __init__(self, nodes: List[str], state_ttl: float) -> None:
+        """
+        :param nodes: The base URLs of the nodes the state is fetched from.
+        :param state_ttl: The seconds the cluster state is cached for.
+        """
+        self.nodes = nodes
+        self.state_ttl = state_ttl
+        self._state: Optional[ClusterState] = None
+        self._fetched_at = 0.0
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._next_replica = itertools.count()
+        self._lock = threading.Lock()
+
+    def breaker(self, node_url: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker guarding the requests to a node.
+
+        :param node_url: The base URL of the node.
+        :return: The circuit breaker.
+        """
+        breaker = self._breakers.get(node_url)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    node_url,
+                    CircuitBreaker(
+                        f"solr {node_url}",
+                        settings.SOLR_CIRCUIT_FAILURE_THRESHOLD,
+                        settings.SOLR_CIRCUIT_RESET_TIMEOUT,
+                        is_solr_failure,
+                    ),
+                    )
+        return breaker
+
+    def is_stale(self) -> bool:
+        """
+        Check whether the cached cluster state must be fetched again.
+
+        :return: Whether the state is missing or too old.
+        """
+        return (
+            self._state is None
+            or time.monotonic() - self._fetched_at >= self.state_ttl
+        )
+
+    def state(self) -> ClusterState:
+        """
+        Get the cluster state, fetching it if the cached one is stale. A
+        stale state keeps being used while no node answers.
+
+        :return: The cluster state.
+        """
+        if self.is_stale():
+            try:
+                self.refresh()
+            except Exception as e:
+                if self._state is None:
+                    raise e
+        assert self._state is not None
+        return self._state
+
+    def refresh(self) -> None:
+        """
+        Fetch the cluster state from the first healthy node that answers.
+        """
+        nodes = [
+            node for node in self.nodes if self.breaker(node).is_available()
+        ] or self.nodes
+        error: Optional[Exception] = None
+        for node in nodes:
+            try:
+                status = self.breaker(node).call(
+                    lambda: self.fetch_status(node)
+                )
+            except Exception as e:
+                error = e
+                continue
+            with self._lock:
+                self._state = ClusterState.from_status(status)
+                self._fetched_at = time.monotonic()
+            return
+        assert error is not None
+        raise error
+
+    def fetch_status(self, node_url: str) -> Dict[str, Any]:
+        """
+        Send the CLUSTERSTATUS action to a node.
+
+        :param node_url: The base URL of the node.
+        :return: The response.
+        """
+        response = get_session().get(
+            f"{node_url}/admin/collections",
+            params={"action": "CLUSTERSTATUS", "wt": "json"},
+            timeout=get_timeout(),
+            )
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            response.close()
+            raise e
+        status: Dict[str, Any] = response.json()
+        return status
+
+    def replica(self, collection: str) -> Tuple[str, CircuitBreaker]:
+        """
+        Pick the replica a read of a collection is sent to. Reads are spread
+        in turns over the active replicas whose node is healthy.
+
+        :param collection: The name of the collection or alias.
+        :return: The URL of the replica core and the breaker of its node.
+        """
+        replicas = [
+            replica
+            for shard in self.state().shards(collection)
+            for replica in shard.replicas
+            if replica.is_active
+        ]
+        healthy = [
+            replica for replica in replicas
+            if self.breaker(replica.node_url).is_available()
+        ]
+        # Without a healthy replica, the breaker rejects the request
+        candidates = healthy or replicas
+        if not candidates:
+            return self.collection_url(collection)
+        replica = candidates[next(self._next_replica) % len(candidates)]
+        return replica.url, self.breaker(replica.node_url)
+
+    def leader(
+        self,
+        collection: str,
+        shard_name: str,
+    ) -> Tuple[str, CircuitBreaker]:
+        """
+        Pick the replica an update of a shard is sent to.
+
+        :param collection: The name of the collection or alias.
+        :param shard_name: The name of the shard.
+        :return: The URL of the leader core and the breaker of its node.
+        Any replica of the collection if the shard has no leader right now.
+        """
+        for shard in self.state().shards(collection):
+            if shard.name != shard_name:
+                continue
+            leader = shard.leader()
+            if leader is not None:
+                return leader.url, self.breaker(leader.node_url)
+        return self.replica(collection)
+
+    def collection_url(self, collection: str) -> Tuple[str, CircuitBreaker]:
+        """
+        Get the URL of a collection on a healthy node, which forwards the
+        requests to its replicas.
+
+        :param collection: The name of the collection or alias.
+        :return: The URL of the collection and the breaker of the node.
+        """
+        nodes = [
+            node for node in self.nodes if self.breaker(node).is_available()
+        ] or self.nodes
+        node = nodes[next(self._next_replica) % len(nodes)]
+        return f"{node}/{collection}", self.breaker(node)
+
+    def group_by_shard(
+        self,
+        collection: str,
+        items: List[Any],
+        document_ids: List[str],
+    ) -> Dict[Optional[str], List[Any]]:
+        """
+        Group items by the shard of their document.
+
+        :param collection: The name of the collection or alias.
+        :param items: The items, e.g. documents.
+        :param document_ids: The document id of each item.
+        :return: The items of each shard, by shard name. Items whose shard
+        is unknown are grouped under None.
+        """
+        state = self.state()
+        groups: Dict[Optional[str], List[Any]] = defaultdict(list)
+        for item, document_id in zip(items, document_ids):
+            shard = state.shard_of(collection, document_id)
+            groups[shard.name if shard else None].append(item)
+        return dict(groups)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the state and counters of the breaker of each node.
+
+        :return: The stats, by node URL.
+        """
+        return {
+            node: breaker.stats() for node, breaker in self._breakers.items()
+        }
+
+
+_solr_cloud: Optional[SolrCloud] = None
+_solr_cloud_lock = threading.Lock()
+
+
+def get_solr_cloud() -> Optional[SolrCloud]:
+    """
+    Get the view of the SolrCloud cluster shared by every indexer of the
+    process.
+
+    :return: The cluster, None if Solr runs in standalone mode.
+    """
+    global _solr_cloud
+    if not settings.SOLR_CLOUD_NODES:
+        return None
+    if _solr_cloud is None:
+        with _solr_cloud_lock:
+            if _solr_cloud is None:
+                _solr_cloud = SolrCloud(
+                    [node.rstrip("/") for node in settings.SOLR_CLOUD_NODES],
+                    settings.SOLR_CLUSTER_STATE_TTL,
+                )
+    return _solr_cloud
@@ -0,0 +1,87 @@
+"""
+Tracking of the deleted instances of indexed models.
+
+The post_delete signal of every model in SOLR_INDEXERS writes an
+IndexTombstone in the same transaction as the deletion, so incremental
+reindexes only remove the instances deleted since their previous run
+instead of looking up every document of the index in the database. The
+tombstones are pruned once no reindex needs them anymore.
+
+Deletions that do not send signals, e.g. raw SQL, are not tracked: the
+check_index command still compares the whole index with the database.
+"""
+from datetime import datetime
+from typing import Any, Optional, Type
+
+from app import settings
+from core.models import IndexTombstone
+from django.apps import apps
+from django.db.models import Model, QuerySet
+from django.db.models.signals import post_delete
+
+
+def track_deletions(model_cls: Type[Model]) -> None:
+    """
+    Write a tombstone for each deleted instance of a model.
+
+    :param model_cls: The model.
+    """
+    post_delete.connect(
+        handle_delete,
+        sender=model_cls,
+        dispatch_uid=f"tombstone_{model_cls._meta.label_lower}",
+    )
+
+
+def track_deletions_from_settings() -> None:
+    """
+    Track the deletions of the models listed in the SOLR_INDEXERS setting.
+    """
+    for model_label in settings.SOLR_INDEXERS:
+        track_deletions(apps.get_model(model_label))
+
+
+def handle_delete(
+    sender: Type[Model],
+    instance: Model,
+    **kwargs: Any,
+) -> None:
+    """
+    Write the tombstone of a deleted instance.
+    """
+    IndexTombstone.objects.create(
+        model_label=sender._meta.label_lower,
+        object_id=instance.pk,
+    )
+
+
+def deleted_since(
+    model_label: str,
+    since: Optional[datetime],
+) -> "QuerySet[IndexTombstone, int]":
+    """
+    Get the primary keys of the instances of a model deleted since a given
+    moment.
+
+    :param model_label: The lowercase label of the model, e.g. core.user.
+    :param since: The moment, None for every tracked deletion.
+    :return: The primary keys, in deletion order.
+    """
+    tombstones = IndexTombstone.objects.filter(model_label=model_label)
+    if since is not None:
+        tombstones = tombstones.filter(deleted_at__gte=since)
+    return tombstones.order_by("deleted_at").values_list(
+        "object_id",
+        flat=True,
+        )
+
+
+def prune(before: datetime) -> int:
+    """
+    Delete the tombstones older than a given moment.
+
+    :param before: The moment.
+    :return: The number of deleted tombstones.
+    """
+    count, _ = IndexTombstone.objects.filter(deleted_at__lt=before).delete()
+    return count
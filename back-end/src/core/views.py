@@ -0,0 +1,37 @@
+from core.auth import AdminAPIView, AuthenticatedRequest
+from core.search_cache import get_search_cache
+from core.serializers import MetricsResponseSerializer
+from core.solr import get_circuit_breaker
+from core.solr_cloud import get_solr_cloud
+from core.swagger import swagger_authenticated_schema
+from drf_yasg import openapi
+from rest_framework.response import Response
+
+
+class MetricsView(AdminAPIView):
+
+    @swagger_authenticated_schema(
+        responses={
+            200: openapi.Response(
+                description="Metrics of the process serving the request",
+                schema=MetricsResponseSerializer(),
+            )
+        },
+        operation_id="metrics"
+    )
+    def get(self, request: AuthenticatedRequest) -> Response:
+        """
+        Get the metrics of the process serving the request.
+        :param request: The request object
+        :return: The response object
+        """
+        cache = get_search_cache()
+        cloud = get_solr_cloud()
+        serializer = MetricsResponseSerializer({
+            "search_cache": cache.stats() if cache is not None else None,
+            "solr_circuit_breaker": get_circuit_breaker().stats(),
+            "solr_node_circuit_breakers": (
+                cloud.stats() if cloud is not None else {}
+            ),
+        })
+        return Response(serializer.data)
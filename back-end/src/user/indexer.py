@@ -1,7 +1,14 @@
-from typing import Any, Dict, List, Optional
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
+from app import settings
+from core.async_indexer import AsyncModelIndexer
 from core.indexer import ModelIndexer
 from core.models import User
+from core.solr import CommitPolicy, is_solr_unavailable
+from django.db.models import QuerySet
+
+logger = logging.getLogger(__name__)
 
 
 class UserIndexer(ModelIndexer[User]):
@@ -12,64 +19,107 @@ class UserIndexer(ModelIndexer[User]):
     override_types: Optional[Dict[str, str]] = {
         "email_ngram": "ng"
     }
+    # duplicate the email to use as ngram search matcher
+    copy_fields: Dict[str, str] = {
+        "email_ngram": "email"
+    }
+    queryset_fields = ("is_active",)
+    # the authentication rejects the inactive users it hydrates
+    extra_fields = ("is_active",)
 
     def __init__(self) -> None:
         from user.serializers import UserSerializer
         super().__init__(UserSerializer)
 
-    def add(self, instance: User) -> None:
+    def get_queryset(self) -> QuerySet[User]:
+        """
+        Only active users are indexed, so searches never need to filter out
+        the inactive ones.
+        """
+        return User.objects.filter(is_active=True)
+
+    def purge_inactive(
+        self,
+        batch_size: int = settings.SOLR_BATCH_SIZE,
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> int:
+        """
+        Remove every inactive user from the Solr index, `batch_size` per
+        update request. Users that were not indexed are removed harmlessly.
+
+        :param batch_size: The number of users per update request.
+        :param commit_policy: How to commit the removal. Defaults to the
+        policy in the settings.
+        :return: The number of inactive users.
         """
-        Index a new user into the Solr index.
+        users = (
+            User.objects
+            .filter(is_active=False)
+            .only("pk")
+            .order_by("pk")
+            .iterator(chunk_size=batch_size)
+        )
+        return self.remove_many(users, batch_size, commit_policy)
+
+    def find_first(
+        self,
+        find: Callable[[], List[User]],
+        **lookup: Any,
+    ) -> Optional[User]:
         """
-        serializer = self.serializer_class(instance)
-        data = serializer.data
-        # duplicate the field to use as ngram search matcher
-        if "email" in data:
-            data["email_ngram"] = data["email"]
-        self.update(data)
+        Get the first user found in the Solr index. Falls back to the
+        database while Solr is unavailable, where only the indexed users are
+        found too.
+
+        :param find: The search in the Solr index.
+        :param lookup: The same search, as filters of the queryset.
+        :return: The user if found, None otherwise.
+        """
+        try:
+            results = find()
+        except Exception as e:
+            if not is_solr_unavailable(e):
+                raise e
+            logger.warning("Solr unavailable, finding user in the DB: %s", e)
+            return self.get_queryset().filter(**lookup).first()
+        return results[0] if results else None
 
     def find_by_email(self, email: str) -> Optional[User]:
         """
-        Search the Solr index for a user by email.
+        Search the Solr index for a user by email, see find_first.
 
         :param email: The email to search for.
         :return: The user if found, None otherwise.
         """
-        results, _ = self.search({"email": email}, page_size=1, offset=0)
-        if len(results) == 0:
-            return None
-        return results[0]
+        return self.find_first(
+            lambda: self.search({"email": email}, page_size=1, offset=0)[0],
+            email=email,
+            )
 
     def find_by_id(self, id: int) -> Optional[User]:
         """
-        Search the Solr index for a user by id.
+        Get a user from the Solr index by id, see find_first.
 
         :param id: The id to search for.
         :return: The user if found, None otherwise.
         """
-        results, _ = self.search({"id": id}, page_size=1, offset=0)
-        if len(results) == 0:
-            return None
-        return results[0]
+        return self.find_first(lambda: self.get_many([id]), pk=id)
 
-    def reverse_transform_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def find_by_ids(self, ids: List[int]) -> List[User]:
         """
-        Reverse transform the data from the Solr index.
-        Remove the duplicate email text field.
+        Get users from the Solr index by id, in a single request.
 
-        :param data: The data to reverse transform.
-        :return: The reverse transformed data.
+        :param ids: The ids to search for.
+        :return: The users found, in the order of the ids.
         """
-        data = super().reverse_transform_data(data)
-        if "email_ngram" in data:
-            del data["email_ngram"]
-        return data
+        return self.get_many(ids)
 
     def search_by_email(
         self,
         email: str,
         offset: int,
         page_size: int,
+        include_total: bool = True,
     ) -> tuple[List[User], int]:
         """
         Search users by email with pagination.
@@ -77,24 +127,138 @@ class UserIndexer(ModelIndexer[User]):
         :param email: The email text to search within.
         :param offset: The starting offset in the result set.
         :param page_size: The number of results per page.
+        :param include_total: Whether the total count must be exact.
         :return: A tuple (results, total_count).
         """
         return self.search(
             {"email_ngram": email},
             offset,
-            page_size
+            page_size,
+            include_total,
             )
 
+    def search_by_email_after(
+        self,
+        email: str,
+        cursor: str,
+        page_size: int,
+    ) -> tuple[List[User], int, Optional[str]]:
+        """
+        Search users by email with cursor-based pagination.
+
+        :param email: The email text to search within.
+        :param cursor: The cursor returned with the previous page.
+        :param page_size: The number of results per page.
+        :return: A tuple (results, total_count, next_cursor).
+        """
+        return self.search_after({"email_ngram": email}, cursor, page_size)
+
     def all_users(
         self,
         offset: int,
         page_size: int,
+        include_total: bool = True,
     ) -> tuple[List[User], int]:
         """
         Get all users with pagination.
 
+        :param offset: The starting offset in the result set.
+        :param page_size: The number of results per page.
+        :param include_total: Whether the total count must be exact.
+        :return: A tuple (results, total_count).
+        """
+        return self.all(offset, page_size, include_total)
+
+    def all_users_after(
+        self,
+        cursor: str,
+        page_size: int,
+    ) -> tuple[List[User], int, Optional[str]]:
+        """
+        Get all users with cursor-based pagination.
+
+        :param cursor: The cursor returned with the previous page.
+        :param page_size: The number of results per page.
+        :return: A tuple (results, total_count, next_cursor).
+        """
+        return self.search_after({}, cursor, page_size)
+
+
+class AsyncUserIndexer(AsyncModelIndexer[User]):
+    """
+    Non-blocking indexer for the User model.
+    """
+
+    indexer: UserIndexer
+
+    def __init__(self) -> None:
+        super().__init__(UserIndexer())
+
+    async def find_first(
+        self,
+        find: Callable[[], Awaitable[List[User]]],
+        **lookup: Any,
+    ) -> Optional[User]:
+        """
+        Non-blocking counterpart of UserIndexer.find_first.
+        """
+        try:
+            results = await find()
+        except Exception as e:
+            if not is_solr_unavailable(e):
+                raise e
+            logger.warning("Solr unavailable, finding user in the DB: %s", e)
+            return await self.indexer.get_queryset().filter(**lookup).afirst()
+        return results[0] if results else None
+
+    async def find_by_email(self, email: str) -> Optional[User]:
+        """
+        Search the Solr index for a user by email, see find_first.
+
+        :param email: The email to search for.
+        :return: The user if found, None otherwise.
+        """
+
+        async def search() -> List[User]:
+            results, _ = await self.search(
+                {"email": email},
+                page_size=1,
+                offset=0,
+                )
+            return results
+
+        return await self.find_first(search, email=email)
+
+    async def find_by_id(self, id: int) -> Optional[User]:
+        """
+        Get a user from the Solr index by id, see find_first.
+
+        :param id: The id to search for.
+        :return: The user if found, None otherwise.
+        """
+        return await self.find_first(lambda: self.get_many([id]), pk=id)
+
+    async def find_by_ids(self, ids: List[int]) -> List[User]:
+        """
+        Get users from the Solr index by id, in a single request.
+
+        :param ids: The ids to search for.
+        :return: The users found, in the order of the ids.
+        """
+        return await self.get_many(ids)
+
+    async def search_by_email(
+        self,
+        email: str,
+        offset: int,
+        page_size: int,
+    ) -> tuple[List[User], int]:
+        """
+        Search users by email with pagination.
+
+        :param email: The email text to search within.
         :param offset: The starting offset in the result set.
         :param page_size: The number of results per page.
         :return: A tuple (results, total_count).
         """
-        return self.all(offset, page_size)
+        return await self.search({"email_ngram": email}, offset, page_size)
@@ -1,11 +1,12 @@
 """
 Serializers for the User API view
 """
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from core.models import User
 from core.serializers import PaginationSerializer
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 from user.indexer import UserIndexer
 
@@ -38,10 +39,14 @@ class UserSerializer(serializers.ModelSerializer[User]):
         read_only_fields = ("id", "email", "username")
 
     def create(self, validated_data: dict[str, Any]) -> User:
-        """Create and return a new user"""
+        """
+        Create and return a new user. The user is indexed automatically
+        through the outbox, in the same transaction, so a failing Solr can
+        not leave it out of the index.
+        """
         try:
-            user = get_user_model().objects.create_user(**validated_data)
-            self.indexer.add(user)
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(**validated_data)
             return user
         except Exception as e:
             raise e
@@ -64,27 +69,56 @@ class UserSerializer(serializers.ModelSerializer[User]):
     def all_users(
         self,
         offset: int,
-        page_size: int
+        page_size: int,
+        include_total: bool = True
     ) -> Tuple[List[User], int]:
         """Get paginated users and total count from the Solr index"""
-        users, total = self.indexer.all_users(offset, page_size)
+        users, total = self.indexer.all_users(
+            offset,
+            page_size,
+            include_total
+            )
         return users, total
 
+    def all_users_after(
+        self,
+        cursor: str,
+        page_size: int
+    ) -> Tuple[List[User], int, Optional[str]]:
+        """Get a page of users after a cursor from the Solr index"""
+        return self.indexer.all_users_after(cursor, page_size)
+
     def search_by_email(
         self,
         email: str,
         offset: int,
-        page_size: int
+        page_size: int,
+        include_total: bool = True
     ) -> Tuple[List[User], int]:
         """Search users by email with pagination and get total count"""
         lower_email = email.lower()
         users, total = self.indexer.search_by_email(
             lower_email,
             offset,
-            page_size
+            page_size,
+            include_total
             )
         return users, total
 
+    def search_by_email_after(
+        self,
+        email: str,
+        cursor: str,
+        page_size: int
+    ) -> Tuple[List[User], int, Optional[str]]:
+        """Search users by email with cursor-based pagination"""
+        lower_email = email.lower()
+        return self.indexer.search_by_email_after(
+            lower_email,
+            cursor,
+            page_size
+            )
+
 
 class CurrentUserResponseSerializer(serializers.Serializer[Dict[str, User]]):
     """Response serializer for the current user endpoint."""
@@ -96,7 +130,8 @@ class ListUsersResponseSerializer(serializers.Serializer[Dict[str, Any]]):
     """Response serializer for the list users endpoint."""
 
     users = UserSerializer(many=True)
-    total_count = serializers.IntegerField()
+    total_count = serializers.IntegerField(allow_null=True)
+    next_cursor = serializers.CharField(allow_null=True)
     indexer = UserIndexer()
 
     def search_by_email(
@@ -119,3 +154,26 @@ class ListUsersQuerySerializer(PaginationSerializer[str]):
     """Query params serializer for the list users endpoint."""
 
     email = serializers.CharField(required=False, allow_blank=True)
+    cursor = serializers.CharField(
+        required=False,
+        help_text=(
+            "Cursor-based pagination, as an alternative to offset. Pass * "
+            "to get the first page and then the next_cursor of each page"
+        ),
+    )
+    include_total = serializers.BooleanField(
+        required=False,
+        default=True,
+        help_text=(
+            "Whether to count the matching users. When false, total_count "
+            "is null and Solr stops counting past the requested page"
+        ),
+    )
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        """Check that offset and cursor are not used together"""
+        if "cursor" in attrs and "offset" in self.initial_data:
+            raise serializers.ValidationError({
+                "cursor": ["offset and cursor can not be used together"],
+            })
+        return attrs
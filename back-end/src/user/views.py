@@ -1,11 +1,12 @@
 from core.auth import (
     AdminAPIView, AuthenticatedAPIView, AuthenticatedRequest, TokenManager,
 )
+from core.search_backend import InvalidCursorException
 from core.swagger import swagger_authenticated_schema, swagger_typed_schema
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from drf_yasg import openapi
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -57,22 +58,44 @@ class ListUsersView(AdminAPIView):
         email = params.validated_data.get("email")
         offset = params.validated_data["offset"]
         page_size = params.validated_data["page_size"]
+        cursor = params.validated_data.get("cursor")
+        include_total = params.validated_data["include_total"]
 
         user_serializer = UserSerializer()
-        if email is None:
+        next_cursor = None
+        if cursor is not None:
+            try:
+                if email is None:
+                    users, total_count, next_cursor = (
+                        user_serializer.all_users_after(cursor, page_size)
+                    )
+                else:
+                    users, total_count, next_cursor = (
+                        user_serializer.search_by_email_after(
+                            email,
+                            cursor,
+                            page_size
+                            )
+                    )
+            except InvalidCursorException as e:
+                raise serializers.ValidationError({"cursor": [str(e)]})
+        elif email is None:
             users, total_count = user_serializer.all_users(
                 offset,
-                page_size
+                page_size,
+                include_total
                 )
         else:
             users, total_count = user_serializer.search_by_email(
                 email,
                 offset,
-                page_size
+                page_size,
+                include_total
                 )
         serializer = ListUsersResponseSerializer({
             "users": users,
-            "total_count": total_count,
+            "total_count": total_count if include_total else None,
+            "next_cursor": next_cursor,
         })
         return Response(serializer.data)
 
@@ -119,9 +142,20 @@ class LoginView(APIView):
             at, rt = token_manager.get_tokens_from_provider(code)
             email, at = token_manager.authenticate(at, rt)
             try:
-                self.serializer.find_by_email(email)
+                user = self.serializer.find_by_email(email)
             except User.DoesNotExist:
-                self.serializer.create({"email": email})
+                # Inactive users are not indexed, they keep their account
+                user = (
+                    User.objects.filter(email__iexact=email).first()
+                    or self.serializer.create({"email": email})
+                )
+            if not user.is_active:
+                return Response(
+                    status=status.HTTP_302_FOUND,
+                    headers={
+                        "Location": f"{settings.FRONT_END_URL}/error"
+                    }
+                )
 
             if state == "swagger":
                 response = Response(
@@ -398,3 +398,114 @@ def test_offset_bigger_than_users_count(tests_helper: Helper) -> None:
     total_count = response_body.get("total_count")
     assert total_count is not None
     assert total_count == users_count
+
+
+def test_cursor_pagination(tests_helper: Helper) -> None:
+    """
+    Test that following next_cursor from the first page returns every user
+    exactly once
+    """
+    email = "admin.email@email.net"
+    user = user_factory({
+        "email": email,
+        "is_superuser": True,
+    })
+    tests_helper.insert_user(user)
+    users_count = 12
+    for i in range(1, users_count):
+        user = user_factory({
+            "email": f"user{i}.email@email.net",
+        })
+        tests_helper.insert_user(user)
+    users_response_emails = []
+    cursor = "*"
+    while cursor is not None:
+        response = tests_helper.get_request(
+            "/users/",
+            authenticated_as=email,
+            query_params={"cursor": cursor, "page_size": 5},
+        )
+        assert response.status_code == 200
+        response_body = response.json()
+        assert response_body.get("total_count") == users_count
+        users_response_emails += [
+            u["email"] for u in response_body.get("users")
+        ]
+        cursor = response_body.get("next_cursor")
+    assert len(users_response_emails) == users_count
+    assert len(set(users_response_emails)) == users_count
+
+
+def test_cursor_and_offset(tests_helper: Helper) -> None:
+    """
+    Test that when both cursor and offset are provided, it returns 400
+    """
+    email = "admin.email@email.net"
+    user = user_factory({
+        "email": email,
+        "is_superuser": True,
+    })
+    tests_helper.insert_user(user)
+    response = tests_helper.get_request(
+        "/users/",
+        authenticated_as=email,
+        query_params={"cursor": "*", "offset": 0},
+    )
+    assert response.status_code == 400
+    response_body = response.json()
+    cursor_error = response_body.get("cursor")
+    assert cursor_error is not None
+    assert "offset and cursor can not be used together" in cursor_error
+
+
+def test_invalid_cursor(tests_helper: Helper) -> None:
+    """
+    Test that when the cursor is not valid, it returns 400
+    """
+    email = "admin.email@email.net"
+    user = user_factory({
+        "email": email,
+        "is_superuser": True,
+    })
+    tests_helper.insert_user(user)
+    response = tests_helper.get_request(
+        "/users/",
+        authenticated_as=email,
+        query_params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    response_body = response.json()
+    cursor_error = response_body.get("cursor")
+    assert cursor_error is not None
+    assert "Invalid cursor" in cursor_error
+
+
+def test_without_total(tests_helper: Helper) -> None:
+    """
+    Test that when include_total is false, the page of users is returned and
+    the total count is null
+    """
+    email = "admin.email@email.net"
+    user = user_factory({
+        "email": email,
+        "is_superuser": True,
+    })
+    tests_helper.insert_user(user)
+    users_count = 20
+    for i in range(1, users_count):
+        user = user_factory({
+            "email": f"user{i}.email@email.net",
+        })
+        tests_helper.insert_user(user)
+    response = tests_helper.get_request(
+        "/users/",
+        authenticated_as=email,
+        query_params={"page_size": 10, "include_total": "false"},
+    )
+    assert response.status_code == 200
+    response_body = response.json()
+    users_response = response_body.get("users")
+    assert users_response is not None
+    assert len(users_response) == 10
+    assert "total_count" in response_body
+    assert response_body.get("total_count") is None
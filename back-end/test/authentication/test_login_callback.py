@@ -90,3 +90,33 @@ def test_user_exists(tests_helper: Helper) -> None:
     assert response.headers['Location'] == (
         f"{static.FRONT_END_URL}/my-listings"
     )
+
+
+def test_user_inactive(tests_helper: Helper) -> None:
+    """
+    Test that the login endpoint returns 302 to the error page if the user
+    is inactive.
+    """
+    user_email = "inactive.user@email.net"
+    user = user_factory(
+        {
+            "email": user_email,
+            "is_active": False,
+        }
+    )
+    tests_helper.insert_user(user)
+    path = "/users/login-callback?code=123"
+    tests_helper.mock_okta_token_response(
+        response_body={
+            "access_token": "fake-access-token",
+        },
+        response_status=200,
+    )
+    tests_helper.mock_okta_userinfo_response(
+        response_body={
+            "email": user_email,
+        }
+    )
+    response = tests_helper.get_request(path)
+    assert response.status_code == 302
+    assert response.headers['Location'] == f"{static.FRONT_END_URL}/error"
@@ -144,6 +144,10 @@ def tests_helper(request: pytest.FixtureRequest) -> Helper:
                 )
             .with_env("SOLR_URL", solr_url)
             .with_env("SOLR_CORE", solr_core)
+            # The tests read the index right after the requests writing it,
+            # and no outbox worker runs next to the API
+            .with_env("SOLR_COMMIT_POLICY", "soft")
+            .with_env("SOLR_OUTBOX_DELIVER_ON_COMMIT", "True")
             .with_network(network)
             .start()
         )
@@ -0,0 +1,51 @@
+from test.factories.user import user_factory
+from test.utils import Helper
+
+
+def test_metrics_not_authenticated(tests_helper: Helper) -> None:
+    """
+    Test that the metrics endpoint returns 403 if the user is not
+    authenticated
+    """
+    response = tests_helper.get_request("/metrics/")
+    assert response.status_code == 403
+
+
+def test_metrics_as_non_admin(tests_helper: Helper) -> None:
+    """
+    Test that the metrics endpoint returns 403 if the user is not an admin
+    """
+    email = "existing.email@email.net"
+    user = user_factory({
+        "email": email,
+    })
+    tests_helper.insert_user(user)
+    response = tests_helper.get_request(
+        "/metrics/",
+        authenticated_as=email,
+    )
+    assert response.status_code == 403
+
+
+def test_metrics_as_admin(tests_helper: Helper) -> None:
+    """
+    Test that the metrics endpoint returns the search cache counters and
+    the state of the Solr circuit breaker to admins
+    """
+    email = "admin.email@email.net"
+    user = user_factory({
+        "email": email,
+        "is_superuser": True,
+    })
+    tests_helper.insert_user(user)
+    response = tests_helper.get_request(
+        "/metrics/",
+        authenticated_as=email,
+    )
+    assert response.status_code == 200
+    response_body = response.json()
+    assert "search_cache" in response_body
+    circuit_breaker = response_body.get("solr_circuit_breaker")
+    assert circuit_breaker is not None
+    assert circuit_breaker.get("state") == "closed"
+    assert response_body.get("solr_node_circuit_breakers") == {}
@@ -0,0 +1,153 @@
+"""
+The unit tests run in process, against an in-memory database and the
+in-memory search backend, without the containers of the other tests.
+"""
+import os
+import sys
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import django
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+os.environ["DJANGO_SETTINGS_MODULE"] = "test.unit.settings"
+os.environ["SOLR_BACKEND"] = "core.memory_backend.MemoryBackend"
+os.environ.setdefault(
+    "ENCRYPTION_KEY",
+    "HqvJK8Ur9q_ZFZlnM-1TOKu7sK4HidccP6NnmMdCEVo=",
+    )
+os.environ.setdefault("FRONT_END_URL", "http://localhost:3000")
+os.environ.setdefault("SOLR_URL", "http://solr:8983/solr")
+os.environ.setdefault("SOLR_CORE", "mylistings")
+django.setup()
+
+from app import settings  # noqa: E402
+from core import outbox  # noqa: E402
+from core.indexer import Indexer  # noqa: E402
+from core.memory_backend import MemoryBackend  # noqa: E402
+from core.search_backend import get_search_backend  # noqa: E402
+from core.solr import CommitPolicy  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def tests_helper() -> None:
+    """
+    Replace the containers of the other tests, which the unit tests do not
+    need.
+    """
+    return None
+
+
+@pytest.fixture
+def tear_down() -> None:
+    """
+    Replace the clean up of the containers of the other tests.
+    """
+    return None
+
+
+@pytest.fixture(autouse=True)
+def search_backend() -> Iterator[MemoryBackend]:
+    """
+    Empty the in-memory search backend before each test.
+    """
+    backend = get_search_backend()
+    assert isinstance(backend, MemoryBackend)
+    backend.clear()
+    yield backend
+    backend.clear()
+
+
+class UpdateRequest(NamedTuple):
+    """
+    Update request sent to the search backend.
+    """
+
+    """What the request does: update, delete or commit"""
+    action: str
+
+    """The ids of the documents it sends"""
+    ids: List[str]
+
+    """The mode of its commit policy, None if it has none"""
+    commit_mode: Optional[str]
+
+
+@pytest.fixture
+def update_requests(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+) -> List[UpdateRequest]:
+    """
+    Record the update requests sent to the in-memory search backend.
+    """
+    requests: List[UpdateRequest] = []
+    update = search_backend.update
+    delete = search_backend.delete
+
+    def recorded_update(
+        indexer: Indexer,
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        requests.append(UpdateRequest(
+            "update",
+            [document["id"] for document in documents],
+            commit_policy.mode if commit_policy else None,
+        ))
+        update(indexer, documents, commit_policy)
+
+    def recorded_delete(
+        indexer: Indexer,
+        ids: List[str],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        requests.append(UpdateRequest(
+            "delete",
+            list(ids),
+            commit_policy.mode if commit_policy else None,
+        ))
+        delete(indexer, ids, commit_policy)
+
+    def recorded_commit(indexer: Indexer, soft: bool = False) -> None:
+        requests.append(UpdateRequest(
+            "commit",
+            [],
+            CommitPolicy.SOFT if soft else CommitPolicy.HARD,
+        ))
+
+    monkeypatch.setattr(search_backend, "update", recorded_update)
+    monkeypatch.setattr(search_backend, "delete", recorded_delete)
+    monkeypatch.setattr(search_backend, "commit", recorded_commit)
+    return requests
+
+
+class InlineExecutor(Executor):
+    """
+    Executor running the submitted calls right away, in the calling thread.
+    """
+
+    def submit(  # type: ignore[override]
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any,
+    ) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+@pytest.fixture
+def deliver_on_commit(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Deliver the outbox entries of a transaction once it commits, in the
+    committing thread rather than the delivery one, which would not see the
+    in-memory test database.
+    """
+    monkeypatch.setattr(settings, "SOLR_OUTBOX_DELIVER_ON_COMMIT", True)
+    monkeypatch.setattr(outbox, "get_delivery_executor", InlineExecutor)
+    # The connection of the test is in a transaction, it must not be closed
+    monkeypatch.setattr(outbox, "close_old_connections", lambda: None)
@@ -0,0 +1,16 @@
+from core.models import User
+
+
+def create_user(email: str, is_active: bool = True) -> User:
+    """
+    Create a user in the database.
+
+    :param email: The email of the user.
+    :param is_active: Whether the user is active.
+    :return: The user.
+    """
+    return User.objects.create(
+        email=email,
+        username=email.split("@")[0],
+        is_active=is_active,
+    )
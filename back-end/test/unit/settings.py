@@ -0,0 +1,12 @@
+"""
+Settings of the unit tests, which use an in-memory SQLite database instead
+of the PostgreSQL container.
+"""
+from app.settings import *  # noqa: F401, F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
@@ -0,0 +1,49 @@
+import asyncio
+from typing import List, Tuple
+
+import httpx
+from core.memory_backend import MemoryBackend
+from core.models import User
+from core.solr import get_async_client
+from user.indexer import AsyncUserIndexer
+
+
+def test_async_indexer(search_backend: MemoryBackend) -> None:
+    """
+    Test that the async indexer writes and reads the documents of the users
+    """
+    ada = User(pk=1, email="ada@email.net", username="ada")
+    alan = User(pk=2, email="alan@email.net", username="alan")
+
+    async def index_and_read() -> Tuple[List[User], Tuple[List[User], int]]:
+        indexer = AsyncUserIndexer()
+        await indexer.add(ada)
+        await indexer.add(alan)
+        return (
+            await indexer.find_by_ids([2, 1, 3]),
+            await indexer.search_by_email("alan", 0, 10),
+        )
+
+    by_ids, (found, total) = asyncio.run(index_and_read())
+    assert [user.email for user in by_ids] == [alan.email, ada.email]
+    assert [user.email for user in found] == [alan.email]
+    assert total == 1
+
+
+def test_async_client_per_event_loop() -> None:
+    """
+    Test that the coroutines of an event loop share one client, and that
+    each loop gets its own one, closed when the loop shuts down
+    """
+
+    async def get_clients() -> Tuple[httpx.AsyncClient, httpx.AsyncClient]:
+        client = get_async_client()
+        await asyncio.sleep(0)
+        return client, get_async_client()
+
+    first, same = asyncio.run(get_clients())
+    second, _ = asyncio.run(get_clients())
+    assert first is same
+    assert first is not second
+    assert first.is_closed
+    assert second.is_closed
@@ -0,0 +1,100 @@
+import threading
+from test.unit.factories import create_user
+from typing import List
+
+import pytest
+from core import auto_index, outbox
+from core.memory_backend import MemoryBackend
+from core.models import IndexOutboxEntry, User
+from django.db import transaction
+from pytest_django import DjangoCaptureOnCommitCallbacks
+from user.indexer import UserIndexer
+
+
+def test_models_registered_from_settings() -> None:
+    """
+    Test that the models listed in SOLR_AUTO_INDEX are registered at startup
+    """
+    assert auto_index.is_registered(User)
+
+
+@pytest.mark.django_db
+def test_save_enqueues_indexed_changes() -> None:
+    """
+    Test that saving an instance enqueues it, unless none of the saved
+    fields are indexed
+    """
+    user = create_user("user@email.net")
+    IndexOutboxEntry.objects.all().delete()
+    user.save(update_fields=["last_login"])
+    assert not IndexOutboxEntry.objects.exists()
+    user.save(update_fields=["first_name"])
+    entry = IndexOutboxEntry.objects.get()
+    assert (entry.model_label, entry.object_id) == ("core.user", user.pk)
+
+
+@pytest.mark.django_db
+def test_unregister() -> None:
+    """
+    Test that the changes of an unregistered model are no longer enqueued
+    """
+    auto_index.unregister(User)
+    try:
+        create_user("user@email.net")
+        assert not auto_index.is_registered(User)
+        assert not IndexOutboxEntry.objects.exists()
+    finally:
+        auto_index.register(User)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("deliver_on_commit")
+def test_transaction_delivered_once(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+    django_capture_on_commit_callbacks: DjangoCaptureOnCommitCallbacks,
+) -> None:
+    """
+    Test that the entries enqueued by a transaction are delivered together,
+    once, when it commits, and that those of a rolled back savepoint or
+    transaction are not
+    """
+    monkeypatch.setattr(outbox, "_pending", threading.local())
+    deliveries: List[List[int]] = []
+    deliver = outbox.deliver
+
+    def recorded_deliver(entries: List[IndexOutboxEntry]) -> None:
+        deliveries.append([entry.object_id for entry in entries])
+        deliver(entries)
+
+    monkeypatch.setattr(outbox, "deliver", recorded_deliver)
+    with django_capture_on_commit_callbacks() as callbacks:
+        with pytest.raises(RuntimeError), transaction.atomic():
+            create_user("rolled.back@email.net")
+            raise RuntimeError("Rolled back")
+    assert callbacks == []
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        users = [create_user(f"user{i}@email.net") for i in range(3)]
+        with pytest.raises(RuntimeError), transaction.atomic():
+            create_user("rolled.back@email.net")
+            raise RuntimeError("Rolled back")
+        users.append(create_user("user3@email.net"))
+    pks = [user.pk for user in users]
+    assert len(callbacks) == 1
+    assert deliveries == [pks]
+    assert sorted(UserIndexer().iter_ids()) == pks
+    assert not IndexOutboxEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_delivered_by_worker(
+    django_capture_on_commit_callbacks: DjangoCaptureOnCommitCallbacks,
+) -> None:
+    """
+    Test that the entries are left to the outbox worker by default
+    """
+    with django_capture_on_commit_callbacks() as callbacks:
+        create_user("user@email.net")
+    assert callbacks == []
+    assert IndexOutboxEntry.objects.count() == 1
@@ -0,0 +1,119 @@
+import time
+from typing import List
+
+import pytest
+from core.circuit_breaker import CircuitBreaker, CircuitOpenException
+
+
+class Clock:
+    """
+    Clock of the breakers, moved forward by the tests.
+    """
+
+    now: float
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+    return clock
+
+
+def fail() -> None:
+    raise ConnectionError("down")
+
+
+def trip(breaker: CircuitBreaker, times: int) -> None:
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+def test_opens_after_consecutive_failures(clock: Clock) -> None:
+    """
+    Test that the circuit only opens after failure_threshold failures in a
+    row, and then rejects the calls without making them
+    """
+    breaker = CircuitBreaker("solr", 3, 10)
+    trip(breaker, 2)
+    assert breaker.call(lambda: "ok") == "ok"
+    trip(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+    trip(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    calls: List[int] = []
+    with pytest.raises(CircuitOpenException):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+    assert not breaker.is_available()
+    assert breaker.stats() == {
+        "state": CircuitBreaker.OPEN,
+        "failures": 3,
+        "times_opened": 1,
+        "rejected": 1,
+    }
+
+
+def test_trial_call_closes(clock: Clock) -> None:
+    """
+    Test that a single trial call is let through once reset_timeout has
+    passed, and that its success closes the circuit
+    """
+    breaker = CircuitBreaker("solr", 1, 10)
+    trip(breaker, 1)
+    clock.now += 9
+    with pytest.raises(CircuitOpenException):
+        breaker.call(lambda: "ok")
+    clock.now += 1
+    assert breaker.is_available()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenException):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.call(lambda: "ok") == "ok"
+
+
+def test_failed_trial_call_opens(clock: Clock) -> None:
+    """
+    Test that a failed trial call opens the circuit again for another
+    reset_timeout
+    """
+    breaker = CircuitBreaker("solr", 3, 10)
+    trip(breaker, 3)
+    clock.now += 10
+    trip(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    clock.now += 9
+    assert not breaker.is_available()
+    clock.now += 1
+    assert breaker.is_available()
+
+
+def test_rejections_are_not_failures(clock: Clock) -> None:
+    """
+    Test that the exceptions that are not failures of the dependency reset
+    the failure count
+    """
+    breaker = CircuitBreaker(
+        "solr",
+        2,
+        10,
+        lambda e: isinstance(e, ConnectionError),
+        )
+    trip(breaker, 1)
+    with pytest.raises(ValueError):
+        breaker.call(lambda: int("not a number"))
+    trip(breaker, 1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 1
@@ -0,0 +1,103 @@
+from typing import Any
+
+import pytest
+from core.codecs import FieldCodec, decode_field, encode_field
+from core.models import IndexOutboxEntry, User
+
+
+def test_codec_round_trips_model_fields() -> None:
+    """
+    Test that the codec of a model encodes each field with the suffix of its
+    type, and decodes the document back
+    """
+    codec = FieldCodec(User, ["id", "email", "is_superuser", "first_name"])
+    data = {
+        "id": 7,
+        "email": "ada@email.net",
+        "is_superuser": True,
+        "first_name": "Ada",
+    }
+    document = codec.encode(data)
+    assert document == {
+        "id": "user:7",
+        "email_s": "ada@email.net",
+        "is_superuser_b": True,
+        "first_name_s": "Ada",
+    }
+    assert codec.decode(document) == data
+
+
+def test_codec_round_trips_integer_fields() -> None:
+    """
+    Test that integer fields use the _i suffix and decode to integers
+    """
+    codec = FieldCodec(IndexOutboxEntry, ["id", "object_id", "attempts"])
+    data = {"id": 3, "object_id": 12, "attempts": 2}
+    document = codec.encode(data)
+    assert document == {
+        "id": "indexoutboxentry:3",
+        "object_id_i": 12,
+        "attempts_i": 2,
+    }
+    assert codec.decode(document) == data
+
+
+def test_codec_round_trips_override_types() -> None:
+    """
+    Test that the overridden types pick the suffix of the Solr field, for
+    model fields and extra fields
+    """
+    codec = FieldCodec(
+        User,
+        ["email_ngram", "bio", "score", "username"],
+        {"email_ngram": "ng", "bio": "t", "score": "f", "username": "t"},
+        )
+    data = {
+        "email_ngram": "ada@email.net",
+        "bio": "Analyst",
+        "score": 0.5,
+        "username": "ada",
+    }
+    document = codec.encode(data)
+    assert document == {
+        "email_ngram_ng": "ada@email.net",
+        "bio_t": "Analyst",
+        "score_f": 0.5,
+        "username_t": "ada",
+    }
+    assert codec.decode(document) == data
+
+
+def test_codec_unknown_and_missing_fields() -> None:
+    """
+    Test that None values are left out, that unknown keys are encoded from
+    their value and that the fields the codec does not read are dropped
+    """
+    codec = FieldCodec(User, ["id", "email"])
+    document = codec.encode({"id": 1, "email": None, "rank": 3})
+    assert document == {"id": "user:1", "rank_i": 3}
+    assert codec.decode({**document, "_version_": 1}) == {"id": 1}
+
+
+@pytest.mark.parametrize("key,value,solr_key", [
+    ("email", "ada@email.net", "email_s"),
+    ("is_superuser", False, "is_superuser_b"),
+    ("rank", 3, "rank_i"),
+    ("score", 0.5, "score_f"),
+    ("id", "user:1", "id"),
+])
+def test_encode_decode_field(key: str, value: Any, solr_key: str) -> None:
+    """
+    Test that the fields of unknown type round-trip through the suffix
+    picked from their value
+    """
+    assert encode_field(key, value) == (solr_key, value)
+    assert decode_field(solr_key, value) == (key, value)
+
+
+def test_decode_field_without_suffix() -> None:
+    """
+    Test that Solr fields without a known suffix are not decoded
+    """
+    assert decode_field("_version_", 1) is None
+    assert decode_field("email_ngram_ng", "ada") is None
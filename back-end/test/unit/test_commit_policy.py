@@ -0,0 +1,59 @@
+from test.unit.conftest import UpdateRequest
+from typing import List
+
+import pytest
+from app import settings
+from core.models import User
+from core.solr import CommitPolicy
+from user.indexer import UserIndexer
+
+
+@pytest.mark.parametrize("mode,batch_mode", [
+    (CommitPolicy.HARD, CommitPolicy.NONE),
+    (CommitPolicy.SOFT, CommitPolicy.NONE),
+    (CommitPolicy.WITHIN, CommitPolicy.WITHIN),
+    (CommitPolicy.NONE, CommitPolicy.NONE),
+])
+def test_for_batch(mode: str, batch_mode: str) -> None:
+    """
+    Test that the intermediate requests of a bulk write only keep the
+    "within" commits
+    """
+    policy = CommitPolicy(mode, within_ms=500)
+    batch_policy = policy.for_batch()
+    assert batch_policy.mode == batch_mode
+    assert batch_policy.within_ms == 500 or batch_mode == CommitPolicy.NONE
+
+
+def test_default_leaves_commits_to_solr() -> None:
+    """
+    Test that writes leave their commits to the auto commits of Solr by
+    default
+    """
+    assert CommitPolicy.default().mode == CommitPolicy.NONE
+
+
+@pytest.mark.parametrize("mode,modes", [
+    (
+        CommitPolicy.SOFT,
+        [CommitPolicy.NONE, CommitPolicy.NONE, CommitPolicy.SOFT],
+    ),
+    (
+        CommitPolicy.WITHIN,
+        [CommitPolicy.WITHIN, CommitPolicy.WITHIN, CommitPolicy.WITHIN],
+    ),
+])
+def test_add_many_commits_last_batch(
+    monkeypatch: pytest.MonkeyPatch,
+    update_requests: List[UpdateRequest],
+    mode: str,
+    modes: List[str],
+) -> None:
+    """
+    Test that a bulk write only sends hard and soft commits with its last
+    request, and "within" commits with every request
+    """
+    monkeypatch.setattr(settings, "SOLR_COMMIT_POLICY", mode)
+    users = [User(pk=pk, email=f"user{pk}@email.net") for pk in range(1, 6)]
+    UserIndexer().add_many(users, batch_size=2)
+    assert [request.commit_mode for request in update_requests] == modes
@@ -0,0 +1,119 @@
+from test.unit.conftest import UpdateRequest
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from core.indexer import Indexer
+from core.memory_backend import MemoryBackend
+from core.models import User
+from core.query import MATCH_NOTHING
+from core.search_backend import SolrExportException
+from user.indexer import UserIndexer
+
+
+@pytest.fixture
+def users(search_backend: MemoryBackend) -> List[User]:
+    users = [
+        User(pk=1, email="ada@email.net", first_name="Ada"),
+        User(pk=2, email="alan@email.net", first_name="Ada"),
+        User(pk=3, email="grace@email.net", first_name="Grace"),
+    ]
+    UserIndexer().add_many(users)
+    return users
+
+
+def test_build_query_keeps_every_clause() -> None:
+    """
+    Test that every parameter of a query becomes a clause
+    """
+    query = UserIndexer().build_query({
+        "email": "ada@email.net",
+        "first_name": ["Ada", "Grace"],
+        "is_superuser": False,
+    })
+    assert query.clauses == [
+        "email_s:ada@email.net",
+        "first_name_s:(Ada OR Grace)",
+    ]
+    assert query.filters == ["is_superuser_b:false"]
+
+
+def test_search_matches_every_clause(users: List[User]) -> None:
+    """
+    Test that searches only return the instances matching every parameter
+    """
+    results, total_count = UserIndexer().search(
+        {"first_name": "Ada", "email": "alan@email.net"},
+        0,
+        10,
+    )
+    assert [user.pk for user in results] == [2]
+    assert total_count == 1
+
+
+def test_empty_list_matches_nothing(users: List[User]) -> None:
+    """
+    Test that an empty list of values matches no document, like an empty
+    IN, instead of dropping its clause
+    """
+    indexer = UserIndexer()
+    query = indexer.build_search_query({"id": []})
+    assert query.filters == [MATCH_NOTHING]
+    assert indexer.search({"id": []}, 0, 10) == ([], 0)
+    assert indexer.search({"first_name": "Ada", "email": []}, 0, 10) == (
+        [],
+        0,
+    )
+    assert indexer.count({"first_name": []}) == 0
+
+
+def test_add_many_sends_batches(update_requests: List[UpdateRequest]) -> None:
+    """
+    Test that add_many sends the instances in batches of batch_size, one
+    update request each
+    """
+    users = (
+        User(pk=pk, email=f"user{pk}@email.net") for pk in range(1, 6)
+    )
+    assert UserIndexer().add_many(users, batch_size=2) == 5
+    assert [request.ids for request in update_requests] == [
+        ["user:1", "user:2"],
+        ["user:3", "user:4"],
+        ["user:5"],
+    ]
+    assert UserIndexer().count({}) == 5
+
+
+def test_iter_all_exports(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+    users: List[User],
+) -> None:
+    """
+    Test that iter_all streams every instance from the export handler,
+    sorted by id
+    """
+    # Any select request would fail
+    monkeypatch.setattr(search_backend, "select", None)
+    assert [user.pk for user in UserIndexer().iter_all()] == [1, 2, 3]
+
+
+def test_iter_all_falls_back_to_cursor(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+    users: List[User],
+) -> None:
+    """
+    Test that iter_all walks the index with a cursor when the export
+    handler rejects the request
+    """
+
+    def rejected_export(
+        indexer: Indexer,
+        params: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        raise SolrExportException("Field first_name_s has no doc values")
+        yield {}
+
+    monkeypatch.setattr(search_backend, "export", rejected_export)
+    instances = UserIndexer().iter_all(batch_size=2)
+    assert [user.pk for user in instances] == [1, 2, 3]
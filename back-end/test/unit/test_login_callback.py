@@ -0,0 +1,65 @@
+from test.unit.factories import create_user
+from typing import Tuple
+
+import pytest
+from core.auth import TokenManager
+from core.models import User
+from django.test import Client
+from user.indexer import UserIndexer
+
+
+@pytest.fixture
+def okta_email(monkeypatch: pytest.MonkeyPatch) -> str:
+    """
+    Make Okta authenticate the login callbacks as a fixed email.
+    """
+    email = "inactive.user@email.net"
+
+    def get_tokens_from_provider(
+        self: TokenManager,
+        code: str,
+    ) -> Tuple[str, str]:
+        return "fake-access-token", "fake-refresh-token"
+
+    def authenticate(
+        self: TokenManager,
+        access_token: str,
+        refresh_token: str,
+    ) -> Tuple[str, str]:
+        return email, access_token
+
+    monkeypatch.setattr(
+        TokenManager,
+        "get_tokens_from_provider",
+        get_tokens_from_provider,
+        )
+    monkeypatch.setattr(TokenManager, "authenticate", authenticate)
+    return email
+
+
+@pytest.mark.django_db
+def test_inactive_user_not_indexed(okta_email: str) -> None:
+    """
+    Test that the login endpoint returns 302 to the error page, without
+    creating another account, if the user is inactive and so not indexed
+    """
+    create_user(okta_email, is_active=False)
+    response = Client().get("/users/login-callback?code=123")
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/error")
+    assert "credentials" not in response.cookies
+    assert User.objects.filter(email=okta_email).count() == 1
+
+
+@pytest.mark.django_db
+def test_inactive_user_indexed(okta_email: str) -> None:
+    """
+    Test that the login endpoint returns 302 to the error page if the user
+    is inactive but still indexed
+    """
+    user = create_user(okta_email, is_active=False)
+    UserIndexer().add(user)
+    response = Client().get("/users/login-callback?code=123")
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/error")
+    assert "credentials" not in response.cookies
@@ -0,0 +1,179 @@
+from test.unit.factories import create_user
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+import requests
+from app import settings
+from core import outbox
+from core.indexer import Indexer
+from core.memory_backend import MemoryBackend
+from core.models import IndexOutboxEntry
+from core.solr import CommitPolicy
+from django.db import transaction
+from django.utils import timezone
+from user.indexer import UserIndexer
+
+
+def fail_updates_of(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+    document_ids: List[str],
+) -> None:
+    """
+    Make the update requests of the backend fail when they hold one of some
+    documents.
+    """
+    update = search_backend.update
+
+    def failing_update(
+        indexer: Indexer,
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        if any(document["id"] in document_ids for document in documents):
+            raise requests.ConnectionError("Solr is down")
+        update(indexer, documents, commit_policy)
+
+    monkeypatch.setattr(search_backend, "update", failing_update)
+
+
+@pytest.mark.django_db
+def test_deliver(search_backend: MemoryBackend) -> None:
+    """
+    Test that deliver indexes the existing objects of the entries and
+    removes the deleted ones
+    """
+    indexer = UserIndexer()
+    kept = create_user("kept.user@email.net")
+    deleted = create_user("deleted.user@email.net")
+    indexer.add_many([deleted])
+    deleted.delete()
+    outbox.deliver(list(IndexOutboxEntry.objects.all()))
+    assert list(indexer.iter_ids()) == [kept.pk]
+
+
+@pytest.mark.django_db
+def test_deliver_commits_once(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+) -> None:
+    """
+    Test that deliver sends its update requests without committing, and a
+    single commit at the end
+    """
+    monkeypatch.setattr(settings, "SOLR_COMMIT_POLICY", CommitPolicy.SOFT)
+    policies: List[str] = []
+    commits: List[bool] = []
+    update = search_backend.update
+    delete = search_backend.delete
+
+    def recorded_update(
+        indexer: Indexer,
+        documents: List[Dict[str, Any]],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        policies.append(commit_policy.mode if commit_policy else "default")
+        update(indexer, documents, commit_policy)
+
+    def recorded_delete(
+        indexer: Indexer,
+        ids: List[str],
+        commit_policy: Optional[CommitPolicy] = None,
+    ) -> None:
+        policies.append(commit_policy.mode if commit_policy else "default")
+        delete(indexer, ids, commit_policy)
+
+    def recorded_commit(indexer: Indexer, soft: bool = False) -> None:
+        commits.append(soft)
+
+    monkeypatch.setattr(search_backend, "update", recorded_update)
+    monkeypatch.setattr(search_backend, "delete", recorded_delete)
+    monkeypatch.setattr(search_backend, "commit", recorded_commit)
+    renamed = create_user("renamed.user@email.net")
+    added = create_user("added.user@email.net")
+    deleted = create_user("deleted.user@email.net")
+    UserIndexer().add_many([renamed, deleted])
+    policies.clear()
+    IndexOutboxEntry.objects.all().delete()
+    renamed.first_name = "Ada"
+    renamed.save(update_fields=["first_name"])
+    outbox.enqueue(added)
+    deleted.delete()
+
+    outbox.deliver(list(IndexOutboxEntry.objects.all()))
+    assert len(policies) == 2
+    assert set(policies) == {CommitPolicy.NONE}
+    assert commits == [True]
+
+
+@pytest.mark.django_db
+def test_drain_isolates_failing_entries(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+) -> None:
+    """
+    Test that a failing object only holds back its own entry, which is
+    retried later
+    """
+    indexer = UserIndexer()
+    first = create_user("first.user@email.net")
+    failing = create_user("failing.user@email.net")
+    last = create_user("last.user@email.net")
+    fail_updates_of(monkeypatch, search_backend, [
+        indexer.document_id(failing.pk),
+    ])
+    assert outbox.drain() == (2, 1)
+    assert sorted(indexer.iter_ids()) == [first.pk, last.pk]
+    entry = IndexOutboxEntry.objects.get()
+    assert entry.object_id == failing.pk
+    assert entry.attempts == 1
+    assert entry.next_attempt_at > timezone.now()
+    assert entry.dead_at is None
+    assert entry.last_error == "Solr is down"
+
+
+@pytest.mark.django_db
+def test_drain_claims_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that the entries are delivered outside of the transaction claiming
+    them, and left to the other workers meanwhile
+    """
+    create_user("user@email.net")
+    savepoint_ids = list(transaction.get_connection().savepoint_ids)
+    concurrent_drains: List[Tuple[int, int]] = []
+    deliver = outbox.deliver
+
+    def claimed_deliver(entries: List[IndexOutboxEntry]) -> None:
+        assert transaction.get_connection().savepoint_ids == savepoint_ids
+        concurrent_drains.append(outbox.drain())
+        deliver(entries)
+
+    monkeypatch.setattr(outbox, "deliver", claimed_deliver)
+    assert outbox.drain() == (1, 0)
+    assert concurrent_drains == [(0, 0)]
+    assert not IndexOutboxEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_drain_gives_up_entries(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+) -> None:
+    """
+    Test that an entry is given up after SOLR_OUTBOX_MAX_ATTEMPTS failed
+    deliveries, and no longer drained
+    """
+    monkeypatch.setattr(settings, "SOLR_OUTBOX_MAX_ATTEMPTS", 2)
+    user = create_user("failing.user@email.net")
+    fail_updates_of(monkeypatch, search_backend, [
+        UserIndexer().document_id(user.pk),
+    ])
+    assert outbox.drain() == (0, 1)
+    assert IndexOutboxEntry.objects.get().dead_at is None
+    IndexOutboxEntry.objects.update(next_attempt_at=timezone.now())
+    assert outbox.drain() == (0, 1)
+    entry = IndexOutboxEntry.objects.get()
+    assert entry.attempts == 2
+    assert entry.dead_at is not None
+    IndexOutboxEntry.objects.update(next_attempt_at=timezone.now())
+    assert outbox.drain() == (0, 0)
@@ -0,0 +1,214 @@
+from datetime import timedelta
+from test.unit.factories import create_user
+from typing import Iterator, List
+
+import pytest
+from app import settings
+from core.management.commands import reindex
+from core.management.commands.reindex import (
+    SWAP_WATERMARK_NAME, WATERMARK_NAME, Command, index_user_range,
+)
+from core.memory_backend import MemoryBackend
+from core.models import IndexTombstone, IndexWatermark, User
+from core.solr import CommitPolicy
+from django.core.management.base import CommandError
+from django.utils import timezone
+from user.indexer import UserIndexer
+
+
+@pytest.fixture
+def solr_cores(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+) -> MemoryBackend:
+    """
+    Run the CoreAdmin actions of the reindex command on the cores of the
+    in-memory search backend.
+    """
+
+    def swap_cores(name: str, other: str) -> None:
+        cores = search_backend.cores
+        cores[name], cores[other] = cores[other], cores[name]
+
+    monkeypatch.setattr(
+        reindex,
+        "core_exists",
+        lambda name: name in search_backend.cores,
+    )
+    monkeypatch.setattr(
+        reindex,
+        "create_core",
+        lambda name: search_backend.cores.setdefault(name, {}),
+    )
+    monkeypatch.setattr(reindex, "unload_core", search_backend.cores.pop)
+    monkeypatch.setattr(reindex, "swap_cores", swap_cores)
+    return search_backend
+
+
+def core_ids(search_backend: MemoryBackend, core: str) -> List[str]:
+    return sorted(search_backend.cores.get(core, {}))
+
+
+@pytest.mark.django_db
+def test_remove_deleted_users(
+    monkeypatch: pytest.MonkeyPatch,
+    search_backend: MemoryBackend,
+) -> None:
+    """
+    Test that the users deleted or deactivated since a given moment are
+    removed from the index without walking it, even when a user reactivated
+    meanwhile keeps the counts of the index and the table equal
+    """
+    indexer = UserIndexer()
+    kept = create_user("kept.user@email.net")
+    deleted = create_user("deleted.user@email.net")
+    deactivated = create_user("deactivated.user@email.net")
+    reactivated = create_user("reactivated.user@email.net", is_active=False)
+    indexer.add_many([kept, deleted, deactivated])
+    since = timezone.now()
+    deleted_pk = deleted.pk
+    deleted.delete()
+    deactivated.is_active = False
+    deactivated.save()
+    User.objects.filter(pk=reactivated.pk).update(is_active=True)
+
+    def iter_ids(batch_size: int) -> Iterator[int]:
+        raise AssertionError("The index was walked")
+
+    monkeypatch.setattr(indexer, "iter_ids", iter_ids)
+    removed = Command().remove_deleted_users(
+        indexer,
+        since,
+        batch_size=1,
+        commit_policy=CommitPolicy(CommitPolicy.NONE),
+        )
+    monkeypatch.undo()
+    assert removed == 2
+    assert list(indexer.iter_ids()) == [kept.pk]
+    assert indexer.find_by_ids([deleted_pk]) == []
+
+
+@pytest.mark.django_db
+def test_incremental_prunes_tombstones(search_backend: MemoryBackend) -> None:
+    """
+    Test that an incremental run only removes the users deleted since the
+    previous one, and prunes the older tombstones
+    """
+    indexer = UserIndexer()
+    users = [create_user(f"user{i}@email.net") for i in range(2)]
+    indexer.add_many(users)
+    previous_run_at = timezone.now() - timedelta(hours=1)
+    IndexWatermark.objects.create(
+        name=WATERMARK_NAME,
+        modified_at=previous_run_at,
+    )
+    pks = [user.pk for user in users]
+    for user in users:
+        user.delete()
+    old_tombstone = IndexTombstone.objects.get(object_id=pks[0])
+    old_tombstone.deleted_at = previous_run_at - timedelta(days=1)
+    old_tombstone.save()
+
+    count, removed = Command().index_incremental(10, None)
+    assert (count, removed) == (0, 1)
+    assert list(indexer.iter_ids()) == [pks[0]]
+    assert list(
+        IndexTombstone.objects.values_list("object_id", flat=True)
+    ) == [pks[1]]
+
+
+@pytest.mark.django_db
+def test_get_pk_ranges() -> None:
+    """
+    Test that the primary keys of the table are split into contiguous
+    ranges of chunk_size, from the first to the last one
+    """
+    assert Command().get_pk_ranges(2) == []
+    users = [create_user(f"user{i}@email.net") for i in range(5)]
+    users[0].delete()
+    first_pk = users[1].pk
+    assert Command().get_pk_ranges(2) == [
+        (first_pk, first_pk + 2),
+        (first_pk + 2, first_pk + 4),
+    ]
+    assert Command().get_pk_ranges(3) == [
+        (first_pk, first_pk + 3),
+        (first_pk + 3, first_pk + 4),
+    ]
+
+
+@pytest.mark.django_db
+def test_ranges_index_every_user_once(search_backend: MemoryBackend) -> None:
+    """
+    Test that indexing each range indexes every indexable user once
+    """
+    users = [create_user(f"user{i}@email.net") for i in range(5)]
+    create_user("inactive.user@email.net", is_active=False)
+    count = sum(
+        index_user_range(start, end, batch_size=2, commit_policy=None)
+        for start, end in Command().get_pk_ranges(2)
+    )
+    assert count == 5
+    assert sorted(UserIndexer().iter_ids()) == [user.pk for user in users]
+
+
+@pytest.mark.django_db
+def test_blue_green_swaps_rebuilt_index(solr_cores: MemoryBackend) -> None:
+    """
+    Test that the index is rebuilt into the standby core, which is swapped
+    with the live core, and that the previous index is kept in the standby
+    core
+    """
+    indexer = UserIndexer()
+    users = [create_user(f"user{i}@email.net") for i in range(3)]
+    indexer.add_many(users[:2])
+    indexer.update({"id": 0, "email": "orphan@email.net"})
+    previous_ids = core_ids(solr_cores, settings.SOLR_CORE)
+    # Left by a previous swap
+    solr_cores.cores[settings.SOLR_STANDBY_CORE] = {"user:0": {}}
+
+    count = Command().index_blue_green(batch_size=2, chunk_size=2, workers=1)
+    assert count == 3
+    assert core_ids(solr_cores, settings.SOLR_CORE) == sorted(
+        indexer.document_id(user.pk) for user in users
+    )
+    assert core_ids(solr_cores, settings.SOLR_STANDBY_CORE) == previous_ids
+    assert IndexWatermark.objects.filter(name=SWAP_WATERMARK_NAME).exists()
+
+
+@pytest.mark.django_db
+def test_rollback_catches_up(solr_cores: MemoryBackend) -> None:
+    """
+    Test that a rollback swaps the previous index back, indexes the users
+    created since the swap and removes the users deleted since then
+    """
+    indexer = UserIndexer()
+    deleted = create_user("deleted.user@email.net")
+    kept = create_user("kept.user@email.net")
+    indexer.add_many([deleted, kept])
+    Command().index_blue_green(batch_size=10, chunk_size=10, workers=1)
+    rebuilt_ids = core_ids(solr_cores, settings.SOLR_CORE)
+    deleted.delete()
+    created = create_user("created.user@email.net")
+
+    assert Command().rollback(batch_size=10) == 2
+    assert core_ids(solr_cores, settings.SOLR_CORE) == sorted([
+        indexer.document_id(kept.pk),
+        indexer.document_id(created.pk),
+    ])
+    assert core_ids(solr_cores, settings.SOLR_STANDBY_CORE) == rebuilt_ids
+
+
+@pytest.mark.django_db
+def test_rollback_without_standby(solr_cores: MemoryBackend) -> None:
+    """
+    Test that there is no rollback without a standby core, and that the
+    live core is left untouched
+    """
+    user = create_user("user@email.net")
+    UserIndexer().add_many([user])
+    with pytest.raises(CommandError):
+        Command().rollback(batch_size=10)
+    assert core_ids(solr_cores, settings.SOLR_CORE) == [
+        UserIndexer().document_id(user.pk),
+    ]
@@ -0,0 +1,314 @@
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+import requests
+from core.indexer import Indexer
+from core.memory_backend import MemoryBackend
+from core.search_backend import (
+    InvalidCursorException, SolrExportException, VersionConflictException,
+    rejected_requests,
+)
+from user.indexer import UserIndexer
+
+
+def user_document(pk: int, **fields: Any) -> Dict[str, Any]:
+    document = {
+        "id": f"user:{pk}",
+        "email_s": f"user{pk}@email.net",
+        "email_ngram_ng": f"user{pk}@email.net",
+        "is_superuser_b": False,
+    }
+    document.update(fields)
+    return document
+
+
+def ids(docs: List[Dict[str, Any]]) -> List[str]:
+    return [doc["id"] for doc in docs]
+
+
+@pytest.fixture
+def indexer(search_backend: MemoryBackend) -> Indexer:
+    indexer = Indexer()
+    search_backend.update(indexer, [
+        user_document(1, first_name_s="Ada"),
+        user_document(2, first_name_s="Alan", is_superuser_b=True),
+        user_document(3, first_name_s="Grace Hopper"),
+        {"id": "listing:1", "title_s": "Flat"},
+    ])
+    return indexer
+
+
+def test_select_filters_and_pages(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that select applies q and every fq, and pages the matches
+    """
+    response = search_backend.select(indexer, {
+        "q": "first_name_s:A*",
+        "fq": ["id:user\\:*", "is_superuser_b:false"],
+    })
+    assert response["response"]["numFound"] == 1
+    assert ids(response["response"]["docs"]) == ["user:1"]
+    response = search_backend.select(indexer, {
+        "q": "id:user\\:*",
+        "sort": "id desc",
+        "start": 1,
+        "rows": 1,
+        "fl": "id",
+    })
+    assert response["response"]["numFound"] == 3
+    assert response["response"]["docs"] == [{"id": "user:2"}]
+
+
+def test_select_matches_escaped_and_or_values(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that select unescapes the values and matches any value of an OR
+    group
+    """
+    response = search_backend.select(indexer, {
+        "q": "first_name_s:(Ada OR Grace\\ Hopper)",
+    })
+    assert ids(response["response"]["docs"]) == ["user:1", "user:3"]
+
+
+def test_select_negated_clauses(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that negated clauses exclude their matches, and that -*:* matches
+    nothing
+    """
+    response = search_backend.select(indexer, {
+        "q": "id:user\\:* AND -first_name_s:A*",
+    })
+    assert ids(response["response"]["docs"]) == ["user:3"]
+    response = search_backend.select(indexer, {"q": "*:*", "fq": ["-*:*"]})
+    assert response["response"]["numFound"] == 0
+
+
+def test_select_matches_ngrams(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that the n-gram fields match the parts of their tokens, and ignore
+    the query tokens shorter than the smallest n-gram
+    """
+    response = search_backend.select(indexer, {"q": "email_ngram_ng:ser2"})
+    assert ids(response["response"]["docs"]) == ["user:2"]
+    response = search_backend.select(indexer, {"q": "email_ngram_ng:r2"})
+    assert response["response"]["numFound"] == 0
+
+
+def test_count(search_backend: MemoryBackend, indexer: Indexer) -> None:
+    """
+    Test that count returns the number of matches
+    """
+    assert search_backend.count(indexer, {"q": "id:user\\:*"}) == 3
+
+
+def test_cursor_walks_every_document_once(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that following the cursors returns every match once, and that the
+    cursor of the last page does not change
+    """
+    cursor = "*"
+    seen: List[str] = []
+    while True:
+        response = search_backend.select(indexer, {
+            "q": "*:*",
+            "sort": "id asc",
+            "rows": 2,
+            "cursorMark": cursor,
+        })
+        seen.extend(ids(response["response"]["docs"]))
+        if response["nextCursorMark"] == cursor:
+            break
+        cursor = response["nextCursorMark"]
+    assert seen == ["listing:1", "user:1", "user:2", "user:3"]
+
+
+def test_invalid_cursor(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that select raises InvalidCursorException for an invalid cursor
+    """
+    with pytest.raises(InvalidCursorException):
+        search_backend.select(indexer, {
+            "q": "*:*",
+            "sort": "id asc",
+            "cursorMark": "not a cursor",
+        })
+
+
+def test_search_after_invalid_cursor(indexer: Indexer) -> None:
+    """
+    Test that the model indexers raise InvalidCursorException for an
+    invalid cursor, whatever the backend
+    """
+    with pytest.raises(InvalidCursorException):
+        UserIndexer().search_after({}, "not a cursor", 10)
+
+
+def test_real_time_get(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that real_time_get returns the documents found in the order of the
+    ids
+    """
+    docs = search_backend.real_time_get(indexer, {
+        "ids": "user:3,user:9,user:1",
+        "fl": "id,first_name_s",
+    })
+    assert docs == [
+        {"id": "user:3", "first_name_s": "Grace Hopper"},
+        {"id": "user:1", "first_name_s": "Ada"},
+    ]
+
+
+def test_export(search_backend: MemoryBackend, indexer: Indexer) -> None:
+    """
+    Test that export streams every match, sorted
+    """
+    docs = search_backend.export(indexer, {
+        "q": "*:*",
+        "fq": ["id:user\\:*"],
+        "sort": "id desc",
+        "fl": "id",
+    })
+    assert list(docs) == [{"id": "user:3"}, {"id": "user:2"}, {"id": "user:1"}]
+
+
+def test_update_replaces_documents(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that adding a document replaces the whole existing one
+    """
+    search_backend.update(indexer, [{"id": "user:1", "last_name_s": "L"}])
+    assert search_backend.real_time_get(indexer, {"ids": "user:1"}) == [
+        {"id": "user:1", "last_name_s": "L"},
+    ]
+
+
+def test_atomic_update(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that atomic updates only change the fields they set, and remove the
+    fields set to null
+    """
+    search_backend.update(indexer, [{
+        "id": "user:1",
+        "first_name_s": {"set": "Ava"},
+        "is_superuser_b": {"set": None},
+        "_version_": 1,
+    }])
+    doc = search_backend.real_time_get(indexer, {"ids": "user:1"})[0]
+    assert doc["first_name_s"] == "Ava"
+    assert doc["email_s"] == "user1@email.net"
+    assert "is_superuser_b" not in doc
+
+
+def test_atomic_update_of_missing_document(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that an atomic update requiring a missing document raises
+    VersionConflictException and changes nothing
+    """
+    with pytest.raises(VersionConflictException):
+        search_backend.update(indexer, [{
+            "id": "user:9",
+            "first_name_s": {"set": "Ava"},
+            "_version_": 1,
+        }])
+    assert search_backend.real_time_get(indexer, {"ids": "user:9"}) == []
+
+
+def test_delete(search_backend: MemoryBackend, indexer: Indexer) -> None:
+    """
+    Test that delete removes the documents by id, ignoring the missing ones
+    """
+    search_backend.delete(indexer, ["user:1", "user:9"])
+    assert search_backend.count(indexer, {"q": "*:*"}) == 3
+
+
+def test_delete_by_query(
+    search_backend: MemoryBackend,
+    indexer: Indexer,
+) -> None:
+    """
+    Test that delete_by_query only removes the matching documents
+    """
+    search_backend.delete_by_query(indexer, "id:user\\:* AND first_name_s:A*")
+    docs = search_backend.select(indexer, {"q": "*:*"})["response"]["docs"]
+    assert ids(docs) == ["user:3", "listing:1"]
+
+
+def response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+def test_rejected_cursor_is_translated() -> None:
+    """
+    Test that Solr rejecting a cursor raises InvalidCursorException
+    """
+    with pytest.raises(InvalidCursorException):
+        with rejected_requests(is_cursor=True):
+            raise requests.HTTPError(response=response(400))
+
+
+def test_rejected_version_is_translated() -> None:
+    """
+    Test that Solr rejecting a version constraint raises
+    VersionConflictException, for the blocking and async clients
+    """
+    with pytest.raises(VersionConflictException):
+        with rejected_requests():
+            raise requests.HTTPError(response=response(409))
+    request = httpx.Request("POST", "http://solr/update")
+    with pytest.raises(VersionConflictException):
+        with rejected_requests():
+            raise httpx.HTTPStatusError(
+                "Conflict",
+                request=request,
+                response=httpx.Response(409, request=request),
+                )
+
+
+def test_rejected_export_is_translated() -> None:
+    """
+    Test that Solr rejecting an export raises SolrExportException
+    """
+    with pytest.raises(SolrExportException):
+        with rejected_requests(is_export=True):
+            raise requests.HTTPError(response=response(400))
+
+
+def test_failures_are_not_translated() -> None:
+    """
+    Test that the failures of Solr are raised as they are
+    """
+    with pytest.raises(requests.HTTPError):
+        with rejected_requests(is_cursor=True, is_export=True):
+            raise requests.HTTPError(response=response(503))
@@ -0,0 +1,97 @@
+from test.unit.factories import create_user
+from typing import Iterator, List
+
+import pytest
+from core import search_cache
+from core.memory_backend import MemoryBackend
+from core.models import User
+from core.search_cache import LRUSearchCache
+from user.indexer import UserIndexer
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> Iterator[LRUSearchCache]:
+    """
+    Cache the search results of the indexers in a new cache.
+    """
+    cache = LRUSearchCache(max_size=10, ttl=60)
+    monkeypatch.setattr(search_cache, "_cache", cache)
+    monkeypatch.setattr(search_cache, "_cache_built", True)
+    yield cache
+
+
+@pytest.fixture
+def users(search_backend: MemoryBackend) -> Iterator[List[User]]:
+    users = [
+        create_user("ada@email.net"),
+        create_user("alan@email.net"),
+    ]
+    UserIndexer().add_many(users)
+    yield users
+
+
+@pytest.mark.django_db
+def test_search_is_cached(cache: LRUSearchCache, users: List[User]) -> None:
+    """
+    Test that a repeated search is served from the cache
+    """
+    indexer = UserIndexer()
+    indexer.search({}, 0, 10)
+    _, total = indexer.search({}, 0, 10)
+    assert total == 2
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+
+
+@pytest.mark.django_db
+def test_update_invalidates_entries(
+    cache: LRUSearchCache,
+    users: List[User],
+) -> None:
+    """
+    Test that updating a document drops the entries returning it, and those
+    whose query may now match it, but keeps the ones pinned to another id
+    """
+    indexer = UserIndexer()
+    ada, alan = users
+    indexer.search({"id": ada.pk}, 0, 10)
+    indexer.search({"id": alan.pk}, 0, 10)
+    indexer.search({"first_name": "Ada"}, 0, 10)
+    ada.first_name = "Ada"
+    indexer.add(ada)
+    assert cache.size() == 1
+    results, _ = indexer.search({"first_name": "Ada"}, 0, 10)
+    assert results == [ada]
+    assert cache.stats()["hits"] == 0
+
+
+@pytest.mark.django_db
+def test_delete_invalidates_entries(
+    cache: LRUSearchCache,
+    users: List[User],
+) -> None:
+    """
+    Test that deleting a document drops the entries returning it, and keeps
+    the others
+    """
+    indexer = UserIndexer()
+    ada, alan = users
+    indexer.search({}, 0, 10)
+    indexer.search({"id": alan.pk}, 0, 10)
+    indexer.delete([indexer.document_id(ada.pk)])
+    assert cache.size() == 1
+    assert indexer.search({}, 0, 10) == ([alan], 1)
+
+
+def test_lru_eviction() -> None:
+    """
+    Test that the least recently used entry is evicted once the cache is
+    full
+    """
+    cache = LRUSearchCache(max_size=2, ttl=60)
+    cache.set("a", {})
+    cache.set("b", {})
+    cache.get("a")
+    cache.set("c", {})
+    assert cache.get("b") is None
+    assert cache.get("a") == {}
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,60 @@
+from typing import Iterator, List
+
+import pytest
+from core.solr import iter_json_docs
+
+RESPONSE = (
+    '{"responseHeader":{"status":0},"response":{"numFound":2,"docs":['
+    '{"id":"user:1","first_name_s":"Zoé ]}"},'
+    '{"id":"user:2","tags_ss":["a","b"]}'
+    ']}}'
+).encode()
+
+
+def chunks(body: bytes, size: int) -> List[bytes]:
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, len(RESPONSE)])
+def test_iter_json_docs(size: int) -> None:
+    """
+    Test that the documents are parsed whatever the chunks the response is
+    split into, even inside a multi-byte character
+    """
+    assert list(iter_json_docs(chunks(RESPONSE, size))) == [
+        {"id": "user:1", "first_name_s": "Zoé ]}"},
+        {"id": "user:2", "tags_ss": ["a", "b"]},
+    ]
+
+
+def test_iter_json_docs_is_lazy() -> None:
+    """
+    Test that a document is returned as soon as its chunks are received
+    """
+    received: List[bytes] = []
+
+    def receive() -> Iterator[bytes]:
+        for chunk in chunks(RESPONSE, 8):
+            received.append(chunk)
+            yield chunk
+
+    docs = iter_json_docs(receive())
+    assert next(docs)["id"] == "user:1"
+    assert len(received) < len(chunks(RESPONSE, 8))
+
+
+def test_iter_json_docs_without_docs() -> None:
+    """
+    Test that an empty docs array yields no document
+    """
+    body = b'{"response":{"numFound":0,"docs":[]}}'
+    assert list(iter_json_docs(chunks(body, 4))) == []
+
+
+def test_iter_json_docs_truncated() -> None:
+    """
+    Test that a response ending before its docs array is closed raises
+    ValueError
+    """
+    with pytest.raises(ValueError):
+        list(iter_json_docs(chunks(RESPONSE[:-20], 5)))
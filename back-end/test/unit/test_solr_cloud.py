@@ -0,0 +1,266 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+import requests
+from app import settings
+from core import indexer, solr_cloud
+from core.circuit_breaker import CircuitOpenException
+from core.indexer import Indexer
+from core.solr import CommitPolicy
+from core.solr_cloud import ClusterState, SolrCloud, murmurhash3_32
+
+SOLR1 = "http://solr1:8983/solr"
+SOLR2 = "http://solr2:8983/solr"
+SOLR3 = "http://solr3:8983/solr"
+
+
+def replica(
+    node: str,
+    core: str,
+    leader: bool = False,
+    state: str = "active",
+) -> Dict[str, Any]:
+    replica = {
+        "core": core,
+        "base_url": node,
+        "node_name": node.split("//")[1].replace("/", "_"),
+        "state": state,
+        "type": "NRT",
+    }
+    if leader:
+        replica["leader"] = "true"
+    return replica
+
+
+# Response of the CLUSTERSTATUS action for a collection of two shards, each
+# with a leader and a follower, and a third node holding a replica that is
+# down
+CLUSTER_STATUS: Dict[str, Any] = {
+    "responseHeader": {"status": 0, "QTime": 3},
+    "cluster": {
+        "collections": {
+            "mylistings_blue": {
+                "router": {"name": "compositeId"},
+                "shards": {
+                    "shard1": {
+                        "range": "80000000-ffffffff",
+                        "state": "active",
+                        "replicas": {
+                            "core_node1": replica(
+                                SOLR1,
+                                "mylistings_shard1_replica_n1",
+                                leader=True,
+                            ),
+                            "core_node2": replica(
+                                SOLR2,
+                                "mylistings_shard1_replica_n2",
+                            ),
+                        },
+                    },
+                    "shard2": {
+                        "range": "0-7fffffff",
+                        "state": "active",
+                        "replicas": {
+                            "core_node3": replica(
+                                SOLR1,
+                                "mylistings_shard2_replica_n3",
+                            ),
+                            "core_node4": replica(
+                                SOLR2,
+                                "mylistings_shard2_replica_n4",
+                                leader=True,
+                            ),
+                            "core_node5": replica(
+                                SOLR3,
+                                "mylistings_shard2_replica_n5",
+                                state="down",
+                            ),
+                        },
+                    },
+                },
+            },
+        },
+        "aliases": {"mylistings": "mylistings_blue"},
+        "live_nodes": [
+            "solr1:8983_solr",
+            "solr2:8983_solr",
+            "solr3:8983_solr",
+        ],
+    },
+}
+
+SHARD1_LEADER = f"{SOLR1}/mylistings_shard1_replica_n1"
+SHARD2_LEADER = f"{SOLR2}/mylistings_shard2_replica_n4"
+
+
+class RecordingSession:
+    """
+    HTTP session answering every request with an empty response.
+    """
+
+    sent: List[Tuple[str, Dict[str, str], Any]]
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        self.sent.append((url, params or {}, json))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        return response
+
+
+@pytest.fixture
+def cloud(monkeypatch: pytest.MonkeyPatch) -> SolrCloud:
+    """
+    Run Solr in SolrCloud mode, with the cluster state of CLUSTER_STATUS.
+    """
+    cloud = SolrCloud([SOLR1, SOLR2, SOLR3], 60)
+    monkeypatch.setattr(cloud, "fetch_status", lambda node: CLUSTER_STATUS)
+    monkeypatch.setattr(settings, "SOLR_CLOUD_NODES", cloud.nodes)
+    monkeypatch.setattr(solr_cloud, "_solr_cloud", cloud)
+    return cloud
+
+
+@pytest.fixture
+def session(monkeypatch: pytest.MonkeyPatch) -> RecordingSession:
+    session = RecordingSession()
+    monkeypatch.setattr(indexer, "get_session", lambda: session)
+    return session
+
+
+def open_breaker(cloud: SolrCloud, node: str) -> None:
+    breaker = cloud.breaker(node)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_murmurhash3_32() -> None:
+    """
+    Test that the ids are hashed like Solr's compositeId router does
+    """
+    assert murmurhash3_32(b"") == 0
+    assert murmurhash3_32(b"hello") == 0x248bfa47
+    assert murmurhash3_32(b"user:1") == 0xcba8243f - (1 << 32)
+
+
+def test_shard_of() -> None:
+    """
+    Test that each id is held by the shard whose range holds its hash, and
+    that the ids with a shard key can not be routed
+    """
+    state = ClusterState.from_status(CLUSTER_STATUS)
+    shards = {
+        document_id: getattr(state.shard_of("mylistings", document_id), "name")
+        for document_id in [f"user:{pk}" for pk in range(1, 9)]
+    }
+    assert shards == {
+        "user:1": "shard1",
+        "user:2": "shard1",
+        "user:3": "shard1",
+        "user:4": "shard2",
+        "user:5": "shard1",
+        "user:6": "shard2",
+        "user:7": "shard1",
+        "user:8": "shard2",
+    }
+    assert state.shard_of("mylistings", "tenant!user:1") is None
+    assert state.shard_of("missing", "user:1") is None
+
+
+def test_cluster_state_replicas() -> None:
+    """
+    Test that the replicas of the nodes that are down are not active, and
+    that the leaders are the active ones
+    """
+    shards = ClusterState.from_status(CLUSTER_STATUS).shards("mylistings")
+    assert [
+        [replica.is_active for replica in shard.replicas] for shard in shards
+    ] == [[True, True], [True, True, False]]
+    assert [getattr(shard.leader(), "url") for shard in shards] == [
+        SHARD1_LEADER,
+        SHARD2_LEADER,
+    ]
+
+
+@pytest.mark.usefixtures("cloud")
+def test_updates_grouped_by_leader(session: RecordingSession) -> None:
+    """
+    Test that the documents are sent to the leaders of their shards, and
+    that the commit is only sent with the last request
+    """
+    Indexer().post_update(
+        [{"id": f"user:{pk}"} for pk in range(1, 9)],
+        CommitPolicy(CommitPolicy.SOFT),
+    )
+    assert session.sent == [
+        (
+            f"{SHARD1_LEADER}/update",
+            {},
+            [{"id": f"user:{pk}"} for pk in [1, 2, 3, 5, 7]],
+        ),
+        (
+            f"{SHARD2_LEADER}/update",
+            {"softCommit": "true"},
+            [{"id": f"user:{pk}"} for pk in [4, 6, 8]],
+        ),
+    ]
+
+
+@pytest.mark.usefixtures("cloud")
+def test_deletes_grouped_by_leader(session: RecordingSession) -> None:
+    """
+    Test that the deletions by id are sent to the leaders of their shards,
+    and that the commit within stays on every request
+    """
+    Indexer().post_update(
+        {"delete": ["user:4", "user:1"]},
+        CommitPolicy(CommitPolicy.WITHIN, 1000),
+    )
+    assert session.sent == [
+        (f"{SHARD2_LEADER}/update", {"commitWithin": "1000"}, {
+            "delete": ["user:4"],
+        }),
+        (f"{SHARD1_LEADER}/update", {"commitWithin": "1000"}, {
+            "delete": ["user:1"],
+        }),
+    ]
+
+
+def test_reads_skip_open_breakers(
+    cloud: SolrCloud,
+    session: RecordingSession,
+) -> None:
+    """
+    Test that the reads are spread over the active replicas of the healthy
+    nodes, and rejected once no node is healthy
+    """
+    for _ in range(4):
+        Indexer().read("GET", "select")
+    assert sorted(url for url, _, _ in session.sent) == sorted([
+        f"{SHARD1_LEADER}/select",
+        f"{SOLR2}/mylistings_shard1_replica_n2/select",
+        f"{SOLR1}/mylistings_shard2_replica_n3/select",
+        f"{SHARD2_LEADER}/select",
+    ])
+
+    session.sent.clear()
+    open_breaker(cloud, SOLR1)
+    for _ in range(4):
+        Indexer().read("GET", "select")
+    assert {url for url, _, _ in session.sent} == {
+        f"{SOLR2}/mylistings_shard1_replica_n2/select",
+        f"{SHARD2_LEADER}/select",
+    }
+
+    open_breaker(cloud, SOLR2)
+    with pytest.raises(CircuitOpenException):
+        Indexer().read("GET", "select")
@@ -0,0 +1,283 @@
+import asyncio
+import io
+import random
+import threading
+import time
+from typing import Any, Callable, List, Tuple, Union
+
+import httpx
+import pytest
+import requests
+from app import settings
+from core import async_indexer, indexer, solr
+from core.async_indexer import AsyncIndexer
+from core.circuit_breaker import CircuitBreaker
+from core.indexer import Indexer
+from core.solr import LATENCY_MIN_SAMPLES, LatencyTracker, retry_delay
+
+# What a stubbed request does: fail with an exception, answer with a status
+# code, or call a function returning the status code
+Outcome = Union[Exception, int, Callable[[], int]]
+
+
+class StubSession:
+    """
+    HTTP session answering each request with the next outcome.
+    """
+
+    outcomes: List[Outcome]
+    calls: List[Tuple[str, str]]
+
+    def __init__(self, *outcomes: Outcome) -> None:
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def next_status(self, method: str, url: str) -> int:
+        self.calls.append((method, url))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome if isinstance(outcome, int) else outcome()
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+        response = requests.Response()
+        response.status_code = self.next_status(method, url)
+        response.url = url
+        response.raw = io.BytesIO(str(len(self.calls)).encode())
+        return response
+
+
+class StubAsyncClient(StubSession):
+    """
+    Async HTTP client answering each request with the next outcome.
+    """
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        outcome = self.outcomes[0]
+        if isinstance(outcome, float):
+            # Answer after that many seconds
+            self.outcomes[0] = 200
+            await asyncio.sleep(outcome)
+        status = self.next_status(method, url)
+        return httpx.Response(
+            status,
+            content=str(len(self.calls)).encode(),
+            request=httpx.Request(method, url),
+        )
+
+
+@pytest.fixture(autouse=True)
+def reads(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """
+    Use a new circuit breaker and latency tracker, retry twice, and record
+    the waits between the attempts instead of sleeping.
+    """
+    monkeypatch.setattr(solr, "_circuit_breaker", CircuitBreaker(
+        "solr",
+        100,
+        30,
+        solr.is_solr_failure,
+    ))
+    monkeypatch.setattr(solr, "_latency_tracker", LatencyTracker())
+    monkeypatch.setattr(settings, "SOLR_READ_RETRIES", 2)
+    monkeypatch.setattr(settings, "SOLR_RETRY_BACKOFF", 0.1)
+    monkeypatch.setattr(settings, "SOLR_HEDGED_READS", False)
+    # Wait the longest delay the jitter allows
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    sleeps: List[float] = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    return sleeps
+
+
+def stub_session(
+    monkeypatch: pytest.MonkeyPatch,
+    *outcomes: Outcome,
+) -> StubSession:
+    session = StubSession(*outcomes)
+    monkeypatch.setattr(indexer, "get_session", lambda: session)
+    return session
+
+
+def stub_async_client(
+    monkeypatch: pytest.MonkeyPatch,
+    *outcomes: Union[Outcome, float],
+) -> StubAsyncClient:
+    client = StubAsyncClient(*outcomes)  # type: ignore[arg-type]
+    monkeypatch.setattr(async_indexer, "get_async_client", lambda: client)
+    return client
+
+
+def hedge_after(monkeypatch: pytest.MonkeyPatch, seconds: float) -> None:
+    """
+    Hedge the reads slower than a given p95 latency.
+    """
+    monkeypatch.setattr(settings, "SOLR_HEDGED_READS", True)
+    for _ in range(LATENCY_MIN_SAMPLES):
+        solr.get_latency_tracker().record(seconds)
+
+
+def test_retry_delay_backoff() -> None:
+    """
+    Test that the delays grow exponentially, up to MAX_RETRY_DELAY
+    """
+    assert [retry_delay(attempt) for attempt in range(1, 7)] == [
+        0.1, 0.2, 0.4, 0.8, 1.6, solr.MAX_RETRY_DELAY,
+    ]
+
+
+def test_retry_delay_jitter(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that the delays are picked at random between 0 and the backoff
+    """
+    bounds: List[Tuple[float, float]] = []
+
+    def uniform(low: float, high: float) -> float:
+        bounds.append((low, high))
+        return low
+
+    monkeypatch.setattr(random, "uniform", uniform)
+    assert retry_delay(3) == 0
+    assert bounds == [(0, 0.4)]
+
+
+def test_read_retries_failures(
+    monkeypatch: pytest.MonkeyPatch,
+    reads: List[float],
+) -> None:
+    """
+    Test that the reads failing because of Solr are retried with a backoff
+    """
+    session = stub_session(
+        monkeypatch,
+        requests.ConnectionError("Connection refused"),
+        503,
+        200,
+    )
+    response = Indexer().read("GET", "select")
+    assert response.status_code == 200
+    assert len(session.calls) == 3
+    assert reads == [0.1, 0.2]
+
+
+def test_read_gives_up(
+    monkeypatch: pytest.MonkeyPatch,
+    reads: List[float],
+) -> None:
+    """
+    Test that a read is given up after SOLR_READ_RETRIES retries
+    """
+    session = stub_session(monkeypatch, 503, 503, 503, 200)
+    with pytest.raises(requests.HTTPError):
+        Indexer().read("GET", "select")
+    assert len(session.calls) == 3
+    assert reads == [0.1, 0.2]
+
+
+def test_read_does_not_retry_rejections(
+    monkeypatch: pytest.MonkeyPatch,
+    reads: List[float],
+) -> None:
+    """
+    Test that the requests rejected by Solr are not retried
+    """
+    session = stub_session(monkeypatch, 400, 200)
+    with pytest.raises(requests.HTTPError):
+        Indexer().read("GET", "select")
+    assert len(session.calls) == 1
+    assert reads == []
+
+
+def test_writes_are_not_retried(
+    monkeypatch: pytest.MonkeyPatch,
+    reads: List[float],
+) -> None:
+    """
+    Test that the update requests, which are not idempotent, are sent once
+    """
+    session = stub_session(monkeypatch, requests.Timeout("Timed out"), 200)
+    with pytest.raises(requests.Timeout):
+        Indexer().post_update([{"id": "user:1"}])
+    assert session.calls == [("POST", f"{Indexer().url}/update")]
+    assert reads == []
+
+
+def test_read_hedged_after_p95(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that a duplicate read is sent once the first one is slower than
+    the p95 latency, and that the first answer is used
+    """
+    hedge_after(monkeypatch, 0.01)
+    released = threading.Event()
+
+    def slow() -> int:
+        released.wait(5)
+        return 200
+
+    session = stub_session(monkeypatch, slow, 200)
+    try:
+        response = Indexer().read("GET", "select")
+    finally:
+        released.set()
+    assert len(session.calls) == 2
+    assert response.text == "2"
+
+
+def test_read_not_hedged_when_fast(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that no duplicate read is sent when the first one answers before
+    the p95 latency
+    """
+    hedge_after(monkeypatch, 5)
+    session = stub_session(monkeypatch, 200, 200)
+    assert Indexer().read("GET", "select").text == "1"
+    assert len(session.calls) == 1
+
+
+def test_async_read_retries_failures(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the async reads are retried like the blocking ones, and their
+    rejections are not
+    """
+    client = stub_async_client(
+        monkeypatch,
+        httpx.ConnectError("Connection refused"),
+        503,
+        200,
+        400,
+    )
+    delays: List[float] = []
+
+    async def sleep(seconds: float) -> None:
+        delays.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    async_indexer_ = AsyncIndexer(Indexer())
+    response = asyncio.run(async_indexer_.read("GET", "select"))
+    assert response.status_code == 200
+    assert delays == [0.1, 0.2]
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(async_indexer_.read("GET", "select"))
+    assert len(client.calls) == 4
+    assert delays == [0.1, 0.2]
+
+
+def test_async_read_hedged_after_p95(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that a duplicate async read is sent once the first one is slower
+    than the p95 latency, and that the first answer is used
+    """
+    hedge_after(monkeypatch, 0.01)
+    client = stub_async_client(monkeypatch, 5.0, 200)
+    response = asyncio.run(
+        AsyncIndexer(Indexer()).read("GET", "select")
+    )
+    assert len(client.calls) == 1
+    assert response.text == "1"
+    assert client.outcomes == [200]
@@ -0,0 +1,149 @@
+import asyncio
+from test.unit.factories import create_user
+from typing import Any, Optional, Tuple
+
+import pytest
+import requests
+from core.circuit_breaker import CircuitOpenException
+from core.memory_backend import MemoryBackend
+from core.models import User
+from user.indexer import AsyncUserIndexer, UserIndexer
+
+
+def test_hydrate_inactive_user(search_backend: MemoryBackend) -> None:
+    """
+    Test that the users found in the index keep their active flag, which
+    the authentication checks
+    """
+    indexer = UserIndexer()
+    search_backend.update(indexer, [{
+        "id": "user:1",
+        "email_s": "inactive.user@email.net",
+        "email_ngram_ng": "inactive.user@email.net",
+        "username_s": "inactive.user",
+        "is_active_b": False,
+        "is_superuser_b": False,
+    }])
+    user = indexer.find_by_id(1)
+    assert user is not None
+    assert user.is_active is False
+    user = indexer.find_by_email("inactive.user@email.net")
+    assert user is not None
+    assert user.is_active is False
+
+
+def test_document_holds_active_flag() -> None:
+    """
+    Test that the documents of the users hold their active flag
+    """
+    indexer = UserIndexer()
+    user = User(pk=1, email="user@email.net", is_active=False)
+    document = indexer.transform_data(indexer.to_document(user))
+    assert document["is_active_b"] is False
+    assert "is_active_b" in indexer.field_list()
+
+
+@pytest.mark.django_db
+def test_purge_inactive(search_backend: MemoryBackend) -> None:
+    """
+    Test that purge_inactive removes the inactive users from the index and
+    keeps the active ones
+    """
+    indexer = UserIndexer()
+    active = create_user("active.user@email.net")
+    inactive = create_user("inactive.user@email.net", is_active=False)
+    indexer.add_many([active, inactive])
+    assert indexer.purge_inactive() == 1
+    assert indexer.find_by_ids([active.pk, inactive.pk]) == [active]
+
+
+@pytest.mark.django_db
+def test_fallback_ignores_inactive_users(
+    search_backend: MemoryBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the database fallbacks, used while Solr is unavailable, only
+    find the users the index would find
+    """
+    def unavailable(*args: Any, **kwargs: Any) -> Any:
+        raise requests.ConnectionError("Solr is down")
+
+    monkeypatch.setattr(search_backend, "select", unavailable)
+    monkeypatch.setattr(search_backend, "real_time_get", unavailable)
+    indexer = UserIndexer()
+    active = create_user("active.user@email.net")
+    inactive = create_user("inactive.user@email.net", is_active=False)
+    assert indexer.find_by_email("active.user@email.net") == active
+    assert indexer.find_by_id(active.pk) == active
+    assert indexer.find_by_email("inactive.user@email.net") is None
+    assert indexer.find_by_id(inactive.pk) is None
+
+
+@pytest.mark.django_db
+def test_fallback_while_circuit_open(
+    search_backend: MemoryBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the users are found in the database while the circuit breaker
+    rejects the requests to Solr
+    """
+    def rejected(*args: Any, **kwargs: Any) -> Any:
+        raise CircuitOpenException("The solr circuit is open")
+
+    monkeypatch.setattr(search_backend, "select", rejected)
+    monkeypatch.setattr(search_backend, "real_time_get", rejected)
+    user = create_user("user@email.net")
+    indexer = UserIndexer()
+    assert indexer.find_by_email("user@email.net") == user
+    assert indexer.find_by_id(user.pk) == user
+    assert indexer.find_by_id(user.pk + 1) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_fallback(
+    search_backend: MemoryBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the async lookups fall back to the database too
+    """
+    def unavailable(*args: Any, **kwargs: Any) -> Any:
+        raise requests.ConnectionError("Solr is down")
+
+    monkeypatch.setattr(search_backend, "select", unavailable)
+    monkeypatch.setattr(search_backend, "real_time_get", unavailable)
+    user = create_user("user@email.net")
+
+    async def find() -> Tuple[Optional[User], Optional[User]]:
+        indexer = AsyncUserIndexer()
+        return (
+            await indexer.find_by_email("user@email.net"),
+            await indexer.find_by_id(user.pk),
+        )
+
+    assert asyncio.run(find()) == (user, user)
+
+
+def test_no_fallback_for_rejected_requests(
+    search_backend: MemoryBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the errors other than Solr being unavailable are raised
+    instead of falling back to the database
+    """
+    response = requests.Response()
+    response.status_code = 400
+
+    def rejected(*args: Any, **kwargs: Any) -> Any:
+        raise requests.HTTPError(response=response)
+
+    monkeypatch.setattr(search_backend, "select", rejected)
+    monkeypatch.setattr(search_backend, "real_time_get", rejected)
+    indexer = UserIndexer()
+    with pytest.raises(requests.HTTPError):
+        indexer.find_by_email("user@email.net")
+    with pytest.raises(requests.HTTPError):
+        indexer.find_by_id(1)
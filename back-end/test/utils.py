@@ -1,5 +1,6 @@
 import json
 import logging
+import time
 from typing import (
     Any, Callable, Dict, Literal, Mapping, Optional, Sequence, Tuple,
 )
@@ -142,22 +143,31 @@ class Helper:
         encrypted = cipher.encrypt(value.encode())
         return encrypted.decode()
 
-    def find_user_by_email(self, email: str) -> Optional[dict[str, Any]]:
+    def find_user_by_email(
+            self,
+            email: str,
+            timeout: float = 5.0,
+            ) -> Optional[dict[str, Any]]:
         """
-        Find a user by email.
+        Find a user by email. The API indexes the users in the background
+        once their transaction commits, so the index is polled for a while.
 
         :param email: The email of the user to find
+        :param timeout: The seconds to wait for the user to be indexed
         :return: The user object
         """
         lower_email = email.lower()
-        result = self.search_solr(
-            document_type="user",
-            query={"email": lower_email},
-        )
-        if result is None or len(result) == 0:
-            return None
-        first_result = result[0]
-        return first_result
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.search_solr(
+                document_type="user",
+                query={"email": lower_email},
+            )
+            if result:
+                return result[0]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.1)
 
     def get_request(
             self,
@@ -178,6 +178,8 @@ def tests_helper(request: pytest.FixtureRequest) -> Helper:
                 )
             .with_env("SOLR_URL", solr_url)
             .with_env("SOLR_CORE", solr_core)
+            # No outbox worker runs next to the back-end
+            .with_env("SOLR_OUTBOX_DELIVER_ON_COMMIT", "True")
             .with_network(network)
             .with_network_aliases(("back-end"))
             .start()